@@ -0,0 +1,81 @@
+"""
+Запити до нормалізованого бестіарію (core/bestiary.py) проти розбору JSON у Python при зростанні бази.
+
+Копія dnd_data.sqlite3 доповнюється --homebrew вигаданими монстрами (копії SRD з іншими
+CR/типом/розміром), вставленими звичайним INSERT у monsters - таблиці бестіарію оновлюють тригери.
+Для типового фільтра енкаунтер-білдера виводиться час SQL-запиту і час того самого фільтра
+через json.loads усіх рядків.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.bestiary_query [--homebrew 5000] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from core import bestiary
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dnd_data.sqlite3")
+FILTER = {"cr_range": (1, 3), "type": "undead", "size": None, "limit": 50}
+
+
+def _python_filter(conn):
+    low, high = FILTER["cr_range"]
+    found = []
+    for (data,) in conn.execute("SELECT data FROM monsters"):
+        m = json.loads(data)
+        if m.get("type") == FILTER["type"] and low <= m.get("challenge_rating", 0) <= high: found.append(m)
+    found.sort(key=lambda m: (m["challenge_rating"], m["name"]))
+    return found[:FILTER["limit"]]
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat): result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--homebrew", type=int, default=5000, help="вигаданих монстрів понад SRD")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dnd_data.sqlite3")
+        shutil.copy(DB_PATH, path)
+        start = time.perf_counter()
+        conn = bestiary.connect(path)
+        print(f"Міграція {conn.execute('SELECT COUNT(*) FROM monsters').fetchone()[0]} монстрів: "
+              f"{(time.perf_counter() - start) * 1000:.1f} мс")
+
+        rnd = random.Random(1)
+        srd = [json.loads(r[0]) for r in conn.execute("SELECT data FROM monsters")]
+        start = time.perf_counter()
+        with conn:
+            for i in range(args.homebrew):
+                m = dict(rnd.choice(srd), index=f"homebrew-{i}", name=f"Homebrew {i}",
+                         challenge_rating=rnd.choice((0.25, 0.5, 1, 2, 3, 5, 8, 13)),
+                         type=rnd.choice(("undead", "beast", "fiend", "humanoid")), size=rnd.choice(bestiary.SIZES))
+                conn.execute("INSERT INTO monsters(index_name, name, data) VALUES (?, ?, ?)",
+                             (m["index"], m["name"], json.dumps(m)))
+        total = conn.execute("SELECT COUNT(*) FROM monster_stats").fetchone()[0]
+        print(f"Додано {args.homebrew} homebrew через тригери: {(time.perf_counter() - start) * 1000:.0f} мс, "
+              f"у бестіарії {total}")
+
+        sql_ms, sql_rows = _timed(lambda: bestiary.query(conn, **FILTER), args.repeat)
+        py_ms, py_rows = _timed(lambda: _python_filter(conn), max(1, args.repeat // 20))
+        same = [m["index"] for m in sql_rows] == [m["index"] for m in py_rows]
+        print(f"Фільтр {FILTER}: SQL {sql_ms:.3f} мс, json.loads {py_ms:.1f} мс "
+              f"(x{py_ms / sql_ms:.0f}), {len(sql_rows)} монстрів, результати {'збігаються' if same else 'РІЗНІ'}")
+        conn.close()
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
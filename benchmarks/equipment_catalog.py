@@ -0,0 +1,95 @@
+"""
+Каталог спорядження (core/equipment.py) сторінками проти перебудови всього QListWidget при зростанні каталогу.
+
+Копія dnd_data.sqlite3 доповнюється --homebrew вигаданими предметами (копії SRD з іншою ціною та вагою),
+вставленими звичайним INSERT у equipment - каталог і пошук оновлюють тригери. Для зміни фільтра
+виводиться час, за який DM бачить список: EquipmentCatalogModel з першою сторінкою проти старого
+підходу - json.loads усіх рядків, фільтр у Python і новий QListWidgetItem на кожен предмет.
+
+Запуск з кореня репозиторію (Qt без вікна: QT_QPA_PLATFORM=offscreen):
+    python -m benchmarks.equipment_catalog [--homebrew 5000] [--repeat 50]
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+from PySide6.QtWidgets import QApplication, QListWidget, QListWidgetItem
+
+from core import equipment
+from ui.dm.inventory_manager_tab import EquipmentCatalogModel
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dnd_data.sqlite3")
+FILTER = {"weight_range": (None, 5)}
+
+
+def _rebuild_list_widget(conn, widget):
+    widget.clear()
+    high = FILTER["weight_range"][1]
+    items = [json.loads(data) for (data,) in conn.execute("SELECT data FROM equipment")]
+    # Рядок додається конструктором з батьком, а не addItem: PySide6 6.12 на Python 3.11 губить посилання
+    # на None при кожному виклику void-методу, і тисячі таких викликів валять інтерпретатор на виході
+    for d in sorted(items, key=lambda d: d["name"]):
+        if d.get("weight") is None or d["weight"] > high: continue
+        QListWidgetItem(d["name"], widget)
+    return widget.count()
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat): result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--homebrew", type=int, default=5000, help="вигаданих предметів понад SRD")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+    QApplication.instance() or QApplication(sys.argv[:1])  # віджетам і моделі потрібен QApplication
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dnd_data.sqlite3")
+        shutil.copy(DB_PATH, path)
+        start = time.perf_counter()
+        conn = equipment.connect(path)
+        print(f"Міграція {conn.execute('SELECT COUNT(*) FROM equipment').fetchone()[0]} предметів: "
+              f"{(time.perf_counter() - start) * 1000:.0f} мс")
+
+        rnd = random.Random(1)
+        srd = [json.loads(r[0]) for r in conn.execute("SELECT data FROM equipment")]
+        start = time.perf_counter()
+        with conn:
+            for i in range(args.homebrew):
+                d = dict(rnd.choice(srd), index=f"homebrew-{i}", name=f"Homebrew {i}",
+                         cost={"quantity": rnd.randint(1, 500), "unit": "gp"}, weight=rnd.choice((0.5, 1, 3, 10, 40)))
+                conn.execute("INSERT INTO equipment(index_name, name, data) VALUES (?, ?, ?)",
+                             (d["index"], d["name"], json.dumps(d)))
+        total = conn.execute("SELECT COUNT(*) FROM equipment_items").fetchone()[0]
+        print(f"Додано {args.homebrew} homebrew через тригери: {(time.perf_counter() - start) * 1000:.0f} мс, "
+              f"у каталозі {total}")
+
+        # Моделі потрібен лише DataManager.query_equipment - тут він іде в ту саму копію бази
+        model = EquipmentCatalogModel(types.SimpleNamespace(query_equipment=functools.partial(equipment.query, conn)))
+        model_ms, _ = _timed(lambda: model.set_filters(**FILTER), args.repeat)
+        fetch_ms, _ = _timed(lambda: model.fetchMore() if model.canFetchMore() else None, args.repeat)
+        search_ms, _ = _timed(lambda: model.set_filters(text="home", **FILTER), args.repeat)
+        widget = QListWidget()
+        widget_ms, count = _timed(lambda: _rebuild_list_widget(conn, widget), max(1, args.repeat // 10))
+        matched = len(equipment.query(conn, **FILTER))
+        print(f"Фільтр {FILTER}: модель (перша сторінка {model.PAGE_SIZE}) {model_ms:.2f} мс, "
+              f"наступна сторінка {fetch_ms:.2f} мс, з пошуком {search_ms:.2f} мс; "
+              f"перебудова QListWidget {widget_ms:.0f} мс (x{widget_ms / model_ms:.0f}); "
+              f"предметів {count}, у каталозі {'стільки ж' if matched == count else f'{matched} - РІЗНІ'}")
+        conn.close()
+    return 0 if matched == count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
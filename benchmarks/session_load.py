@@ -0,0 +1,259 @@
+"""
+Навантаження на хост сесії: скільки гравців він витримує і з якою затримкою.
+
+Хост запускається без Qt (python -m core.server) в окремому процесі, або береться вже
+запущений (--url, напр. маршрутизатор core/router.py). Симулюються --players гравців і один ДМ
+за однією сесією, як у грі:
+- перетягування токена - серія команд MOVE по клітинках;
+- повідомлення в лог;
+- опитування стану бою раз на 500 мс і логу раз на 2 с (клієнт без long-poll /events).
+
+Спершу все разом (фаза "mix"), потім кожен тип запиту окремо з тим самим розкладом -
+так видно, скільки CPU хоста коштує кожен маршрут. Для кожного маршруту виводяться
+p50/p95/p99 затримки, пропускна здатність, CPU хоста (% ядра і мкс на запит) і найбільший RSS
+(читаються з /proc, тож лише на Linux і лише для хоста, запущеного цим скриптом).
+
+Як страж регресій: --max-p95 МС - код виходу 1, якщо p95 якогось маршруту в фазі mix більший.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.session_load [--players 20] [--seconds 10] [--backend flask|aiohttp] [--url http://...]
+"""
+import argparse
+import contextlib
+import heapq
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SID, DM = "SESS_LOAD", "LOAD_DM"
+
+# Розклад клієнта, с
+COMBAT_POLL_EVERY = 0.5
+LOG_POLL_EVERY = 2.0
+DRAG_EVERY = (2.0, 6.0)  # пауза між перетягуваннями токена (випадкова в межах)
+DRAG_STEPS, DRAG_STEP_DELAY = 5, 0.08  # клітинок за перетягування і пауза між ними
+LOG_PUSH_EVERY = (4.0, 10.0)
+DM_LOG_PUSH_EVERY = (1.0, 3.0)
+
+ENDPOINTS = ("MOVE", "POST /update/logs", "GET /combat/state", "GET /logs")
+
+
+class _Client:
+    """Один гравець або ДМ: свій потік, keep-alive з'єднання і розклад дій."""
+
+    def __init__(self, url, uid, token, is_dm, endpoints, samples):
+        self.url, self.uid, self.token, self.is_dm = url, uid, token, is_dm
+        self.endpoints, self.samples = endpoints, samples
+        self.http = requests.Session()
+        self.rnd = random.Random(uid)
+        self.rev = self.seq = 0
+        self.x = 0
+
+    def _timed(self, endpoint, method, path, body=None, params=None):
+        start = time.perf_counter()
+        try:
+            r = self.http.request(method, self.url + path, json=body, params=params, timeout=10)
+            status, data = r.status_code, (r.json() if r.status_code == 200 else None)
+        except requests.RequestException:
+            status, data = None, None
+        self.samples.append((endpoint, time.perf_counter() - start, status))
+        return data
+
+    def drag(self):
+        for step in range(DRAG_STEPS):
+            self.x = (self.x + 1) % 30
+            self._timed("MOVE", "POST", "/combat/command",
+                        {"sid": SID, "uid": self.uid, "cmd": "MOVE", "token": self.token, "x": self.x, "y": 1})
+            if step < DRAG_STEPS - 1: time.sleep(DRAG_STEP_DELAY)
+
+    def push_log(self):
+        self._timed("POST /update/logs", "POST", "/update/logs",
+                    {"sid": SID, "log": {"type": "MESSAGE", "content": f"{self.uid} {time.time():.3f}", "sender_id": self.uid}})
+
+    def poll_combat(self):
+        data = self._timed("GET /combat/state", "GET", f"/combat/state/{SID}", params={"since": self.rev})
+        if data and "rev" in data: self.rev = data["rev"]
+
+    def poll_logs(self):
+        data = self._timed("GET /logs", "GET", f"/logs/{SID}", params={"after": self.seq, "uid": self.uid})
+        if data and data.get("logs"): self.seq = data["logs"][-1]["seq"]
+
+    def schedule(self):
+        """[(endpoint, дія, функція наступної паузи)] для цього клієнта."""
+        log_every = DM_LOG_PUSH_EVERY if self.is_dm else LOG_PUSH_EVERY
+        plan = [("MOVE", self.drag, lambda: self.rnd.uniform(*DRAG_EVERY)),
+                ("POST /update/logs", self.push_log, lambda: self.rnd.uniform(*log_every)),
+                ("GET /combat/state", self.poll_combat, lambda: COMBAT_POLL_EVERY),
+                ("GET /logs", self.poll_logs, lambda: LOG_POLL_EVERY)]
+        return [p for p in plan if p[0] in self.endpoints]
+
+    def run(self, start_at, deadline):
+        queue = [(start_at + self.rnd.uniform(0, pause()), i, act, pause)
+                 for i, (_, act, pause) in enumerate(self.schedule())]
+        heapq.heapify(queue)
+        while queue:
+            at, i, act, pause = heapq.heappop(queue)
+            if at >= deadline: break
+            delay = at - time.time()
+            if delay > 0: time.sleep(delay)
+            act()
+            heapq.heappush(queue, (max(at + pause(), time.time()), i, act, pause))
+
+
+def _client_group(url, clients, endpoints, start_at, seconds, results):
+    """Процес з групою клієнтів (потоків): [(uid, token, is_dm)] -> у results список замірів."""
+    samples = []
+    threads = [threading.Thread(target=_Client(url, uid, token, is_dm, endpoints, samples).run,
+                                args=(start_at, start_at + seconds)) for uid, token, is_dm in clients]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    results.put(samples)
+
+
+class _HostMonitor:
+    """CPU і пік RSS процесу хоста з /proc (None, якщо недоступно)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._clock = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._clock  # utime + stime
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def rss(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                return next(int(l.split()[1]) * 1024 for l in f if l.startswith("VmRSS:"))
+        except (OSError, StopIteration, ValueError):
+            return None
+
+    def __enter__(self):
+        self._cpu0, self._t0 = self.cpu_seconds(), time.perf_counter()
+
+        def sample():
+            while not self._stop.wait(0.1): self.peak_rss = max(self.peak_rss, self.rss() or 0)
+        self._thread = threading.Thread(target=sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        cpu1 = self.cpu_seconds()
+        self.cpu = None if cpu1 is None or self._cpu0 is None else cpu1 - self._cpu0
+        self.wall = time.perf_counter() - self._t0
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_phase(url, players, endpoints, seconds, procs):
+    """Заміри фази: [(endpoint, затримка с, HTTP статус або None)]."""
+    clients = [(DM, "MONSTER", True)] + [(f"P{n:03d}", f"P{n:03d}", False) for n in range(players)]
+    groups = [clients[i::procs] for i in range(procs) if clients[i::procs]]
+    results = multiprocessing.Queue()
+    start_at = time.time() + 0.5
+    workers = [multiprocessing.Process(target=_client_group, args=(url, g, endpoints, start_at, seconds, results))
+               for g in groups]
+    for p in workers: p.start()
+    samples = [s for _ in workers for s in results.get()]
+    for p in workers: p.join()
+    return samples
+
+
+def report(name, samples, seconds, monitor):
+    print(f"\n[{name}]")
+    print(f"{'маршрут':<20}{'запитів':>9}{'оп/с':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'помилок':>9}")
+    p95 = {}
+    for endpoint in ENDPOINTS:
+        lat = sorted(l for e, l, _ in samples if e == endpoint)
+        if not lat: continue
+        errors = sum(1 for e, _, s in samples if e == endpoint and s not in (200, 304))
+        p50, p95[endpoint], p99 = (_percentile(lat, q) * 1000 for q in (0.5, 0.95, 0.99))
+        print(f"{endpoint:<20}{len(lat):>9}{len(lat) / seconds:>9.1f}{p50:>9.1f}{p95[endpoint]:>9.1f}{p99:>9.1f}{errors:>9}")
+    if monitor is not None and monitor.cpu is not None:
+        per_req = monitor.cpu / len(samples) * 1e6 if samples else 0
+        print(f"хост: CPU {monitor.cpu / monitor.wall * 100:.0f}% ядра, {per_req:.0f} мкс CPU на запит, "
+              f"пік RSS {monitor.peak_rss / 1024 ** 2:.0f} МБ")
+    return p95
+
+
+def _start_host(backend, port):
+    host = subprocess.Popen([sys.executable, "-m", "core.server", "--host", "127.0.0.1", "--port", str(port),
+                             "--backend", backend, "--no-store", "--no-discovery"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url + "/status", timeout=0.5).ok: return host, url
+        except requests.RequestException:
+            time.sleep(0.05)
+    host.terminate()
+    raise RuntimeError("Host did not start")
+
+
+def _prepare_session(url, players):
+    http = requests.Session()
+    http.post(url + "/session/new", json={"id": SID, "data": {"status": "ACTIVE", "players": {}, "logs": [], "dm_id": DM}})
+    spawn = {"sid": SID, "uid": DM, "cmd": "SPAWN", "token": "MONSTER", "data": {"name": "Goblin", "type": "monster"}}
+    http.post(url + "/combat/command", json=spawn)
+    for n in range(players):
+        uid = f"P{n:03d}"
+        http.post(url + "/join", json={"sid": SID, "uid": uid, "player_data": {"name": uid}})
+        http.post(url + "/combat/command", json={"sid": SID, "uid": uid, "cmd": "SPAWN", "token": uid,
+                                                  "data": {"name": uid, "type": "player"}})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10, help="тривалість кожної фази")
+    parser.add_argument("--backend", choices=("flask", "aiohttp"), default="flask")
+    parser.add_argument("--port", type=int, default=5080)
+    parser.add_argument("--url", help="вже запущений хост (тоді CPU/RSS хоста не вимірюються)")
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 1, help="процесів-клієнтів")
+    parser.add_argument("--mix-only", action="store_true", help="без окремих фаз для кожного маршруту")
+    parser.add_argument("--max-p95", type=float, help="мс; код виходу 1, якщо p95 маршруту у фазі mix більший")
+    args = parser.parse_args(argv)
+
+    host, url = (None, args.url.rstrip("/")) if args.url else _start_host(args.backend, args.port)
+    try:
+        _prepare_session(url, args.players)
+        print(f"{args.players} гравців + ДМ, {url}, {args.seconds:g} с на фазу")
+        phases = [("mix", ENDPOINTS)] + ([] if args.mix_only else [(e, (e,)) for e in ENDPOINTS])
+        worst = {}
+        for name, endpoints in phases:
+            with _HostMonitor(host.pid) if host else contextlib.nullcontext() as monitor:
+                samples = run_phase(url, args.players, endpoints, args.seconds, args.procs)
+            p95 = report(name, samples, args.seconds, monitor)
+            if name == "mix": worst = p95
+    finally:
+        if host is not None:
+            host.terminate()
+            host.wait(10)
+
+    slow = {e: p for e, p in worst.items() if args.max_p95 is not None and p > args.max_p95}
+    if slow:
+        print("\nПовільніше за --max-p95: " + ", ".join(f"{e} {p:.1f} мс" for e, p in slow.items()))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Масштабування хоста на кількох процесах (core/router.py) з кількістю воркерів.
+
+Для кожної кількості воркерів запускається python -m core.router, створюються --tables
+сесій (столів), і --clients процесів-клієнтів упродовж --seconds с засипають хост тим,
+що робить гра: ДМ рухає токен (MOVE), пише в лог і читає стан бою. Виводиться пропускна
+здатність і прискорення відносно одного воркера. Клієнти - окремі процеси з keep-alive
+з'єднаннями, щоб не вони, а хост був вузьким місцем.
+
+Прискорення, близьке до лінійного, видно лише на машині з кількома ядрами: воркери,
+маршрутизатори і клієнти ділять ті самі ядра, тож більше воркерів, ніж ядер, не дає нічого.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.shard_scaling [--workers 1,2,4] [--tables 16] [--clients 8] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DM = "BENCH_DM"
+
+
+def _sid(k):
+    return f"SESS_B{k:03d}"
+
+
+def _client(url, sids, seconds, start_at, results):
+    http = requests.Session()
+    ops = errors = i = 0
+    while time.time() < start_at: time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        sid = sids[i % len(sids)]
+        for method, path, body in (
+                ("POST", "/combat/command", {"sid": sid, "uid": DM, "cmd": "MOVE", "token": "T", "x": i % 20, "y": 1}),
+                ("POST", "/update/logs", {"sid": sid, "log": {"type": "MESSAGE", "content": str(i), "sender_id": DM}}),
+                ("GET", f"/combat/state/{sid}", None),
+        ):
+            r = http.request(method, url + path, json=body)
+            ops += 1
+            if r.status_code != 200: errors += 1
+        i += 1
+    results.put((ops, errors))
+
+
+def _wait_ready(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url + "/status", timeout=0.5).ok: return
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not start")
+
+
+def run(workers, routers, tables, clients, seconds, port):
+    """Пропускна здатність (оп/с, помилок) хоста з workers воркерами."""
+    url = f"http://127.0.0.1:{port}"
+    host = subprocess.Popen([sys.executable, "-m", "core.router", "--workers", str(workers), "--routers", str(routers),
+                             "--host", "127.0.0.1", "--port", str(port), "--no-store", "--no-discovery"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(url)
+        sids = [_sid(k) for k in range(tables)]
+        for sid in sids:
+            requests.post(url + "/session/new", json={"id": sid, "data": {
+                "status": "ACTIVE", "players": {}, "logs": [], "dm_id": DM}})
+            requests.post(url + "/combat/command", json={"sid": sid, "uid": DM, "cmd": "SPAWN", "token": "T",
+                                                         "data": {"name": "T", "x": 0, "y": 0, "type": "monster"}})
+        results = multiprocessing.Queue()
+        start_at = time.time() + 0.5
+        procs = [multiprocessing.Process(target=_client, args=(url, sids[n::clients] or sids, seconds, start_at, results))
+                 for n in range(clients)]
+        for p in procs: p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs: p.join()
+        ops, errors = sum(t[0] for t in totals), sum(t[1] for t in totals)
+        return ops / seconds, errors
+    finally:
+        host.terminate()
+        host.wait(10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="кількості воркерів через кому")
+    parser.add_argument("--routers", type=int, default=0, help="процесів маршрутизатора (0 - стільки ж, скільки воркерів)")
+    parser.add_argument("--tables", type=int, default=16, help="сесій (столів)")
+    parser.add_argument("--clients", type=int, default=8, help="процесів-клієнтів")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--port", type=int, default=5090)
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    print(f"Ядер: {cores}; столів: {args.tables}; клієнтів: {args.clients}; {args.seconds:g} с на замір")
+    base = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        rate, errors = run(workers, args.routers or workers, args.tables, args.clients, args.seconds, args.port)
+        base = base or rate
+        note = f", помилок {errors}" if errors else ""
+        print(f"{workers:>3} воркерів: {rate:8.0f} оп/с  x{rate / base:.2f}{note}")
+    if cores == 1: print("Лише одне ядро: прискорення тут не видно, запустіть на багатоядерній машині")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
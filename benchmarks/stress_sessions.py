@@ -0,0 +1,102 @@
+"""
+Стрес-перевірка конкурентних записів у сервер сесій.
+
+Кілька сесій одночасно засипаються записами гравців, логу та бою з багатьох потоків
+через ті самі маршрути Flask, що й у грі. Після цього перевіряється, що жодне оновлення
+не загубилось: лог має всі записи з неперервними seq, у гравців є всі поля,
+у бою - всі токени і ревізія дорівнює кількості команд.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.stress_sessions [--sessions 4] [--threads 8] [--ops 200]
+"""
+import argparse
+import sys
+import threading
+import time
+
+from core.server import app, db_store
+
+DM = "STRESS"
+
+
+def _worker(client, sid, n, ops, errors, barrier):
+    uid = f"P{n}"
+    barrier.wait()
+    for i in range(ops):
+        for path, body in (
+                ("/update/logs", {"sid": sid, "log": {"type": "MESSAGE", "content": f"{uid}:{i}", "sender_id": uid}}),
+                ("/player/update", {"sid": sid, "uid": uid, "data": {f"f{i}": i}}),
+                ("/combat/command", {"sid": sid, "uid": DM, "cmd": "SPAWN", "token": f"{uid}_{i}",
+                                     "data": {"x": i, "y": n}}),
+        ):
+            r = client.post(path, json=body)
+            if r.status_code != 200: errors.append((path, r.status_code))
+
+
+def _check(sid, threads, ops):
+    """Повертає список знайдених порушень для сесії."""
+    problems = []
+    session = db_store["sessions"][sid]
+
+    logs = [l for l in session["logs"] if l["type"] == "MESSAGE"]
+    if len(logs) != threads * ops:
+        problems.append(f"{sid}: логів {len(logs)}, очікувалось {threads * ops}")
+    seqs = [l["seq"] for l in session["logs"]]
+    if seqs != list(range(1, len(seqs) + 1)):
+        problems.append(f"{sid}: seq логу не неперервні")
+    for n in range(threads):
+        own = [l["content"] for l in logs if l["sender_id"] == f"P{n}"]
+        if own != [f"P{n}:{i}" for i in range(ops)]:
+            problems.append(f"{sid}: порушено порядок логів гравця P{n}")
+
+    for n in range(threads):
+        player = session["players"].get(f"P{n}", {})
+        missing = [i for i in range(ops) if player.get(f"f{i}") != i]
+        if missing: problems.append(f"{sid}: у P{n} загубились поля {missing[:5]}...")
+
+    st = db_store["combat_state"][sid]
+    if len(st["tokens"]) != threads * ops:
+        problems.append(f"{sid}: токенів {len(st['tokens'])}, очікувалось {threads * ops}")
+    if st["rev"] != threads * ops:
+        problems.append(f"{sid}: ревізія {st['rev']}, очікувалось {threads * ops}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="потоків (гравців) на сесію")
+    parser.add_argument("--ops", type=int, default=200, help="ітерацій на потік")
+    args = parser.parse_args(argv)
+
+    sids = [f"STRESS_{k}" for k in range(args.sessions)]
+    for sid in sids:
+        app.test_client().post("/session/new", json={"id": sid, "data": {
+            "status": "ACTIVE", "players": {}, "logs": [], "dm_id": DM}})
+        for n in range(args.threads):
+            app.test_client().post("/join", json={"sid": sid, "uid": f"P{n}", "player_data": {"name": f"P{n}"}})
+
+    errors = []
+    barrier = threading.Barrier(args.sessions * args.threads)
+    workers = [threading.Thread(target=_worker, args=(app.test_client(), sid, n, args.ops, errors, barrier))
+               for sid in sids for n in range(args.threads)]
+    start = time.perf_counter()
+    for t in workers: t.start()
+    for t in workers: t.join()
+    elapsed = time.perf_counter() - start
+
+    problems = [f"{path}: HTTP {code}" for path, code in errors[:10]]
+    for sid in sids:
+        problems += _check(sid, args.threads, args.ops)
+
+    total = args.sessions * args.threads * args.ops * 3
+    print(f"{total} записів у {args.sessions} сесіях за {elapsed:.2f} с ({total / elapsed:.0f} оп/с)")
+    if problems:
+        print("\n".join(problems))
+        return 1
+    print("OK: жодне оновлення не загубилось")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
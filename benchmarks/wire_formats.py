@@ -0,0 +1,83 @@
+"""
+Порівняння форматів обміну (core/wire.py) на реалістичному стані бою з 40 токенів.
+
+Токени будуються з монстрів dnd_data.sqlite3 так само, як це робить
+DataManager.add_creature_to_combat (посилання bestiary_ref), а для порівняння -
+у старому вигляді з вбудованими описами дій. Для кожного доступного
+формату та стиснення виводиться розмір і час кодування/декодування.
+
+Запуск з кореня репозиторію:
+    python -m benchmarks.wire_formats [--tokens 40] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+
+from core import wire
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dnd_data.sqlite3")
+
+
+def combat_state(n_tokens, embed_actions=False, seed=1):
+    rnd = random.Random(seed)
+    with sqlite3.connect(DB_PATH) as conn:
+        monsters = [json.loads(r[0]) for r in conn.execute("SELECT data FROM monsters")]
+    tokens = {}
+    for i in range(n_tokens):
+        if i < 4:
+            tokens[f"USER_{i:04d}"] = {"name": f"Player {i}", "x": rnd.randint(0, 19), "y": rnd.randint(0, 19),
+                                       "color": "#388E3C", "type": "player"}
+            continue
+        m = rnd.choice(monsters)
+        tok = {"name": m['name'], "x": rnd.randint(0, 19), "y": rnd.randint(0, 19), "color": "#D32F2F",
+               "type": "enemy", "bestiary_ref": m['index']}
+        if embed_actions:
+            acts = [{"name": a['name'], "desc": a['desc'], "type": "physical"} for a in m.get('actions', [])]
+            tok["init_bonus"] = (m.get('dexterity', 10) - 10) // 2
+            tok["actions"] = acts or [{"name": "Attack", "desc": "Basic", "type": "physical"}]
+        tokens[f"NPC_{i:04x}"] = tok
+    order = [{"uid": u, "name": t["name"], "total": rnd.randint(1, 25), "type": t["type"]} for u, t in tokens.items()]
+    order.sort(key=lambda x: x["total"], reverse=True)
+    return {"active": True, "round": 3, "turn_order": order, "current_turn_index": 5, "tokens": tokens, "rev": 120}
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    missing = [name for name, mod in (("msgpack", wire.msgpack), ("cbor2", wire.cbor2), ("zstandard", wire.zstandard))
+               if mod is None]
+    if missing: print(f"Не встановлено: {', '.join(missing)} - ці варіанти пропущено")
+
+    for title, embed in (("bestiary_ref", False), ("вбудовані actions", True)):
+        print(f"\n{args.tokens} токенів, {title}:")
+        _report(combat_state(args.tokens, embed), args.repeat)
+
+
+def _report(state, repeat):
+    print(f"{'формат':<22}{'байт':>9}{'%JSON':>8}{'кодування, мкс':>17}{'декодування, мкс':>19}")
+    base = None
+    for fmt in wire.FORMATS:
+        for encoding in (None,) + wire.ENCODINGS:
+            data = wire.compress(wire.dumps(state, fmt), encoding)
+            encode = _timeit(lambda: wire.compress(wire.dumps(state, fmt), encoding), repeat)
+            decode = _timeit(lambda: wire.loads(wire.decompress(data, encoding), fmt), repeat)
+            assert wire.loads(wire.decompress(data, encoding), fmt) == json.loads(json.dumps(state))
+            base = base or len(data)
+            name = fmt.split("/")[1] + (f"+{encoding}" if encoding else "")
+            print(f"{name:<22}{len(data):>9}{len(data) / base * 100:>7.0f}%{encode:>17.0f}{decode:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
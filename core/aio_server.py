@@ -0,0 +1,199 @@
+"""
+Асинхронний (asyncio/aiohttp) варіант вбудованого сервера.
+
+Ті самі маршрути й формат відповідей, що й у Flask-сервера з core/server.py,
+але всі з'єднання обслуговує один потік з event loop: long-poll /events не тримає
+окремого потоку на кожного клієнта, тож сотні гравців, що чекають подій, нічого не коштують.
+Операції запису виконуються прямо в event loop - вони тримають лок сесії лише мікросекунди;
+у пулі потоків - лише те, що чекає на диск (flush журналу сесій, перше перемотування історії).
+
+Вмикається через DataManager.start_server(backend="aiohttp") або python -m core.server --backend aiohttp.
+"""
+import asyncio
+import threading
+import weakref
+
+try:
+    from aiohttp import web
+except ImportError as e:
+    raise ImportError("Асинхронний сервер потребує пакет aiohttp (pip install aiohttp)") from e
+
+from core import server, wire
+
+
+class _EventWaiters:
+    """
+    Очікувачі подій по сесіях. Запис може статися в будь-якому потоці (Qt-хост пише напряму),
+    тому пробудження передається в event loop через call_soon_threadsafe. futures змінюються
+    лише в event loop.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.futures = {}  # {sid: set(Future)}
+
+    def notify(self, sid):
+        # Без перевірки self.futures з потоку запису: очікувач, що саме перевіряє курсор у loop,
+        # інакше міг би пропустити пробудження. _wake виконається після його перевірки
+        self.loop.call_soon_threadsafe(self._wake, sid)
+
+    def _wake(self, sid):
+        for fut in self.futures.pop(sid, ()):
+            if not fut.done(): fut.set_result(None)
+
+    async def wait(self, sid, cursor, timeout):
+        """Асинхронний аналог server._wait_events."""
+        deadline = self.loop.time() + timeout
+        while True:
+            cursor_now, kinds = server._pending_events(sid, cursor)
+            remaining = deadline - self.loop.time()
+            if kinds or cursor is None or remaining <= 0:
+                return cursor_now, kinds
+            fut = self.loop.create_future()
+            self.futures.setdefault(sid, set()).add(fut)
+            try:
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.futures.get(sid, set()).discard(fut)
+
+
+def _reply(request, result):
+    """Відповідь у форматі, який просить клієнт (див. core/wire.py)."""
+    body, status = result
+    if status == 304: return web.Response(status=304)
+    data, headers = wire.encode_response(body, request.headers.get("Accept"), request.headers.get("Accept-Encoding"))
+    return web.Response(body=data, status=status, headers=headers)
+
+
+async def _request_data(request):
+    return wire.decode_request(await request.read(), request.headers.get("Content-Type"),
+                               request.headers.get("Content-Encoding"))
+
+
+def _int_arg(request, name, default=None):
+    try:
+        return int(request.query[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _waits_for_disk(path, data):
+    """Чи операція чекає на диск: /session/update з flush (сама або всередині /batch)."""
+    if path == "/batch": return any(_waits_for_disk(op.get("path"), op.get("body") or {}) for op in data.get("ops", []))
+    return path == "/session/update" and bool(data.get("flush"))
+
+
+async def _run_op(op, path, data):
+    if _waits_for_disk(path, data): return await asyncio.get_running_loop().run_in_executor(None, op, data)
+    return op(data)
+
+
+def make_app(waiters):
+    routes = web.RouteTableDef()
+
+    @routes.get('/status')
+    async def get_status(request):
+        return _reply(request, ({"status": "running", "dm_id": "HOST"}, 200))
+
+    @routes.get('/session/{sid}')
+    async def get_session(request):
+        return _reply(request, server._read_session(request.match_info["sid"]))
+
+    @routes.get('/session/{sid}/players')
+    async def get_session_players(request):
+        return _reply(request, server._read_players(request.match_info["sid"]))
+
+    @routes.get('/sessions')
+    async def get_sessions(request):
+        return _reply(request, ({"sessions": server._announced_sessions()}, 200))
+
+    @routes.get('/logs/{sid}')
+    async def get_logs(request):
+        sid, uid = request.match_info["sid"], request.query.get("uid")
+        return _reply(request, server._read_logs(sid, _int_arg(request, "after", 0), uid))
+
+    @routes.get('/combat/state/{sid}')
+    async def get_combat_state(request):
+        return _reply(request, server._read_combat(request.match_info["sid"], _int_arg(request, "since")))
+
+    @routes.get('/history/{sid}')
+    async def get_history(request):
+        # Перше перемотування відновленої сесії читає її історію з диска
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, server._read_history, request.match_info["sid"], _int_arg(request, "at"))
+        return _reply(request, result)
+
+    @routes.get('/events/{sid}')
+    async def wait_events(request):
+        sid = request.match_info["sid"]
+        if sid not in server.db_store["sessions"]: return _reply(request, ({"error": "Not found"}, 404))
+        try:
+            timeout = min(float(request.query.get("timeout", 25)), server.EVENTS_MAX_TIMEOUT)
+        except ValueError:
+            timeout = 25
+        cursor, kinds = await waiters.wait(sid, _int_arg(request, "cursor"), timeout)
+        return _reply(request, ({"cursor": cursor, "kinds": kinds}, 200))
+
+    @routes.post('/batch')
+    async def batch(request):
+        return _reply(request, await _run_op(server._op_batch, "/batch", await _request_data(request)))
+
+    # Решта операцій запису - ті самі, що доступні в /batch
+    def write_route(path, op):
+        async def handler(request):
+            return _reply(request, await _run_op(op, path, await _request_data(request)))
+        return handler
+
+    for path, op in server.BATCH_OPS.items():
+        routes.post(path)(write_route(path, op))
+
+    app = web.Application()
+    app.add_routes(routes)
+    return app
+
+
+def _listener(waiters):
+    # Слабке посилання: зупинений сервер не тримається в server.event_listeners вічно
+    ref = weakref.ref(waiters)
+
+    def listener(sid):
+        w = ref()
+        if w is not None: w.notify(sid)
+    return listener
+
+
+async def serve(host, port, started=None):
+    """Запускає сервер у поточному event loop і працює, доки задачу не скасують."""
+    waiters = _EventWaiters(asyncio.get_running_loop())
+    listener = _listener(waiters)
+    server.event_listeners.append(listener)
+    runner = web.AppRunner(make_app(waiters), handle_signals=False)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        if started is not None: started.set()
+        await asyncio.Event().wait()
+    finally:
+        server.event_listeners.remove(listener)
+        await runner.cleanup()
+
+
+def start_in_thread(host='0.0.0.0', port=5000):
+    """
+    Запускає сервер у фоновому потоці зі своїм event loop (аналог app.run у потоці для Flask).
+    Помилку запуску (напр. зайнятий порт) піднімає тут же, не чекаючи таймауту.
+    """
+    started, failed = threading.Event(), []
+
+    def run():
+        try:
+            asyncio.run(serve(host, port, started))
+        except Exception as e:
+            failed.append(e)
+            started.set()
+
+    threading.Thread(target=run, name="aio-server", daemon=True).start()
+    started.wait(5)
+    if failed: raise failed[0]
@@ -0,0 +1,150 @@
+"""
+Нормалізований бестіарій у dnd_data.sqlite3: характеристики монстрів у типізованих колонках з індексами.
+
+monsters.data - непрозорий JSON, тож фільтр "CR 1-3, нежить" означав би розбір усіх рядків у Python.
+Міграція (migrate) витягує CR, XP, тип, розмір, КД, хіти, швидкість, характеристики та світогляд
+у monster_stats, а дії - у дочірню monster_actions (з неї їх бере токен, див. DataManager.resolve_token).
+Проєкція описана один раз - у представленнях *_source (JSON1 SQLite), - і тригери на monsters
+перебудовують рядки монстра при кожній зміні, тож доданий homebrew одразу потрапляє в запити
+без повторної міграції.
+"""
+import sqlite3
+
+from core import srd_schema
+
+SCHEMA_VERSION = 3  # збільшити, коли змінюється SCHEMA (див. core/srd_schema.py)
+SIZES = ("Tiny", "Small", "Medium", "Large", "Huge", "Gargantuan")
+
+SCHEMA = """
+DROP TRIGGER IF EXISTS monsters_stats_insert;
+DROP TRIGGER IF EXISTS monsters_stats_update;
+DROP TRIGGER IF EXISTS monsters_stats_delete;
+DROP VIEW IF EXISTS monster_stats_source;
+DROP VIEW IF EXISTS monster_actions_source;
+DROP TABLE IF EXISTS monster_actions;
+DROP TABLE IF EXISTS monster_stats;
+
+CREATE TABLE monster_stats (
+    index_name TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    cr REAL,
+    xp INTEGER,
+    type TEXT,
+    size TEXT,
+    ac INTEGER,
+    hp INTEGER,
+    speed INTEGER,  -- ходьба, фути
+    speeds TEXT,  -- усі швидкості: JSON {"walk": "30 ft.", "fly": ...}
+    strength INTEGER,
+    dexterity INTEGER,
+    constitution INTEGER,
+    intelligence INTEGER,
+    wisdom INTEGER,
+    charisma INTEGER,
+    alignment TEXT
+);
+CREATE INDEX monster_stats_cr ON monster_stats(cr, name);
+CREATE INDEX monster_stats_type ON monster_stats(type, cr);
+CREATE INDEX monster_stats_size ON monster_stats(size, cr);
+
+CREATE TABLE monster_actions (
+    monster TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    name TEXT,
+    description TEXT,
+    PRIMARY KEY (monster, pos)
+);
+
+CREATE VIEW monster_stats_source AS
+SELECT index_name, name,
+       CAST(json_extract(data, '$.challenge_rating') AS REAL),
+       json_extract(data, '$.xp'),
+       json_extract(data, '$.type'),
+       json_extract(data, '$.size'),
+       COALESCE(CASE json_type(data, '$.armor_class')
+                    WHEN 'array' THEN json_extract(data, '$.armor_class[0].value')
+                    ELSE json_extract(data, '$.armor_class') END, 10),
+       COALESCE(json_extract(data, '$.hit_points'), 10),
+       CAST(json_extract(data, '$.speed.walk') AS INTEGER),  -- "30 ft." -> 30
+       json_extract(data, '$.speed'),
+       json_extract(data, '$.strength'),
+       json_extract(data, '$.dexterity'),
+       json_extract(data, '$.constitution'),
+       json_extract(data, '$.intelligence'),
+       json_extract(data, '$.wisdom'),
+       json_extract(data, '$.charisma'),
+       json_extract(data, '$.alignment')
+FROM monsters;
+
+CREATE VIEW monster_actions_source AS
+SELECT m.index_name, CAST(a.key AS INTEGER), json_extract(a.value, '$.name'), json_extract(a.value, '$.desc')
+FROM monsters m, json_each(m.data, '$.actions') a;
+
+-- INSERT OR REPLACE у monsters (так їх заливає DataManager._seed_db_from_github) не запускає
+-- тригер DELETE, тому вставка теж спершу прибирає старі рядки монстра
+CREATE TRIGGER monsters_stats_insert AFTER INSERT ON monsters BEGIN
+    DELETE FROM monster_actions WHERE monster = NEW.index_name;
+    INSERT OR REPLACE INTO monster_stats SELECT * FROM monster_stats_source WHERE index_name = NEW.index_name;
+    INSERT INTO monster_actions SELECT * FROM monster_actions_source WHERE index_name = NEW.index_name;
+END;
+CREATE TRIGGER monsters_stats_update AFTER UPDATE ON monsters BEGIN
+    DELETE FROM monster_stats WHERE index_name = OLD.index_name;
+    DELETE FROM monster_actions WHERE monster = OLD.index_name;
+    INSERT INTO monster_stats SELECT * FROM monster_stats_source WHERE index_name = NEW.index_name;
+    INSERT INTO monster_actions SELECT * FROM monster_actions_source WHERE index_name = NEW.index_name;
+END;
+CREATE TRIGGER monsters_stats_delete AFTER DELETE ON monsters BEGIN
+    DELETE FROM monster_stats WHERE index_name = OLD.index_name;
+    DELETE FROM monster_actions WHERE monster = OLD.index_name;
+END;
+
+INSERT INTO monster_stats SELECT * FROM monster_stats_source;
+INSERT INTO monster_actions SELECT * FROM monster_actions_source;
+"""
+
+
+def migrate(conn):
+    """Створює (або перестворює застарілі) нормалізовані таблиці. True - міграцію виконано."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='monsters'").fetchone(): return False
+    return srd_schema.migrate(conn, "bestiary", SCHEMA_VERSION, SCHEMA)
+
+
+def query(conn, cr_range=None, type=None, size=None, limit=None, offset=0):
+    """
+    Монстри, відсортовані за CR та іменем: [{"index", "name", "cr", "xp", "type", "size", "ac", "hp", ...}].
+    cr_range - (від, до) включно, будь-яка межа може бути None; type і size - рядок або список рядків.
+    """
+    where, params = [], []
+    low, high = cr_range or (None, None)
+    if low is not None: where.append("cr >= ?"); params.append(low)
+    if high is not None: where.append("cr <= ?"); params.append(high)
+    srd_schema.where_in("type", type, where, params)
+    srd_schema.where_in("size", size, where, params)
+    sql = "SELECT * FROM monster_stats"
+    if where: sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY cr, name LIMIT ? OFFSET ?"
+    cursor = conn.execute(sql, params + [-1 if limit is None else limit, offset])
+    columns = ["index" if d[0] == "index_name" else d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def actions(conn, index):
+    """Дії монстра у порядку з SRD: [{"name", "desc"}]."""
+    rows = conn.execute("SELECT name, description FROM monster_actions WHERE monster = ? ORDER BY pos", (index,))
+    return [{"name": name, "desc": desc} for name, desc in rows]
+
+
+def facets(conn):
+    """Значення для фільтрів: {"types": [...], "sizes": [...] від меншого, "crs": [...]}."""
+    types = [r[0] for r in conn.execute("SELECT DISTINCT type FROM monster_stats WHERE type IS NOT NULL ORDER BY type")]
+    sizes = {r[0] for r in conn.execute("SELECT DISTINCT size FROM monster_stats")}
+    crs = [r[0] for r in conn.execute("SELECT DISTINCT cr FROM monster_stats WHERE cr IS NOT NULL ORDER BY cr")]
+    return {"types": types, "sizes": [s for s in SIZES if s in sizes] + sorted(sizes - set(SIZES) - {None}),
+            "crs": crs}
+
+
+def connect(db_path):
+    """З'єднання з базою SRD з виконаною міграцією (для використання з кількох потоків під локом)."""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    migrate(conn)
+    return conn
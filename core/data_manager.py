@@ -1,123 +1,64 @@
 import json
 import uuid
 import threading
-import socket
 import requests
-import math
 import random
 import sqlite3
 import os
 import time
-import copy
-from flask import Flask, request, jsonify
-from PySide6.QtCore import QDateTime, QObject, Signal
-
-# --- SERVER SIDE ---
-app = Flask(__name__)
-import logging
-
-log = logging.getLogger('werkzeug')
-log.setLevel(logging.ERROR)
-
-db_lock = threading.Lock()
-
-db_store = {
-    "sessions": {},
-    "active_session_id": None,
-    "items": {},
-    "combat_state": {}
-}
-
-
-@app.route('/status', methods=['GET'])
-def get_status(): return jsonify({"status": "running", "dm_id": "HOST"})
-
-
-@app.route('/session/<sid>', methods=['GET'])
-def get_session(sid):
-    with db_lock:
-        session = db_store["sessions"].get(sid)
-    return jsonify(session) if session else (jsonify({"error": "Not found"}), 404)
-
-
-@app.route('/session/new', methods=['POST'])
-def create_session():
-    data = request.json
-    sid = data.get("id")
-    with db_lock:
-        db_store["sessions"][sid] = data["data"]
-        db_store["active_session_id"] = sid
-        db_store["combat_state"][sid] = {
-            "active": False, "round": 0, "turn_order": [],
-            "current_turn_index": 0, "tokens": {}
-        }
-    return jsonify({"success": True})
-
-
-@app.route('/join', methods=['POST'])
-def join_player():
-    data = request.json
-    sid, uid, p_data = data.get("sid"), data.get("uid"), data.get("player_data")
-    with db_lock:
-        if sid in db_store["sessions"]:
-            db_store["sessions"][sid]["players"][uid] = p_data
-            log = {"type": "JOIN", "content": f"{p_data['name']} приєднався!", "timestamp": "NOW", "sender_id": "SYS",
-                   "is_secret": False}
-            db_store["sessions"][sid]["logs"].append(log)
-            return jsonify({"success": True})
-    return jsonify({"error": "No session"}), 404
-
-
-@app.route('/player/update', methods=['POST'])
-def update_player():
-    data = request.json
-    sid, uid, new_data = data.get("sid"), data.get("uid"), data.get("data")
-    with db_lock:
-        if sid in db_store["sessions"] and uid in db_store["sessions"][sid]["players"]:
-            db_store["sessions"][sid]["players"][uid].update(new_data)
-            return jsonify({"success": True})
-    return jsonify({"error": "Err"}), 404
-
-
-@app.route('/update/logs', methods=['POST'])
-def add_log():
-    data = request.json
-    sid, log = data.get("sid"), data.get("log")
-    with db_lock:
-        if sid in db_store["sessions"]:
-            db_store["sessions"][sid]["logs"].append(log)
-            return jsonify({"success": True})
-    return jsonify({"error": "Err"}), 404
-
-
-@app.route('/combat/state/<sid>', methods=['GET'])
-def get_combat_state_route(sid):
-    with db_lock:
-        state = db_store["combat_state"].get(sid, {})
-    return jsonify(state)
-
-
-@app.route('/combat/update', methods=['POST'])
-def update_combat_route():
-    data = request.json
-    sid = data.get("sid")
-    new_state = data.get("state")
-    with db_lock:
-        if sid in db_store["combat_state"]:
-            if "tokens" in new_state:
-                db_store["combat_state"][sid]["tokens"].update(new_state["tokens"])
-                temp_state = new_state.copy()
-                del temp_state["tokens"]
-                db_store["combat_state"][sid].update(temp_state)
-            else:
-                db_store["combat_state"][sid].update(new_state)
-            return jsonify({"success": True})
-    return jsonify({"error": "No session"}), 404
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PySide6.QtCore import QObject, Signal
+from core.state_hub import CombatStateHub
+from core.snapshot import FrozenDict, freeze
+from core import bestiary, discovery, equipment, search, server, wire
+from core.outbox import Outbox
+from core.srd_cache import SrdCache
+
+class _Lazy:
+    """Значення, що обчислюється один раз: при першому get() або заздалегідь у фоновому потоці."""
+
+    def __init__(self, load):
+        self._load = load
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+
+    def get(self):
+        if not self._done:
+            # Поки інший потік рахує значення, get() чекає на локу
+            with self._lock:
+                if not self._done: self._value, self._done = self._load(), True
+        return self._value
 
 
 # --- CLIENT ---
 class DataManager(QObject):
     _instance = None
+
+    # Push-сповіщення для поточної сесії (емітуються з фонового потоку подій)
+    logs_changed = Signal()
+    players_changed = Signal()
+    combat_changed = Signal()
+    connection_changed = Signal(bool)
+    move_rejected = Signal(str, str)  # uid токена, причина - хост відхилив хід, токен повернуто назад
+
+    # Поля токена монстра, які беруться з бестіарію, якщо токен їх не перевизначив: {поле токена: поле бестіарію}
+    BESTIARY_TOKEN_FIELDS = {"hp": "hp", "ac": "ac", "init_bonus": "initiative_bonus"}
+    SESSION_STORE_FILE = "sessions.sqlite3"  # збережені сесії хоста (див. core/session_store.py)
+    LAST_HOST_FILE = "last_host.json"  # останній хост, до якого підключався гравець (див. core/discovery.py)
+    SRD_CACHE_FILE = "srd_cache.bin"  # готові довідники SRD (див. core/srd_cache.py)
+    SRD_CACHE_VERSION = 2  # збільшити, коли змінюється побудова довідників у _load_*
+    SRD_SOURCE_TABLES = ("subraces", "subclasses", "races", "species", "classes", "monsters", "spells")
+    SERVER_BACKEND = "flask"  # вбудований сервер хоста: "flask" або "aiohttp" (див. core/aio_server.py)
+    EVENTS_TIMEOUT = 25  # сек, скільки сервер тримає long-poll запит
+    # Таймаути (сек) для різних типів запитів до хоста
+    HTTP_TIMEOUTS = {
+        "session": 2, "players": 1, "logs": 1, "combat_state": 0.5,
+        "write": 2, "batch": 2, "history": 2, "events": EVENTS_TIMEOUT + 5
+    }
     GITHUB_RAW_BASE = "https://raw.githubusercontent.com/5e-bits/5e-database/refs/heads/main/src/2014"
     FILES_MAP = {
         "races": "5e-SRD-Races.json", "classes": "5e-SRD-Classes.json", "monsters": "5e-SRD-Monsters.json",
@@ -126,39 +67,6 @@ class DataManager(QObject):
         "ability_scores": "5e-SRD-Ability-Scores.json"
     }
 
-    def add_object_to_combat(self, obj_type):
-        """
-        Додає неживий об'єкт на поле бою (стіна, бочка).
-        """
-        if not self._current_session_id: return
-
-        obj_definitions = {
-            "wall": {"name": "Стіна", "color": "#607D8B", "symbol": "█", "hp": 100},
-            "barrel": {"name": "Вибухова Бочка", "color": "#FF5722", "symbol": "🛢️", "hp": 10},
-            "trap": {"name": "Пастка", "color": "#9E9E9E", "symbol": "⚠", "hp": 5},
-            "chest": {"name": "Скриня", "color": "#FFC107", "symbol": "📦", "hp": 20}
-        }
-
-        definition = obj_definitions.get(obj_type)
-        if not definition: return
-
-        uid = f"OBJ_{str(uuid.uuid4())[:4]}"
-
-        # Додаємо як токен, але з типом 'object'
-        new_token = {
-            uid: {
-                "name": definition['name'],
-                "x": 0, "y": 0,
-                "color": definition['color'],
-                "type": "object",  # Важливо для логіки переміщення
-                "symbol": definition['symbol'],  # Для відображення на мапі
-                "hp": definition['hp'],
-                "max_hp": definition['hp']
-            }
-        }
-        self.update_combat_state({"tokens": new_token})
-        return uid
-
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(DataManager, cls).__new__(cls)
@@ -176,26 +84,47 @@ class DataManager(QObject):
         self.server_port = 5000
         self.server_url = f"http://{self.server_ip}:{self.server_port}"
         self._current_session_id = None
-
+        self._client_lock = threading.Lock()
+        # Пул keep-alive з'єднань до хоста + черга операцій для batch()
+        self._http = self._make_http_session()
+        self._batch_ops = None
+        # Формат тіл запитів: JSON, доки хост не покаже, що розуміє бінарний (див. core/wire.py)
+        self._wire_format = wire.JSON
+
+        # Асинхронний режим (див. set_async_mode): пули потоків, кеші та ключі запитів
+        self._async = False
+        self._read_pool = None
+        # Записи віддаленого клієнта: черга з повторами при обриві зв'язку (див. core/outbox.py)
+        self._link_up = threading.Event()  # зв'язок з хостом відновився
+        self._outbox = Outbox(self._deliver, on_online=self._set_online)
+        self._inflight = set()  # ключі запитів, що зараз виконуються
+        self._fresh = set()  # ключі кешів, актуальних після останньої події сервера
+        self._players_cache = {}  # {sid: players}
+        self._logs_cache = {}  # {sid: [видимі записи логу за зростанням seq]}
+
+        self._session_listener = None
         self.start_server()
 
         current_dir = os.path.dirname(os.path.abspath(__file__))
         project_root = os.path.dirname(current_dir)
         self.db_path = os.path.join(project_root, "dnd_data.sqlite3")
 
-        self.races = {};
-        self.classes = {};
-        self.skills_list = []
-        self.subrace_map = {};
-        self.subclass_map = {};
-        self.spells_data = {};
-        self.creature_bestiary = {}
-        self._client_lock = threading.Lock()
-
-        loaded = self._load_data_from_sqlite()
-        if not loaded:
-            self._seed_db_from_github()
-            if not self._load_data_from_sqlite(): self._load_fallbacks()
+        # Довідники SRD: кожна таблиця розбирається при першому зверненні (див. властивості races,
+        # classes...), а фоновий потік розбирає їх заздалегідь - старт не залежить від розміру бази.
+        # Якщо база не змінилась з минулого запуску, довідники беруться з готового знімка
+        self._srd_db = _Lazy(self._ensure_srd_db)
+        self._srd_cache = SrdCache(os.path.join(project_root, self.SRD_CACHE_FILE), self.db_path,
+                                   self.SRD_SOURCE_TABLES, self.SRD_CACHE_VERSION)
+        self._srd_snapshot = _Lazy(self._srd_cache.load)
+        loaders = {"subraces": self._load_subraces, "subclasses": self._load_subclasses, "races": self._load_races,
+                   "classes": self._load_classes, "monsters": self._load_monsters, "spells": self._load_spells}
+        self._srd = {name: _Lazy(lambda name=name, load=load: self._srd_table(name, load))
+                     for name, load in loaders.items()}
+        # З'єднання з базою SRD для запитів: бестіарій (core/bestiary.py), каталог спорядження
+        # (core/equipment.py) і пошук (core/search.py)
+        self._srd_conn = _Lazy(self._open_srd_conn)
+        self._srd_conn_lock = threading.Lock()
+        threading.Thread(target=self._preload_srd, name="srd-loader", daemon=True).start()
 
         self.master_items = {
             "dagger": {"name": "Dagger", "type": "Weapon", "subtype": "Melee", "damage": "1d4"},
@@ -220,8 +149,20 @@ class DataManager(QObject):
             "support": {"name": "❤️ Підтримка", "desc": "Допомога союзнику.", "type": "support",
                         "stat_options": ["int", "wis", "cha"], "effect_formula": "mod", "req_item_type": None}
         }
-        self._local_combat_state = {"active": False, "round": 0, "turn_order": [], "current_turn_index": 0,
-                                    "tokens": {}}
+        self._local_combat_state = freeze({"active": False, "round": 0, "turn_order": [], "current_turn_index": 0,
+                                           "tokens": {}})
+        # Кеш віддаленого стану бою для дельта-синхронізації (тільки для клієнтів)
+        self._remote_combat = None
+        self._remote_combat_rev = None
+        self._remote_combat_frozen = None  # знімок кешу, що віддається назовні
+        self._combat_hub = None
+        # Передбачені (ще не підтверджені хостом) ходи: {uid токена: (x, y, ревізія підтвердження або None)}
+        self._predicted_moves = {}
+
+        # Фоновий слухач подій сервера (замість таймерів у віджетах)
+        self._session_changed = threading.Event()
+        self._is_online = None
+        threading.Thread(target=self._event_loop, daemon=True).start()
 
     # --- DB LOGIC (Condensed for brevity, logic same as before) ---
     def _seed_db_from_github(self):
@@ -249,87 +190,153 @@ class DataManager(QObject):
         conn.commit();
         conn.close()
 
-    def _load_data_from_sqlite(self):
-        if not os.path.exists(self.db_path): return False
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            existing = {r[0] for r in cursor.fetchall()}
-            if not {'races', 'classes', 'monsters'}.issubset(existing): conn.close(); return False
+    def _ensure_srd_db(self):
+        """Завантажує базу SRD з GitHub, якщо локальної немає або в ній бракує основних таблиць."""
+        if not {'races', 'classes', 'monsters'}.issubset(self._srd_tables()):
+            self._seed_db_from_github()
+        return self._srd_tables()
 
-            # Subraces/Classes
-            try:
-                cursor.execute("SELECT data FROM subraces")
-                for r in cursor.fetchall():
-                    d = json.loads(r[0]);
-                    self.subrace_map.setdefault(d.get('race', {}).get('index'), []).append(d['name'])
-                cursor.execute("SELECT data FROM subclasses")
-                for r in cursor.fetchall():
-                    d = json.loads(r[0]);
-                    self.subclass_map.setdefault(d.get('class', {}).get('index'), []).append(d['name'])
-            except:
-                pass
+    def _srd_tables(self):
+        if not os.path.exists(self.db_path): return set()
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        except sqlite3.Error:
+            return set()
+
+    def _srd_rows(self, *tables):
+        """Розібрані дані рядків першої наявної з таблиць ([] - жодної немає)."""
+        existing = self._srd_db.get()
+        table = next((t for t in tables if t in existing), None)
+        if table is None: return []
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                return [json.loads(r[0]) for r in conn.execute(f'SELECT data FROM "{table}"')]
+        except (sqlite3.Error, ValueError):
+            return []
 
-            # Races
-            tbl = 'races' if 'races' in existing else 'species'
-            cursor.execute(f"SELECT data FROM {tbl}")
-            for r in cursor.fetchall():
-                d = json.loads(r[0]);
-                bns = {b['ability_score']['index']: b['bonus'] for b in d.get('ability_bonuses', [])}
-                self.races[d['name']] = {"speed": d.get('speed', 30), "bonuses": bns,
-                                         "subraces": self.subrace_map.get(d['index'], [])}
-
-            # Classes
-            cursor.execute("SELECT data FROM classes")
-            skills_set = set()
-            for r in cursor.fetchall():
-                d = json.loads(r[0]);
-                s_list = []
-                if d.get('proficiency_choices'):
-                    for o in d['proficiency_choices'][0]['from'].get('options', []):
-                        if 'item' in o: nm = o['item']['name'].replace('Skill: ', ''); s_list.append(
-                            nm); skills_set.add(nm)
-                self.classes[d['name']] = {"hit_die": d.get('hit_die', 8), "skills_count": 2,
-                                           "available_skills": s_list, "is_caster": 'spellcasting' in d,
-                                           "specializations": self.subclass_map.get(d['index'], [])}
-            self.skills_list = sorted(list(skills_set)) if skills_set else ["Athletics"]
-
-            # Monsters
-            self.creature_bestiary = {}
-            cursor.execute("SELECT data FROM monsters")
-            for r in cursor.fetchall():
-                m = json.loads(r[0]);
-                ac = 10
-                if m.get('armor_class'):
-                    raw = m['armor_class'];
-                    ac = raw[0].get('value', 10) if isinstance(raw, list) else raw
-                acts = [{"name": a['name'], "desc": a['desc'], "type": "physical"} for a in m.get('actions', [])]
-                if not acts: acts = [{"name": "Attack", "desc": "Basic", "type": "physical"}]
-                self.creature_bestiary[m['index']] = {"name": m['name'], "hp": m.get('hit_points', 10), "ac": ac,
-                                                      "initiative_bonus": (m.get('dexterity', 10) - 10) // 2,
-                                                      "symbol": m['name'][0], "actions": acts}
-
-            # Spells
-            self.spells_data = {}
-            if 'spells' in existing:
-                cursor.execute("SELECT data FROM spells")
-                for r in cursor.fetchall():
-                    s = json.loads(r[0]);
-                    for c in s.get('classes', []): self.spells_data.setdefault(c['name'], []).append(s['name'])
-                for k in self.spells_data: self.spells_data[k].sort()
-            conn.close();
-            return True
-        except:
-            return False
+    def _srd_table(self, name, load):
+        snapshot = self._srd_snapshot.get()
+        return snapshot[name] if snapshot and name in snapshot else load()
 
-    def _load_fallbacks(self):
-        self.races = {"Human": {"speed": 30, "bonuses": {"str": 1}, "subraces": []}}
-        self.classes = {
-            "Fighter": {"hit_die": 10, "skills_count": 2, "available_skills": ["Athletics"], "is_caster": False}}
-        self.skills_list = ["Athletics"]
-        self.creature_bestiary = {"goblin": {"name": "Goblin", "hp": 7, "ac": 15, "initiative_bonus": 2, "symbol": "G",
-                                             "actions": [{"name": "Scimitar", "desc": "1d6+2", "type": "physical"}]}}
+    def _preload_srd(self):
+        for name, table in self._srd.items():
+            try:
+                table.get()
+            except Exception as e:
+                print(f"SRD table {name} failed to load: {e}")
+                return
+        if self._srd_snapshot.get() is None:
+            self._srd_cache.save({name: table.get() for name, table in self._srd.items()})
+        try:
+            self._srd_conn.get()
+        except sqlite3.Error as e:
+            print(f"SRD index migration failed: {e}")
+
+    def _open_srd_conn(self):
+        """З'єднання для запитів з виконаними міграціями похідних таблиць (з будь-якого потоку під _srd_conn_lock)."""
+        self._srd_db.get()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Міграції незалежні: невдала ламає лише свої запити, а не бестіарій, каталог і пошук разом
+        for schema in (bestiary, equipment, search):
+            try:
+                schema.migrate(conn)
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"SRD migration {schema.__name__} failed: {e}")
+        return conn
+
+    @contextmanager
+    def _srd_query(self):
+        conn = self._srd_conn.get()
+        with self._srd_conn_lock:
+            yield conn
+
+    def _load_subraces(self):
+        subrace_map = {}
+        for d in self._srd_rows("subraces"):
+            subrace_map.setdefault(d.get('race', {}).get('index'), []).append(d['name'])
+        return subrace_map
+
+    def _load_subclasses(self):
+        subclass_map = {}
+        for d in self._srd_rows("subclasses"):
+            subclass_map.setdefault(d.get('class', {}).get('index'), []).append(d['name'])
+        return subclass_map
+
+    def _load_races(self):
+        races = {}
+        for d in self._srd_rows("races", "species"):
+            bns = {b['ability_score']['index']: b['bonus'] for b in d.get('ability_bonuses', [])}
+            races[d['name']] = {"speed": d.get('speed', 30), "bonuses": bns,
+                                "subraces": self.subrace_map.get(d['index'], [])}
+        return races or {"Human": {"speed": 30, "bonuses": {"str": 1}, "subraces": []}}
+
+    def _load_classes(self):
+        """(класи, усі навички, які можна обрати)."""
+        classes, skills_set = {}, set()
+        for d in self._srd_rows("classes"):
+            s_list = []
+            if d.get('proficiency_choices'):
+                for o in d['proficiency_choices'][0]['from'].get('options', []):
+                    if 'item' in o: nm = o['item']['name'].replace('Skill: ', ''); s_list.append(
+                        nm); skills_set.add(nm)
+            classes[d['name']] = {"hit_die": d.get('hit_die', 8), "skills_count": 2,
+                                  "available_skills": s_list, "is_caster": 'spellcasting' in d,
+                                  "specializations": self.subclass_map.get(d['index'], [])}
+        if not classes:
+            classes = {"Fighter": {"hit_die": 10, "skills_count": 2, "available_skills": ["Athletics"], "is_caster": False}}
+        return classes, sorted(skills_set) if skills_set else ["Athletics"]
+
+    def _load_monsters(self):
+        bestiary = {}
+        for m in self._srd_rows("monsters"):
+            ac = 10
+            if m.get('armor_class'):
+                raw = m['armor_class'];
+                ac = raw[0].get('value', 10) if isinstance(raw, list) else raw
+            # Дії тут не зберігаємо: вони в нормалізованій monster_actions (див. monster_actions)
+            bestiary[m['index']] = {"name": m['name'], "hp": m.get('hit_points', 10), "ac": ac,
+                                    "initiative_bonus": (m.get('dexterity', 10) - 10) // 2,
+                                    "symbol": m['name'][0]}
+        return bestiary or {"goblin": {"name": "Goblin", "hp": 7, "ac": 15, "initiative_bonus": 2, "symbol": "G",
+                                       "actions": [{"name": "Scimitar", "desc": "1d6+2", "type": "physical"}]}}
+
+    def _load_spells(self):
+        spells_data = {}
+        for s in self._srd_rows("spells"):
+            for c in s.get('classes', []): spells_data.setdefault(c['name'], []).append(s['name'])
+        for k in spells_data: spells_data[k].sort()
+        return spells_data
+
+    # Таблиці SRD; перше звернення чекає, доки таблицю розбере фоновий потік
+    @property
+    def subrace_map(self):
+        return self._srd["subraces"].get()
+
+    @property
+    def subclass_map(self):
+        return self._srd["subclasses"].get()
+
+    @property
+    def races(self):
+        return self._srd["races"].get()
+
+    @property
+    def classes(self):
+        return self._srd["classes"].get()[0]
+
+    @property
+    def skills_list(self):
+        return self._srd["classes"].get()[1]
+
+    @property
+    def creature_bestiary(self):
+        return self._srd["monsters"].get()
+
+    @property
+    def spells_data(self):
+        return self._srd["spells"].get()
 
     # --- GETTERS ---
     def get_inventory(self, uid):
@@ -358,7 +365,11 @@ class DataManager(QObject):
         return self._current_session_id
 
     def set_current_session(self, sid):
-        self._current_session_id = sid
+        old, self._current_session_id = self._current_session_id, sid
+        self._reset_combat_cache()
+        self._session_changed.set()
+        # Потік подій міг чекати на попередній сесії - нехай перейде на нову
+        if old: server._wake(old)
 
     def get_backgrounds(self):
         return ["Soldier", "Noble", "Acolyte", "Criminal"]
@@ -369,6 +380,19 @@ class DataManager(QObject):
     def get_spells_for_class(self, c):
         return self.spells_data.get(c, [])
 
+    def search(self, text, kinds=None, limit=20):
+        """
+        Повнотекстовий пошук по SRD (core/search.py): [{"kind", "index", "name", "snippet"}] від найкращого збігу.
+        kinds - "monsters", "spells", "equipment", "traits" або їх список; кожне слово text шукається як префікс.
+        """
+        with self._srd_query() as conn:
+            return search.search(conn, text, kinds, limit)
+
+    def get_equipment_item(self, index):
+        """Предмет каталогу спорядження у форматі master_items (для інвентаря) або None."""
+        with self._srd_query() as conn:
+            return equipment.item(conn, index)
+
     def calculate_max_fatigue(self, hp):
         return int(hp * 1.5)
 
@@ -379,32 +403,277 @@ class DataManager(QObject):
         return "1d8"
 
     # Server & Session
-    def start_server(self):
+    def start_server(self, backend=None):
+        """
+        Запускає хост (core/server.py) у цьому процесі. backend: "flask" (за замовчуванням, потік на запит)
+        або "aiohttp" (один event loop на всі з'єднання, потрібен пакет aiohttp). Повторний виклик нічого не робить.
+        """
         self.is_host = True
-        threading.Thread(target=lambda: app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False),
-                         daemon=True).start()
+        try:
+            server.start_in_thread(backend or self.SERVER_BACKEND, port=self.server_port)
+        except OSError as e:
+            # Напр. порт зайняв інший процес: локально все працює, лише гравці з мережі не підключаться
+            print(f"Server not started on port {self.server_port}: {e}")
+        server.start_announcer(self.server_port)
+
+    def connect_to_host(self, ip):
+        """Працювати з окремим headless-хостом (python -m core.server) замість вбудованого - все через мережу."""
+        self.is_host = False
+        self.set_host_address(ip)
+
+    # --- LAN DISCOVERY ---
+    def start_discovery(self):
+        """
+        Запускає (один раз) фоновий пошук сесій у мережі і повертає discovery.SessionListener:
+        listener.sessions() - знайдені сесії, listener.wait(timeout) - дочекатися першої.
+        """
+        if self._session_listener is None:
+            self._session_listener = discovery.SessionListener().start()
+        return self._session_listener
+
+    def last_host(self):
+        """Рядок підключення "IP[:ПОРТ]/ID" до останньої сесії, до якої вдалося підключитися, або None."""
+        last = discovery.load_last_host(os.path.join(os.path.dirname(self.db_path), self.LAST_HOST_FILE))
+        return f"{last['ip']}/{last['sid']}" if last else None
+
+    # --- HTTP CLIENT ---
+    @staticmethod
+    def _make_http_session():
+        """HTTP-сесія з пулом keep-alive з'єднань та повторами з backoff при обриві з'єднання."""
+        # POST повторюємо лише якщо з'єднання не встановилось (запит точно не дійшов)
+        retry = Retry(total=2, connect=2, read=1, status=0, backoff_factor=0.1,
+                      allowed_methods=frozenset({"GET"}))
+        session = requests.Session()
+        session.headers["Accept"] = wire.accept_header()
+        session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=retry))
+        return session
+
+    def _http_get(self, path, kind, **kwargs):
+        return self._http.get(f"{self.server_url}{path}", timeout=self.HTTP_TIMEOUTS[kind], **kwargs)
+
+    def _learn_wire_format(self, r):
+        """Хост відповів бінарним форматом - отже розуміє його, надалі пишемо в ньому ж."""
+        fmt = r.headers.get("Content-Type", "").split(";")[0]
+        if fmt in wire.BINARY_FORMATS: self._wire_format = fmt
+
+    def _decode(self, r):
+        """Тіло відповіді хоста (JSON, msgpack або CBOR - за Content-Type)."""
+        self._learn_wire_format(r)
+        return wire.loads(r.content, r.headers.get("Content-Type"))
+
+    def _http_post(self, path, body, kind="write"):
+        """
+        Запис на хост через чергу записів (порядок зберігається, при обриві - повтори).
+        Всередині batch() операція лише додається до пачки. У синхронному режимі чекає
+        відправки (не довше за таймаут запиту). False - черга переповнена, запис відкинуто.
+        """
+        if self._batch_ops is not None:
+            self._batch_ops.append({"path": path, "body": body})
+            return True
+        return self._enqueue(path, body, self.HTTP_TIMEOUTS[kind]) is not None
+
+    def _enqueue(self, path, body, timeout, on_result=None):
+        coalesce_key, merge = None, None
+        if path == "/player/update" and on_result is None:
+            # Патчі персонажа зливаються на хості полями верхнього рівня - так само й тут
+            coalesce_key = (path, body.get("sid"), body.get("uid"))
+            merge = lambda old, new: dict(new, data={**old["data"], **new["data"]})
+        item = self._outbox.put(path, body, timeout, coalesce_key, merge, on_result)
+        if item is None:
+            print(f"Write queue full ({self._outbox.max_pending}), dropped POST {path}")
+        elif not self._async:
+            item.done.wait(timeout)
+        return item
+
+    def _deliver(self, path, body, timeout):
+        """
+        Відправка одного запису з черги: (HTTP статус, тіло відповіді). ConnectionError - запит не дійшов до хоста
+        (черга його повторить); таймаут відповіді - інший виняток: хост міг запис уже виконати.
+        Будь-яка відповідь хоста - доставлений запис, навіть помилка з не-JSON тілом (напр. HTML 500).
+        """
+        try:
+            r = self._post(f"{self.server_url}{path}", body, timeout)
+        except requests.ConnectionError as e:  # у т.ч. ConnectTimeout; ReadTimeout сюди не потрапляє
+            raise ConnectionError(str(e)) from e
+        # 503 - воркер за маршрутизатором (core/router.py) перезапускається: повторити, як при обриві
+        if r.status_code == 503: raise ConnectionError(f"HTTP 503 for {path}")
+        try:
+            resp = self._decode(r) or {}
+        except ValueError:
+            resp = None
+        if r.status_code >= 400:
+            print(f"POST {path} rejected: HTTP {r.status_code}")
+            if not isinstance(resp, dict) or "error" not in resp: resp = {"error": f"HTTP {r.status_code}"}
+        return r.status_code, resp if resp is not None else {}
+
+    def flush_writes(self, timeout=None):
+        """Чекає, доки всі записи дійдуть до хоста. False - не встигли за timeout (напр. немає зв'язку)."""
+        return self._outbox.flush(timeout)
+
+    def _post(self, url, body, timeout):
+        data, headers = wire.encode_request(body, self._wire_format)
+        r = self._http.post(url, data=data, headers=headers, timeout=timeout)
+        self._learn_wire_format(r)
+        return r
+
+    def _send_command(self, path, body, on_result):
+        """
+        Запис з обробкою відповіді: on_result(HTTP статус або None, тіло відповіді) викликається з потоку
+        черги записів, коли хост відповів (при обриві зв'язку запис чекає в черзі). None - черга переповнена.
+        """
+        if self._enqueue(path, body, self.HTTP_TIMEOUTS["write"], on_result) is None:
+            on_result(None, {"error": "Забагато невідправлених записів"})
 
-    def set_host_address(self, ip):
-        self.server_url = f"http://{ip}:5000"
+    # --- ASYNC MODE ---
+    def set_async_mode(self, enabled=True):
+        """
+        Асинхронний режим віддаленого клієнта: мережеві запити не блокують GUI-потік.
+        Геттери (get_combat_state, get_session_players, get_session_updates) одразу
+        повертають останній відомий стан і запускають оновлення у фоні; коли свіжі дані
+        прийшли - емітуються combat_changed / players_changed / logs_changed.
+        Записи відправляються у фоні по одному, в порядку викликів.
+        """
+        if enabled and self._read_pool is None:
+            self._read_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dm-read")
+        self._async = enabled
+
+    def _refresh_async(self, key, fetch, changed_signal):
+        """
+        Запускає fetch() у фоні, якщо кеш key застарів і такий запит ще не виконується.
+        fetch повертає True, якщо кеш змінився - тоді емітується changed_signal.
+        """
+        with self._client_lock:
+            if key in self._fresh or key in self._inflight: return
+            # Кеш свіжий з початку запиту: подія, що прийде під час нього, знову його застарить
+            self._fresh.add(key)
+            self._inflight.add(key)
+
+        def run():
+            try:
+                changed = fetch()
+            except Exception:
+                with self._client_lock:
+                    self._fresh.discard(key)
+                    self._inflight.discard(key)
+                self._set_online(False)
+                return
+            with self._client_lock:
+                self._inflight.discard(key)
+                stale = key not in self._fresh
+            self._set_online(True)
+            if changed: changed_signal.emit()
+            # Відповідь могла не врахувати подію, що прийшла під час запиту
+            if stale: self._refresh_async(key, fetch, changed_signal)
+
+        self._read_pool.submit(run)
+
+    def _mark_stale(self, sid, kinds):
+        """Сервер повідомив про зміни - відповідні кеші треба перезавантажити."""
+        with self._client_lock:
+            for k in kinds: self._fresh.discard((k, sid))
+
+    @contextmanager
+    def batch(self):
+        """
+        Відправляє всі записи (бій, логи, персонаж) зроблені всередині блоку одним запитом /batch:
+
+            with dm.batch():
+                dm.send_combat_command(...)
+                dm.push_session_update(...)
+
+        На хості операції виконуються одразу, як і без batch().
+        """
+        if self._batch_ops is not None:
+            yield
+            return
+        self._batch_ops = []
+        try:
+            yield
+        finally:
+            ops, self._batch_ops = self._batch_ops, None
+            if ops: self._http_post("/batch", {"ops": ops}, kind="batch")
+
+    def set_host_address(self, address):
+        """address - "IP" (хост на self.server_port) або "IP:ПОРТ"."""
+        self.server_url = f"http://{address}" if ":" in address else f"http://{address}:{self.server_port}"
+
+    def enable_persistence(self):
+        """
+        Зберігати сесії вбудованого хоста на диск (SESSION_STORE_FILE поруч з dnd_data.sqlite3) і відновити
+        збережені. Окремий хост зберігає сесії сам (python -m core.server --store ...).
+        """
+        if not self.is_host: return
+        server.enable_session_store(os.path.join(os.path.dirname(self.db_path), self.SESSION_STORE_FILE))
+
+    # Записи йдуть через ті самі операції, що й HTTP-маршрути хоста (server.BATCH_OPS):
+    # у процесі хоста - напряму, у клієнта - через чергу записів
+    def _write(self, path, body):
+        """Запис без очікування відповіді. True - виконано (на хості) або поставлено в чергу."""
+        if self.is_host: return server.BATCH_OPS[path](body)[1] == 200
+        return self._http_post(path, body)
+
+    def _call(self, path, body):
+        """Запис з відповіддю хоста: (тіло відповіді, HTTP статус); статус None - хост не відповів вчасно."""
+        if self.is_host: return server.BATCH_OPS[path](body)
+        timeout = self.HTTP_TIMEOUTS["write"]
+        item = self._enqueue(path, body, timeout)
+        if item is None or not item.done.wait(timeout): return {}, None
+        status, resp = item.result
+        return resp, status
 
     def start_new_session(self):
+        self.enable_persistence()
         sid = "SESS_" + str(uuid.uuid4())[:4].upper()
-        with db_lock:
-            db_store["sessions"][sid] = {"status": "ACTIVE", "players": {}, "logs": [], "dm_id": self.user_id}
-            db_store["combat_state"][sid] = {"active": False, "round": 0, "turn_order": [], "current_turn_index": 0,
-                                             "tokens": {}}
-        self._current_session_id = sid
+        _, status = self._call("/session/new", {"id": sid, "data": {"status": "ACTIVE", "players": {}, "logs": [],
+                                                                    "dm_id": self.user_id}})
+        if status != 200: return None
+        self.set_current_session(sid)
         return sid
 
     def stop_session(self, sid):
+        self._write("/session/update", {"sid": sid, "uid": self.user_id, "fields": {"status": "INACTIVE"}})
         return True
 
+    def save_session_state(self, sid, state_data=None):
+        """
+        Фіксує стан сесії на диску хоста. Зміни і так журналюються по ходу гри, тому збереження
+        лише дописує мітку часу та дані DM (state_data) і чекає, доки черга запису спорожніє.
+        """
+        self.enable_persistence()
+        fields = {"last_save": time.strftime("%d.%m.%Y %H:%M:%S"), "saved_state": state_data or {}}
+        resp, status = self._call("/session/update", {"sid": sid, "uid": self.user_id, "fields": fields, "flush": True})
+        return status == 200 and resp.get("saved", False)
+
+    def load_session_state(self, sid):
+        """
+        Збережена сесія: {"status", "last_save", "players_snapshot", ...дані DM з save_session_state}.
+        None - такої сесії немає.
+        """
+        self.enable_persistence()
+        if self.is_host:
+            session = server.db_store["sessions"].get(sid)
+        else:
+            try:
+                r = self._http_get(f"/session/{sid}", "session")
+                session = self._decode(r) if r.status_code == 200 else None
+            except Exception:
+                session = None
+        if session is None: return None
+        return {**session.get("saved_state", {}), "status": session.get("status"),
+                "last_save": session.get("last_save", "---"), "players_snapshot": session["players"]}
+
     def join_session(self, cs):
+        """Підключення за рядком "IP[:ПОРТ]/ID" (знайдена в мережі сесія, last_host()) або "ID" на цьому комп'ютері."""
         try:
             ip, sid = cs.split("/") if "/" in cs else ("127.0.0.1", cs)
             self.set_host_address(ip)
-            if requests.get(f"{self.server_url}/session/{sid}", timeout=2).status_code == 200:
-                self._current_session_id = sid;
+            # Перевірка, що сесія є, - найлегшим читанням (без логу)
+            if self._http_get(f"/session/{sid}/players", "players").status_code == 200:
+                # Сесія з цього ж процесу читається напряму, інакше - через HTTP
+                self.is_host = sid in server.db_store["sessions"]
+                self.set_current_session(sid)
+                # Наступного разу підключаємось сюди ж напряму, без пошуку в мережі
+                discovery.save_last_host(os.path.join(os.path.dirname(self.db_path), self.LAST_HOST_FILE), ip, sid)
                 return True
         except:
             pass
@@ -412,43 +681,120 @@ class DataManager(QObject):
 
     def get_session_players(self, sid):
         if self.is_host:
-            with db_lock: return copy.deepcopy(db_store["sessions"].get(sid, {}).get("players", {}))
+            return server.db_store["sessions"].get(sid, {}).get("players", FrozenDict())
+        if self._async:
+            self._refresh_async(("players", sid), lambda: self._fetch_players(sid), self.players_changed)
+            with self._client_lock: return self._players_cache.get(sid, FrozenDict())
         try:
-            return requests.get(f"{self.server_url}/session/{sid}", timeout=1).json().get("players", {})
+            return self._decode(self._http_get(f"/session/{sid}/players", "players")).get("players", {})
         except:
             return {}
 
-    def get_session_updates(self, sid):
+    def _fetch_players(self, sid):
+        players = freeze(self._decode(self._http_get(f"/session/{sid}/players", "players")).get("players", {}))
+        with self._client_lock:
+            changed = self._players_cache.get(sid) != players
+            self._players_cache[sid] = players
+        return changed
+
+    def get_session_updates(self, sid, after=0):
+        """Нові записи логу (seq > after), видимі цьому користувачу. None - немає зв'язку."""
         if self.is_host:
-            with db_lock: return copy.deepcopy(db_store["sessions"].get(sid, {}).get("logs", []))
+            return server._logs_after(sid, after, self.user_id)
+        if self._async:
+            self._refresh_async(("log", sid), lambda: self._fetch_logs(sid), self.logs_changed)
+            with self._client_lock:
+                cached = self._logs_cache.get(sid, [])
+                i = len(cached)
+                while i and cached[i - 1].get("seq", 0) > after: i -= 1
+                return cached[i:]
         try:
-            return requests.get(f"{self.server_url}/session/{sid}", timeout=1).json().get("logs", [])
+            r = self._http_get(f"/logs/{sid}", "logs", params={"after": after, "uid": self.user_id})
+            return self._decode(r).get("logs", [])
         except:
-            return []
+            return None
+
+    def _fetch_logs(self, sid):
+        """Дотягує в кеш записи логу після останнього відомого seq."""
+        with self._client_lock:
+            cached = self._logs_cache.setdefault(sid, [])
+            last = cached[-1].get("seq", 0) if cached else 0
+        r = self._http_get(f"/logs/{sid}", "logs", params={"after": last, "uid": self.user_id})
+        new = self._decode(r).get("logs", [])
+        with self._client_lock:
+            cached = self._logs_cache[sid]
+            last = cached[-1].get("seq", 0) if cached else 0
+            cached.extend(freeze(l) for l in new if l.get("seq", 0) > last)
+        return bool(new)
+
+    # --- PUSH EVENTS ---
+    def _set_online(self, online):
+        if online != self._is_online:
+            self._is_online = online
+            if online:
+                # Зв'язок повернувся: черга записів і потік подій повторюють спроби негайно
+                self._outbox.kick()
+                self._link_up.set()
+            self.connection_changed.emit(online)
+
+    def _event_loop(self):
+        """
+        Фоновий потік: чекає подій поточної сесії (локально або long-poll через HTTP)
+        і перетворює їх на Qt-сигнали logs_changed / players_changed / combat_changed.
+        """
+        signals = {"log": self.logs_changed, "players": self.players_changed, "combat": self.combat_changed}
+        # Окремий пул: long-poll не повинен займати з'єднання, потрібні UI
+        http = self._make_http_session()
+        sid, cursor, fails = None, None, 0
+        while True:
+            if sid != self._current_session_id:
+                sid, cursor = self._current_session_id, None
+            if not sid:
+                self._session_changed.wait()
+                self._session_changed.clear()
+                continue
+            try:
+                if self.is_host:
+                    new_cursor, kinds = server._wait_events(sid, cursor, self.EVENTS_TIMEOUT,
+                                                     cancelled=lambda s=sid: s != self._current_session_id)
+                else:
+                    r = http.get(f"{self.server_url}/events/{sid}",
+                                 params={"cursor": cursor, "timeout": self.EVENTS_TIMEOUT},
+                                 timeout=self.HTTP_TIMEOUTS["events"])
+                    r.raise_for_status()
+                    data = self._decode(r)
+                    new_cursor, kinds = data["cursor"], data["kinds"]
+            except Exception:
+                self._set_online(False)
+                fails += 1
+                # Невідомий курсор після відновлення = "змінилось усе": кеші дотягнуть лише дельти
+                # (бій - з останньої відомої ревізії, лог - після останнього seq)
+                cursor = None
+                first, longest = Outbox.RECONNECT_BACKOFF
+                self._link_up.clear()
+                self._link_up.wait(min(first * 2 ** (fails - 1), longest) * random.uniform(0.8, 1.2))
+                continue
+            fails = 0
+            self._set_online(True)
+            if sid != self._current_session_id: continue
+            cursor = new_cursor
+            self._mark_stale(sid, kinds)
+            for k in kinds: signals[k].emit()
 
     def get_dm_id(self, sid):
         return "HOST" if self.is_host else None
 
     def save_character(self, data):
         if not self._current_session_id: return data
-        try:
-            requests.post(f"{self.server_url}/join",
-                          json={"sid": self._current_session_id, "uid": self.user_id, "player_data": data}); return data
-        except:
-            return data
+        self._write("/join", {"sid": self._current_session_id, "uid": self.user_id, "player_data": data})
+        return data
 
     def update_character_data(self, p):
-        if self.is_host:
-            with db_lock:
-                db_store["sessions"].get(self._current_session_id, {}).get("players", {}).get(self.user_id, {}).update(
-                    p)
-        else:
-            requests.post(f"{self.server_url}/player/update",
-                          json={"sid": self._current_session_id, "uid": self.user_id, "data": p})
+        return self._write("/player/update", {"sid": self._current_session_id, "uid": self.user_id, "data": p})
 
-    def add_object_to_combat(self, obj_type):
+    def add_object_to_combat(self, obj_type, x=0, y=0):
         """
-        Додає неживий об'єкт на поле бою (стіна, бочка).
+        Додає неживий об'єкт на поле бою (стіна, бочка) у клітинку x, y.
         """
         if not self._current_session_id: return
 
@@ -468,7 +814,7 @@ class DataManager(QObject):
         new_token = {
             uid: {
                 "name": definition['name'],
-                "x": 0, "y": 0,
+                "x": x, "y": y,
                 "color": definition['color'],
                 "type": "object",  # Важливо для логіки переміщення
                 "symbol": definition['symbol'],  # Для відображення на мапі
@@ -477,26 +823,14 @@ class DataManager(QObject):
                 "visible": True  # За замовчуванням видно всім
             }
         }
-        # Використовуємо update, щоб додати до існуючих, а не перезаписати все
-        # Але тут треба бути обережним з реалізацією update_combat_state
-        # Найбезпечніше: отримати поточні, додати, зберегти.
-
-        current_state = self.get_combat_state()
-        tokens = current_state.get("tokens", {})
-        tokens.update(new_token)
-
-        self.update_combat_state({"tokens": tokens})
+        self.spawn_token(uid, new_token[uid])
         return uid
 
     def push_session_update(self, sid, c, t="MESSAGE", is_secret=False):
         if not sid: return
-        l = {"type": t, "content": c, "timestamp": QDateTime.currentDateTime().toString("hh:mm"),
-             "sender_id": self.user_id, "is_secret": is_secret}
-        if self.is_host:
-            with db_lock:
-                db_store["sessions"].get(sid, {}).get("logs", []).append(l)
-        else:
-            requests.post(f"{self.server_url}/update/logs", json={"sid": sid, "log": l})
+        l = {"type": t, "content": c, "timestamp": time.strftime("%H:%M"), "sender_id": self.user_id,
+             "is_secret": is_secret}
+        return self._write("/update/logs", {"sid": sid, "log": l})
 
     def subscribe_to_players(self, s, cb):
         cb(self.get_session_players(s))
@@ -514,64 +848,234 @@ class DataManager(QObject):
     def get_bestiary(self):
         return self.creature_bestiary
 
+    def query_bestiary(self, cr_range=None, type=None, size=None, limit=None, offset=0):
+        """
+        Монстри з фільтрами, відсортовані за CR та іменем - див. core/bestiary.query.
+        Відповідає SQL по індексах, тож не залежить від кількості монстрів у базі.
+        """
+        with self._srd_query() as conn:
+            return bestiary.query(conn, cr_range, type, size, limit, offset)
+
+    def monster_actions(self, k):
+        """
+        Дії монстра для токена: [{"name", "desc", "type"}] з таблиці monster_actions (core/bestiary.actions).
+        Без бази SRD - дії вбудованого бестіарію; монстр без дій отримує базову атаку.
+        """
+        try:
+            with self._srd_query() as conn:
+                acts = bestiary.actions(conn, k)
+        except sqlite3.Error:
+            acts = []
+        if not acts: acts = (self.creature_bestiary.get(k) or {}).get("actions", [])
+        return [{"type": "physical", **a} for a in acts] or [{"name": "Attack", "desc": "Basic", "type": "physical"}]
+
+    def get_bestiary_facets(self):
+        """Доступні значення фільтрів бестіарію: {"types", "sizes", "crs"}."""
+        with self._srd_query() as conn:
+            return bestiary.facets(conn)
+
+    def query_equipment(self, type=None, category=None, cost_range=None, weight_range=None, text=None,
+                        limit=None, offset=0):
+        """
+        Сторінка каталогу спорядження (SRD і homebrew з таблиці equipment) - див. core/equipment.query.
+        Фільтри відповідають SQL по індексах, тож сторінка не залежить від розміру каталогу.
+        """
+        with self._srd_query() as conn:
+            return equipment.query(conn, type, category, cost_range, weight_range, text, limit, offset)
+
+    def get_equipment_facets(self):
+        """Доступні значення фільтрів каталогу: {"types", "categories"}."""
+        with self._srd_query() as conn:
+            return equipment.facets(conn)
+
+    @property
+    def combat_hub(self):
+        """Спільний CombatStateHub: одне читання стану бою на всі підписані віджети."""
+        if self._combat_hub is None: self._combat_hub = CombatStateHub(self)
+        return self._combat_hub
+
+    def _reset_combat_cache(self):
+        with self._client_lock:
+            self._predicted_moves.clear()
+            self._remote_combat = None
+            self._remote_combat_rev = None
+            self._remote_combat_frozen = None
+
+    def _merge_combat_delta(self, data):
+        """Застосовує відповідь /combat/state (повну або дельту) до локального кешу."""
+        if not data.get("delta") or self._remote_combat is None:
+            data.pop("delta", None)
+            data.pop("removed", None)
+            self._remote_combat = data
+        else:
+            cache = self._remote_combat
+            cache["tokens"].update(data.pop("tokens", {}))
+            for u in data.pop("removed", []): cache["tokens"].pop(u, None)
+            data.pop("delta")
+            cache.update(data)
+        self._remote_combat_rev = self._remote_combat.get("rev")
+        self._remote_combat_frozen = None
+
+    def _fetch_combat_state(self, sid):
+        """Тягне з хоста зміни бою в локальний кеш. Повертає True, якщо стан змінився."""
+        # Просимо лише зміни після останньої відомої ревізії (304 - нічого не змінилось)
+        params = {"since": self._remote_combat_rev} if self._remote_combat_rev is not None else None
+        r = self._http_get(f"/combat/state/{sid}", "combat_state", params=params)
+        if r.status_code == 304: return False
+        with self._client_lock:
+            # За час запиту користувач міг перейти в іншу сесію
+            if sid != self._current_session_id: return False
+            self._merge_combat_delta(self._decode(r))
+        return True
+
     def get_combat_state(self):
-        if not self._current_session_id: return copy.deepcopy(self._local_combat_state)
+        """
+        Незмінний знімок (FrozenDict) стану бою поточної сесії.
+        На хості це просто посилання на поточну версію - без копіювання і локу.
+        """
+        sid = self._current_session_id
+        if not sid: return self._local_combat_state
         if self.is_host:
-            with db_lock: return copy.deepcopy(
-                db_store["combat_state"].get(self._current_session_id, self._local_combat_state))
-        try:
-            return requests.get(f"{self.server_url}/combat/state/{self._current_session_id}", timeout=0.5).json()
-        except:
-            return copy.deepcopy(self._local_combat_state)
+            return self._with_predictions(server.db_store["combat_state"].get(sid, self._local_combat_state))
+        if self._async:
+            self._refresh_async(("combat", sid), lambda: self._fetch_combat_state(sid), self.combat_changed)
+        else:
+            try:
+                self._fetch_combat_state(sid)
+                self._set_online(True)
+            except:
+                self._set_online(False)
+        return self._with_predictions(self._cached_combat_state())
 
-    def update_combat_state(self, p):
-        if not self._current_session_id: return
+    def _cached_combat_state(self):
+        """Останній відомий стан бою без звернення до хоста."""
         if self.is_host:
-            with db_lock:
-                st = db_store["combat_state"].get(self._current_session_id)
-                if st:
-                    if "tokens" in p:
-                        st["tokens"].update(p["tokens"])
-                        p_copy = p.copy();
-                        del p_copy["tokens"];
-                        st.update(p_copy)
-                    else:
-                        st.update(p)
+            return server.db_store["combat_state"].get(self._current_session_id, self._local_combat_state)
+        with self._client_lock:
+            if self._remote_combat_frozen is None:
+                self._remote_combat_frozen = freeze(self._remote_combat or self._local_combat_state)
+            return self._remote_combat_frozen
+
+    def _with_predictions(self, st):
+        """
+        Накладає на стан ще не підтверджені власні ходи. Хід, підтверджений ревізією ack,
+        знімається, щойно стан з хоста досягнув цієї ревізії (тепер він уже містить хід).
+        """
+        with self._client_lock:
+            if not self._predicted_moves: return st
+            rev = st.get("rev", 0)
+            for u in [u for u, (_, _, ack) in self._predicted_moves.items() if ack is not None and rev >= ack]:
+                del self._predicted_moves[u]
+            preds = dict(self._predicted_moves)
+        tokens = st.get("tokens", {})
+        moved = {u: FrozenDict(tokens[u], x=x, y=y) for u, (x, y, _) in preds.items() if u in tokens}
+        return FrozenDict(st, tokens=FrozenDict(tokens, **moved)) if moved else st
+
+    # --- HISTORY ---
+    def get_session_history(self, sid=None):
+        """Повна історія сесії (core.replay.SessionHistory): гравці, лог і бій на будь-який момент. Лише на хості."""
+        if not self.is_host: return None
+        return server.session_history.get(sid or self._current_session_id)
+
+    def get_combat_history_point(self, index=None):
+        """
+        Стан бою поточної сесії після події номер index її історії (None - останньої):
+        {"length": подій в історії, "index", "ts": час події, "combat": стан}. None - історія недоступна.
+        """
+        sid = self._current_session_id
+        if not sid: return None
+        if self.is_host:
+            body, status = server._read_history(sid, index)
+            return body if status == 200 else None
+        try:
+            r = self._http_get(f"/history/{sid}", "history", params=None if index is None else {"at": index})
+            r.raise_for_status()
+            return freeze(self._decode(r))
+        except Exception:
+            return None
+
+    # --- COMBAT COMMANDS ---
+    def send_combat_command(self, cmd, on_result=None, **args):
+        """
+        Команда бою (MOVE, DAMAGE, SPAWN, REMOVE, NEXT_TURN, ROLL_INITIATIVE, START_COMBAT -
+        див. COMBAT_COMMANDS у core/server.py), яку перевіряє і застосовує хост.
+        on_result(HTTP статус або None, відповідь) - як у _send_command; без нього команда йде як звичайний
+        запис (в т.ч. всередині batch()). На хості повертає, чи команду прийнято, у клієнта - True.
+        """
+        if not self._current_session_id: return False
+        body = {"sid": self._current_session_id, "uid": self.user_id, "cmd": cmd, **args}
+        if self.is_host:
+            resp, status = server.BATCH_OPS["/combat/command"](body)
+            if on_result: on_result(status, resp)
+            return status == 200
+        if on_result:
+            self._send_command("/combat/command", body, on_result)
         else:
-            requests.post(f"{self.server_url}/combat/update", json={"sid": self._current_session_id, "state": p})
+            self._http_post("/combat/command", body)
+        return True
+
+    def spawn_token(self, uid, data):
+        return self.send_combat_command("SPAWN", token=uid, data=data)
+
+    def damage_token(self, uid, amount):
+        """Шкода токену (від'ємна - лікування); хіти обмежуються 0..max_hp на хості."""
+        return self.send_combat_command("DAMAGE", token=uid, amount=amount)
+
+    def remove_token(self, uid):
+        return self.send_combat_command("REMOVE", token=uid)
+
+    def next_turn(self, on_result=None):
+        """Передати хід (NEXT_TURN); у відповіді хоста turn - запис черги того, чий тепер хід."""
+        return self.send_combat_command("NEXT_TURN", on_result)
 
     def start_combat(self):
-        self.update_combat_state({"active": True, "round": 1})
+        """Початок бою після кидка ініціативи (START_COMBAT; хост відмовить, якщо бій уже йде)."""
+        return self.send_combat_command("START_COMBAT")
 
-    def add_creature_to_combat(self, k, n=None):
+    def add_creature_to_combat(self, k, n=None, x=0, y=0):
         d = self.creature_bestiary.get(k);
         if not d: return
         uid = f"NPC_{str(uuid.uuid4())[:4]}"
-        self.update_combat_state({"tokens": {
-            uid: {"name": n or d['name'], "x": 0, "y": 0, "color": "#D32F2F", "type": "enemy",
-                  "init_bonus": d['initiative_bonus'], "actions": d.get('actions', [])}}})
+        # Дії, КД тощо не копіюємо в токен: кожен клієнт бере їх з власного бестіарію (див. resolve_token).
+        # Хіти - стан конкретного екземпляра, їх змінює DAMAGE на хості
+        self.spawn_token(uid, {"name": n or d['name'], "x": x, "y": y, "color": "#D32F2F", "type": "enemy",
+                               "bestiary_ref": k, "hp": d['hp'], "max_hp": d['hp']})
         return uid
 
+    def resolve_token(self, tok):
+        """
+        Повні дані токена: поля з локального бестіарію за bestiary_ref і дії з monster_actions,
+        поверх яких - власні поля токена.
+        Токени без bestiary_ref (гравці, об'єкти) повертаються як є; вбудовані actions старих сесій не перечитуються.
+        """
+        ref = tok.get("bestiary_ref")
+        d = self.creature_bestiary.get(ref)
+        if not d: return tok
+        base = {f: d[src] for f, src in self.BESTIARY_TOKEN_FIELDS.items() if src in d}
+        if "actions" not in tok: base["actions"] = self.monster_actions(ref)
+        return {**base, **tok}
+
     def roll_initiative(self):
-        c = [];
-        st = self.get_combat_state();
-        t = st.get("tokens", {})
-        for u, p in self.get_session_players(self._current_session_id).items():
-            if u not in t: t[u] = {"x": 1, "y": 1, "color": "#388E3C", "name": p.get("name"), "type": "player"}
-        for u, tok in t.items():
-            mod = tok.get('init_bonus', 0)
-            c.append({"uid": u, "name": tok["name"], "total": random.randint(1, 20) + mod,
-                      "type": tok.get('type', 'unknown')})
-        c.sort(key=lambda x: x['total'], reverse=True)
-        self.update_combat_state({"turn_order": c, "current_turn_index": 0, "tokens": t})
+        """
+        Кидає ініціативу за всі токени (бонус - з бестіарію) і гравців сесії без токена.
+        Чергу ходів будує хост з результатів (ROLL_INITIATIVE), решту токенів він не чіпає.
+        """
+        tokens = self.get_combat_state().get("tokens", {})
+        rolls = {u: random.randint(1, 20) + self.resolve_token(tok).get('init_bonus', 0) for u, tok in tokens.items()}
+        for u in self.get_session_players(self._current_session_id):
+            if u not in rolls: rolls[u] = random.randint(1, 20)
+        return self.send_combat_command("ROLL_INITIATIVE", rolls=rolls)
 
     def move_token(self, u, x, y, is_dm=False):
         """
         Оновлена логіка переміщення.
         DM може рухати всіх ДО бою (active=False).
         Після початку бою (active=True): DM рухає тільки ворогів, Гравець - себе.
+
+        Хід застосовується локально одразу (передбачення) і відправляється на хост, який
+        перевіряє ті самі правила. Якщо хост відмовив - токен повертається і емітується move_rejected.
         """
-        st = self.get_combat_state()
+        st = self._cached_combat_state()
         if u not in st.get("tokens", {}): return False
 
         is_combat_active = st.get("active", False)
@@ -593,6 +1097,22 @@ class DataManager(QObject):
             # тут ми довіряємо, що u == self.user_id, але можна перевірити)
             if u != self.user_id: return False
 
-        # Виконуємо рух
-        self.update_combat_state({"tokens": {u: {"x": x, "y": y}}})
-        return True
\ No newline at end of file
+        # Виконуємо рух: спершу локально, потім підтвердження хоста
+        with self._client_lock:
+            self._predicted_moves[u] = (x, y, None)
+        self.combat_changed.emit()
+        # Хід - абсолютна позиція, тож ревізію, від якої його зроблено, хостові не шлемо: правила він перевіряє
+        # за своїм поточним станом, а з двох ходів того самого токена лишається останній
+        self.send_combat_command("MOVE", lambda status, resp: self._on_move_result(u, x, y, status, resp),
+                                 token=u, x=x, y=y)
+        return True
+
+    def _on_move_result(self, u, x, y, status, resp):
+        with self._client_lock:
+            if self._predicted_moves.get(u, (None, None))[:2] != (x, y): return  # його вже перекрив новіший хід
+            if status == 200:
+                self._predicted_moves[u] = (x, y, resp.get("rev"))
+            else:
+                del self._predicted_moves[u]
+        if status != 200: self.move_rejected.emit(u, resp.get("error", "Немає зв'язку з хостом"))
+        self.combat_changed.emit()
@@ -0,0 +1,192 @@
+"""
+Пошук сесій у локальній мережі без введення IP.
+
+Хост (SessionAnnouncer) раз на ANNOUNCE_INTERVAL с розсилає UDP broadcast з переліком
+активних сесій і одразу відповідає на запит пошуку. Гравець (SessionListener) при старті
+сам розсилає запит, тож хости знаходяться за час одного обміну пакетами (~мілісекунди),
+а далі список підтримується періодичними оголошеннями.
+
+Останній хост, до якого вдалося підключитися, зберігається у файлі (save_last_host):
+повторне підключення йде на нього напряму, без пошуку.
+
+Адреси розсилки задаються параметром targets, тож усе працює і на loopback
+(targets=("127.0.0.1",)) без зовнішньої мережі.
+"""
+import json
+import os
+import select
+import socket
+import threading
+import time
+
+QUERY_PORT = 5001  # хости слухають запити пошуку
+ANNOUNCE_PORT = 5002  # гравці слухають оголошення
+TARGETS = ("255.255.255.255", "127.0.0.1")  # broadcast + свій комп'ютер (broadcast не завжди повертається на loopback)
+ANNOUNCE_INTERVAL = 1.0  # с
+SESSION_TTL = 3.5  # с без оголошень, після яких сесія зникає зі списку
+
+MAGIC = "dnd-assistant/1"
+QUERY = json.dumps({"app": MAGIC, "query": True}).encode()
+
+
+def _udp_socket(port, reuse=True):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse:
+        # Кілька хостів/гравців на одному комп'ютері ділять порт
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"): sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.bind(("", port))
+    return sock
+
+
+def _send(sock, data, targets, port):
+    for addr in targets:
+        try:
+            sock.sendto(data, (addr, port))
+        except OSError:
+            pass  # немає broadcast-маршруту (наприклад, без мережі) - лишається loopback
+
+
+class SessionAnnouncer:
+    """
+    Оголошення сесій хоста. sessions_provider() повертає список активних сесій
+    [{"id": sid, "players": n}, ...]; порожній список - оголошувати нічого.
+    """
+
+    def __init__(self, sessions_provider, http_port=5000, port=QUERY_PORT, announce_port=ANNOUNCE_PORT,
+                 targets=TARGETS, interval=ANNOUNCE_INTERVAL):
+        self.sessions_provider = sessions_provider
+        self.http_port, self.announce_port = http_port, announce_port
+        self.targets, self.interval = targets, interval
+        # Порт запитів - як і HTTP-порт - займає лише один хост на комп'ютері (OSError, якщо зайнято)
+        self._sock = _udp_socket(port, reuse=False)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="session-announcer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+
+    def _message(self):
+        sessions = self.sessions_provider()
+        if not sessions: return None
+        return json.dumps({"app": MAGIC, "host": socket.gethostname(), "port": self.http_port,
+                           "sessions": sessions}, ensure_ascii=False).encode()
+
+    def _run(self):
+        next_announce = 0
+        while not self._stopped.is_set():
+            try:
+                now = time.monotonic()
+                if now >= next_announce:
+                    msg = self._message()
+                    if msg: _send(self._sock, msg, self.targets, self.announce_port)
+                    next_announce = now + self.interval
+                self._sock.settimeout(max(next_announce - now, 0.01))
+                data, addr = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # сокет закрито в stop()
+            if data == QUERY:
+                msg = self._message()
+                if msg: self._sock.sendto(msg, addr)
+
+
+class SessionListener:
+    """
+    Список сесій у мережі, що оновлюється у фоновому потоці.
+    sessions() - знайдені зараз: [{"id", "ip", "port", "host", "players", "seen"}, ...].
+    """
+
+    def __init__(self, port=ANNOUNCE_PORT, query_port=QUERY_PORT, targets=TARGETS, ttl=SESSION_TTL):
+        self.query_port, self.targets, self.ttl = query_port, targets, ttl
+        # Запити йдуть з окремого сокета на випадковому порту: відповідь на спільний порт оголошень
+        # могла б дістатися іншому гравцю на цьому ж комп'ютері
+        self._query_sock = _udp_socket(0, reuse=False)
+        self._socks = [self._query_sock]
+        try:
+            self._socks.append(_udp_socket(port))
+        except OSError:
+            pass  # порт оголошень недоступний - лишаються відповіді на власні запити
+        self._found = {}  # {(host, port, sid): запис}
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="session-listener", daemon=True)
+        self._thread.start()
+        self.probe()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        for sock in self._socks: sock.close()
+
+    def probe(self):
+        """Просить усі хости відповісти негайно, не чекаючи наступного оголошення."""
+        _send(self._query_sock, QUERY, self.targets, self.query_port)
+
+    def sessions(self):
+        deadline = time.monotonic() - self.ttl
+        with self._cond:
+            for key in [k for k, s in self._found.items() if s["seen"] < deadline]: del self._found[key]
+            return sorted((dict(s) for s in self._found.values()), key=lambda s: (s["ip"], s["id"]))
+
+    def wait(self, timeout=0.1):
+        """Чекає до timeout с, доки знайдеться хоч одна сесія; повертає sessions()."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._found, timeout)
+        return self.sessions()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                ready, _, _ = select.select(self._socks, [], [], 0.5)
+                packets = [sock.recvfrom(65536) for sock in ready]
+            except (OSError, ValueError):
+                return  # сокети закрито в stop()
+            for data, (ip, _) in packets: self._handle(data, ip)
+
+    def _handle(self, data, ip):
+        try:
+            msg = json.loads(data)
+        except ValueError:
+            return
+        if not isinstance(msg, dict) or msg.get("app") != MAGIC or "sessions" not in msg: return
+        now = time.monotonic()
+        with self._cond:
+            for s in msg["sessions"]:
+                # Той самий хост може прийти і через broadcast, і через loopback - лишаємо першу адресу
+                key = (msg.get("host"), msg.get("port"), s["id"])
+                ip_known = self._found.get(key, {}).get("ip", ip)
+                self._found[key] = {"id": s["id"], "ip": ip_known, "port": msg.get("port"), "host": msg.get("host"),
+                                    "players": s.get("players", 0), "seen": now}
+            self._cond.notify_all()
+
+
+def load_last_host(path):
+    """Останній хост, до якого вдалося підключитися: {"ip", "sid"} або None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            last = json.load(f)
+        return last if last.get("ip") and last.get("sid") else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def save_last_host(path, ip, sid):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ip": ip, "sid": sid}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Cannot save last host: {e}")
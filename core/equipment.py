@@ -0,0 +1,185 @@
+"""
+Каталог спорядження у dnd_data.sqlite3: предмети з типізованими колонками та індексами, як бестіарій (core/bestiary.py).
+
+У таблиці equipment змішані записи SRD 2014 (equipment_category, weapon_range) і 2024 (equipment_categories).
+Міграція (migrate) зводить обидва формати до equipment_items: тип предмета інвентаря (TYPES), основна
+категорія, ціна в мідяках, вага, шкода, КД і властивості; усі категорії предмета - у equipment_item_categories.
+Тригери на equipment оновлюють каталог при кожній зміні, тож homebrew одразу доступний у запитах.
+Запит повертає одну сторінку (limit/offset) - список у UI підвантажує наступні при прокрутці.
+"""
+import re
+import sqlite3
+
+from core import search, srd_schema
+
+SCHEMA_VERSION = 1  # збільшити, коли змінюється _schema (див. core/srd_schema.py)
+TYPES = ("Weapon", "RangedWeapon", "Armor", "Focus", "Consumable", "Gear")
+CP_PER_GP = 100
+
+
+def _has_category(*names):
+    return ("EXISTS (SELECT 1 FROM equipment_item_categories c WHERE c.item = e.index_name AND c.category IN ("
+            + ", ".join(f"'{n}'" for n in names) + "))")
+
+
+def _schema(source):
+    """Скрипт міграції; source - вираз колонки source (у базі, засіяній з GitHub, її немає)."""
+    return f"""
+DROP TRIGGER IF EXISTS equipment_items_insert;
+DROP TRIGGER IF EXISTS equipment_items_update;
+DROP TRIGGER IF EXISTS equipment_items_delete;
+DROP VIEW IF EXISTS equipment_items_source;
+DROP VIEW IF EXISTS equipment_item_categories_source;
+DROP TABLE IF EXISTS equipment_item_categories;
+DROP TABLE IF EXISTS equipment_items;
+
+CREATE TABLE equipment_items (
+    index_name TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,  -- один з TYPES
+    category TEXT,  -- основна категорія SRD
+    cost_cp INTEGER,  -- ціна в мідяках (1 gp = 100 cp)
+    weight REAL,  -- фунти
+    damage TEXT,  -- кістки шкоди зброї: "1d8"
+    ac INTEGER,  -- базовий КД обладунку
+    properties TEXT,  -- "Finesse, Light"
+    source TEXT
+);
+CREATE INDEX equipment_items_name ON equipment_items(name);
+CREATE INDEX equipment_items_type ON equipment_items(type, name);
+CREATE INDEX equipment_items_cost ON equipment_items(cost_cp);
+CREATE INDEX equipment_items_weight ON equipment_items(weight);
+
+CREATE TABLE equipment_item_categories (
+    item TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (category, item)
+) WITHOUT ROWID;
+CREATE INDEX equipment_item_categories_item ON equipment_item_categories(item);
+
+-- Категорії обох форматів одним json_each (а не UNION), щоб умова тригера index_name = ... йшла в індекс
+CREATE VIEW equipment_item_categories_source AS
+SELECT DISTINCT e.index_name, json_extract(c.value, '$.name')
+FROM equipment e, json_each(json_insert(COALESCE(json_extract(e.data, '$.equipment_categories'), '[]'),
+                                        '$[#]', json(json_extract(e.data, '$.equipment_category')),
+                                        '$[#]', json(json_extract(e.data, '$.gear_category')))) c
+WHERE json_extract(c.value, '$.name') IS NOT NULL;
+
+-- Тип визначається за вже заповненими категоріями предмета, тому вони вставляються першими
+CREATE VIEW equipment_items_source AS
+SELECT index_name, name, type,
+       COALESCE(json_extract(data, '$.equipment_category.name'), json_extract(data, '$.equipment_categories[0].name')),
+       CAST(round(json_extract(data, '$.cost.quantity') * CASE json_extract(data, '$.cost.unit')
+           WHEN 'cp' THEN 1 WHEN 'sp' THEN 10 WHEN 'ep' THEN 50 WHEN 'gp' THEN 100 WHEN 'pp' THEN 1000 END) AS INTEGER),
+       json_extract(data, '$.weight'),
+       CASE WHEN type IN ('Weapon', 'RangedWeapon') THEN json_extract(data, '$.damage.damage_dice') END,
+       CASE type WHEN 'Armor' THEN json_extract(data, '$.armor_class.base') END,
+       (SELECT group_concat(json_extract(value, '$.name'), ', ') FROM json_each(data, '$.properties')),
+       source
+FROM (SELECT e.index_name, e.name, e.data, {source} AS source,
+             CASE WHEN {_has_category('Weapon', 'Weapons')} THEN
+                      CASE WHEN json_extract(e.data, '$.weapon_range') = 'Ranged' OR {_has_category('Ranged Weapons')}
+                           THEN 'RangedWeapon' ELSE 'Weapon' END
+                  WHEN {_has_category('Armor', 'Shields')} THEN 'Armor'
+                  WHEN {_has_category('Arcane Foci', 'Arcane Focus', 'Druidic Foci', 'Druidic Focus',
+                                      'Holy Symbols', 'Holy Symbol')} THEN 'Focus'
+                  WHEN substr(e.name, 1, 6) = 'Potion' THEN 'Consumable'
+                  ELSE 'Gear' END AS type
+      FROM equipment e);
+
+-- INSERT OR REPLACE у equipment не запускає тригер DELETE - вставка спершу прибирає старі рядки (див. bestiary)
+CREATE TRIGGER equipment_items_insert AFTER INSERT ON equipment BEGIN
+    DELETE FROM equipment_item_categories WHERE item = NEW.index_name;
+    INSERT INTO equipment_item_categories SELECT * FROM equipment_item_categories_source WHERE index_name = NEW.index_name;
+    INSERT OR REPLACE INTO equipment_items SELECT * FROM equipment_items_source WHERE index_name = NEW.index_name;
+END;
+CREATE TRIGGER equipment_items_update AFTER UPDATE ON equipment BEGIN
+    DELETE FROM equipment_items WHERE index_name = OLD.index_name;
+    DELETE FROM equipment_item_categories WHERE item = OLD.index_name;
+    INSERT INTO equipment_item_categories SELECT * FROM equipment_item_categories_source WHERE index_name = NEW.index_name;
+    INSERT INTO equipment_items SELECT * FROM equipment_items_source WHERE index_name = NEW.index_name;
+END;
+CREATE TRIGGER equipment_items_delete AFTER DELETE ON equipment BEGIN
+    DELETE FROM equipment_items WHERE index_name = OLD.index_name;
+    DELETE FROM equipment_item_categories WHERE item = OLD.index_name;
+END;
+
+INSERT INTO equipment_item_categories SELECT * FROM equipment_item_categories_source;
+INSERT INTO equipment_items SELECT * FROM equipment_items_source;
+"""
+
+
+def migrate(conn):
+    """Створює (або перестворює застарілий) каталог. True - міграцію виконано."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='equipment'").fetchone(): return False
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(equipment)")}
+    return srd_schema.migrate(conn, "equipment", SCHEMA_VERSION, _schema("e.source" if "source" in columns else "NULL"))
+
+
+def _range(column, bounds, scale, where, params):
+    low, high = bounds or (None, None)
+    if low is not None: where.append(f"{column} >= ?"); params.append(low * scale)
+    if high is not None: where.append(f"{column} <= ?"); params.append(high * scale)
+
+
+def query(conn, type=None, category=None, cost_range=None, weight_range=None, text=None, limit=None, offset=0):
+    """
+    Сторінка каталогу: [{"index", "name", "type", "category", "cost_cp", "weight", "damage", "ac", "properties", "source"}].
+    type і category - рядок або список рядків; cost_range - (від, до) у золотих, weight_range - (від, до) у фунтах,
+    межі включно, будь-яка може бути None. З text - повнотекстові збіги (core/search.py) від найкращого
+    та предмети з text у назві, інакше всі за назвою.
+    """
+    where, params = [], []
+    srd_schema.where_in("i.type", type, where, params)
+    if category is not None:
+        categories = [category] if isinstance(category, str) else list(category)
+        where.append("i.index_name IN (SELECT item FROM equipment_item_categories "
+                     f"WHERE category IN ({', '.join('?' * len(categories))}))")
+        params.extend(categories)
+    _range("i.cost_cp", cost_range, CP_PER_GP, where, params)
+    _range("i.weight", weight_range, 1, where, params)
+    sql, order = "SELECT i.* FROM equipment_items i", "i.name"
+    match = search.fts_query(text or "")
+    if match:
+        # Повнотекстові збіги за релевантністю, потім предмети, у назві яких text - підрядок ("sword" -> Longsword)
+        sql += (" LEFT JOIN (SELECT d.index_name, bm25(srd_search, ?, 1.0) AS rank FROM srd_search"
+                " CROSS JOIN srd_search_docs d ON d.id = srd_search.rowid"  # CROSS: спершу MATCH, а не всі документи kind
+                " WHERE srd_search MATCH ? AND d.kind = 'equipment') s ON s.index_name = i.index_name")
+        params[:0] = [search.NAME_WEIGHT, match]
+        where.append("(s.index_name IS NOT NULL OR i.name LIKE ? ESCAPE '\\')")
+        params.append("%" + re.sub(r"([\\%_])", r"\\\1", text.strip()) + "%")
+        order = "s.rank NULLS LAST, i.name"
+    if where: sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+    cursor = conn.execute(sql, params + [-1 if limit is None else limit, offset])
+    columns = ["index" if d[0] == "index_name" else d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def item(conn, index):
+    """Предмет у форматі DataManager.master_items (для інвентаря гравця) або None."""
+    row = conn.execute("SELECT name, type, damage, ac, properties FROM equipment_items WHERE index_name = ?",
+                       (index,)).fetchone()
+    if not row: return None
+    name, type, damage, ac, properties = row
+    result = {"name": name, "type": type, "srd_index": index}
+    if type in ("Weapon", "RangedWeapon"): result["subtype"] = "Ranged" if type == "RangedWeapon" else "Melee"
+    if damage: result["damage"] = damage
+    if type == "Armor": result["ac"] = ac
+    if properties: result["prop"] = properties
+    return result
+
+
+def facets(conn):
+    """Значення для фільтрів: {"types": [...] у порядку TYPES, "categories": [...]}."""
+    types = {r[0] for r in conn.execute("SELECT DISTINCT type FROM equipment_items")}
+    categories = [r[0] for r in conn.execute("SELECT DISTINCT category FROM equipment_item_categories ORDER BY category")]
+    return {"types": [t for t in TYPES if t in types], "categories": categories}
+
+
+def connect(db_path):
+    """З'єднання з базою SRD з виконаними міграціями каталогу та пошуку."""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    migrate(conn)
+    search.migrate(conn)
+    return conn
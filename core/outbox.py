@@ -0,0 +1,124 @@
+"""
+Черга записів віддаленого клієнта до хоста.
+
+Усі записи (лог, персонаж, бій, команди) відправляє один фоновий потік по черзі, тож порядок
+зберігається. Якщо запит не дійшов до хоста (ConnectionError: не з'єдналися), запис лишається
+на початку черги і повторюється з експоненційною затримкою (RECONNECT_BACKOFF), а нові записи накопичуються.
+Інші збої (напр. хост не відповів вчасно) не повторюються: хост міг запис уже виконати, і повтор
+застосував би DAMAGE двічі. Будь-яка відповідь хоста, навіть помилка, означає, що запис доставлено -
+він іде з черги:
+- записи з однаковим ключем злиття (coalesce_key) зливаються в один - десять натискань
+  "+" на виснаженні дадуть один запит з останнім значенням;
+- черга обмежена MAX_PENDING записами: переповнена черга відмовляє новим записам
+  (put повертає None), а не росте безкінечно, поки зв'язку немає.
+"""
+import collections
+import random
+import threading
+
+
+class Outbox:
+    MAX_PENDING = 256
+    RECONNECT_BACKOFF = (0.25, 10.0)  # перша і найбільша затримка між повторами, с
+
+    class Item:
+        __slots__ = ("path", "body", "timeout", "coalesce_key", "on_result", "done", "result", "merged")
+
+        def __init__(self, path, body, timeout, coalesce_key, on_result):
+            self.path, self.body, self.timeout = path, body, timeout
+            self.coalesce_key, self.on_result = coalesce_key, on_result
+            self.done = threading.Event()
+            self.result = None  # (HTTP статус або None, тіло відповіді) після відправки
+            self.merged = []  # злиті в цей записи: вони відправлені разом з ним
+
+        def finish(self, result):
+            for item in self.merged + [self]:
+                item.result = result
+                item.done.set()
+
+    def __init__(self, send, on_online=None, max_pending=None):
+        """
+        send(path, body, timeout) -> (HTTP статус, тіло відповіді). ConnectionError - запит не дійшов до хоста,
+        запис повториться; інший виняток - результат невідомий або запис не відправити взагалі, він іде з черги
+        з результатом (None, {"error"}).
+        on_online(bool) викликається після кожної спроби відправки.
+        """
+        self._send = send
+        self._on_online = on_online or (lambda online: None)
+        self.max_pending = max_pending or self.MAX_PENDING
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._kick = False
+        self._thread = threading.Thread(target=self._run, name="dm-outbox", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond: return len(self._queue)
+
+    def put(self, path, body, timeout, coalesce_key=None, merge=None, on_result=None):
+        """
+        Ставить запис у чергу. Якщо в черзі вже чекає запис з тим самим coalesce_key, він
+        прибирається, а новий (body або merge(старе тіло, нове)) стає в кінець черги.
+        Повертає Item (item.done - відправлено) або None, якщо черга переповнена.
+        Прибраний запис завершиться (done) разом з новим, у який його злито.
+        """
+        with self._cond:
+            old = None
+            if coalesce_key is not None:
+                # Перший запис може вже відправлятися - його не чіпаємо
+                old = next((it for i, it in enumerate(self._queue)
+                            if i > 0 and it.coalesce_key == coalesce_key), None)
+                if old is not None:
+                    self._queue.remove(old)
+                    if merge is not None: body = merge(old.body, body)
+            if len(self._queue) >= self.max_pending: return None
+            item = self.Item(path, body, timeout, coalesce_key, on_result)
+            if old is not None: item.merged = old.merged + [old]
+            self._queue.append(item)
+            self._cond.notify_all()
+        return item
+
+    def kick(self):
+        """Зв'язок, схоже, повернувся - повторити відправку негайно, не чекаючи затримки."""
+        with self._cond:
+            self._kick = True
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Чекає, доки черга спорожніє. False - не встигли за timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue, timeout)
+
+    def _run(self):
+        fails = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+                item = self._queue[0]
+            try:
+                result = self._send(item.path, item.body, item.timeout)
+            except ConnectionError as e:
+                fails += 1
+                if fails == 1: print(f"POST {item.path} failed, retrying: {e}")
+                self._on_online(False)
+                self._backoff(fails)
+                continue
+            except Exception as e:
+                # Повтор або не допоможе, або (таймаут відповіді) може виконати запис удруге - не тримаємо ним черги
+                print(f"POST {item.path} dropped: {e}")
+                result = None, {"error": str(e)}
+            else:
+                fails = 0
+                self._on_online(True)
+            with self._cond:
+                self._queue.popleft()
+                self._cond.notify_all()
+            item.finish(result)
+            if item.on_result is not None: item.on_result(*result)
+
+    def _backoff(self, fails):
+        first, longest = self.RECONNECT_BACKOFF
+        delay = min(first * 2 ** (fails - 1), longest) * random.uniform(0.8, 1.2)
+        with self._cond:
+            self._cond.wait_for(lambda: self._kick, delay)
+            self._kick = False
@@ -0,0 +1,198 @@
+"""
+Історія сесії та перемотування в часі.
+
+Кожна зміна сесії (ті самі записи, що йдуть у журнал core/session_store.py) додається
+в SessionHistory. З неї можна відновити точний стан сесії - гравці, лог, бій - після
+будь-якої події. Кожні CHECKPOINT_EVERY подій запам'ятовується контрольна точка
+(завдяки незмінним знімкам це лише посилання), тож перехід до довільної позиції
+коштує не більше CHECKPOINT_EVERY застосувань подій. Лог лише дописується, тому всі стани
+ділять один список записів і пам'ятають, скільки з них бачать.
+
+Історія відновленої з диска сесії (SessionHistory.resumed) починається зі стану на момент
+відновлення; попередні події та збережені контрольні точки читаються лише при першому
+перемотуванні назад.
+"""
+import bisect
+import threading
+import time
+
+from core.snapshot import FrozenDict, freeze
+
+# Ключі патча бою, що стосуються токенів (решта - поля стану, які просто замінюються)
+TOKEN_PATCH_KEYS = ("tokens", "token_fields", "removed")
+
+
+def patch_combat(st, patch):
+    """
+    Нова версія стану бою, rev + 1. Патч: tokens - токени цілком (замінюють наявні з тим самим uid),
+    token_fields - {uid: {поле: значення}} (змінюються лише ці поля), removed - uid видалених токенів;
+    решта полів стану замінюється.
+    """
+    tokens = st["tokens"]
+    if any(k in patch for k in TOKEN_PATCH_KEYS):
+        tokens = dict(tokens, **patch.get("tokens", {}))
+        for u, fields in patch.get("token_fields", {}).items():
+            if u in tokens: tokens[u] = FrozenDict(tokens[u], **fields)
+        for u in patch.get("removed", ()): tokens.pop(u, None)
+        tokens = FrozenDict(tokens)
+    fields = {k: v for k, v in patch.items() if k not in TOKEN_PATCH_KEYS and k != "rev"}
+    return FrozenDict(st, tokens=tokens, rev=st["rev"] + 1, **fields)
+
+
+class _Working:
+    """
+    Змінна обгортка стану на час застосування подій. logs - спільний для всіх станів список записів логу
+    (після події session - новий), n - скільки з них бачить цей стан: перехід до позиції не копіює лог.
+    """
+    __slots__ = ("session", "combat", "logs", "n")
+
+    def __init__(self, checkpoint):
+        self.session, self.combat, self.logs, self.n = checkpoint
+
+    def apply(self, kind, payload):
+        if kind == "session":
+            self.session = FrozenDict((k, v) for k, v in payload.items() if k != "logs")
+            self.logs = list(payload.get("logs", ()))
+            self.n = len(self.logs)
+        elif kind == "session_fields":
+            self.session = FrozenDict(self.session or {}, **payload)
+        elif kind == "player":
+            players = self.session["players"]
+            self.session = FrozenDict(self.session, players=FrozenDict(players, **{payload["uid"]: payload["data"]}))
+        elif kind == "log":
+            # Запис уже є в списку, якщо цю подію колись застосовував живий стан
+            if self.n == len(self.logs): self.logs.append(payload)
+            self.n += 1
+        elif kind == "combat_init":
+            self.combat = payload
+        elif kind == "combat":
+            self.combat = patch_combat(self.combat, payload)
+
+    def checkpoint(self):
+        return self.session, self.combat, self.logs, self.n
+
+    def freeze(self):
+        return FrozenDict(session=self.session, combat=self.combat, logs=tuple(self.logs[:self.n]))
+
+
+# Стан до першої події (_Working.checkpoint): список логу в ньому ніхто не дописує - перша подія session його замінює
+_INITIAL = (None, None, [], 0)
+
+
+class SessionHistory:
+    """
+    Впорядкований журнал подій однієї сесії з контрольними точками.
+    on_checkpoint(position, {"session", "combat"}) отримує кожну нову контрольну точку - щоб її зберегти.
+    """
+    CHECKPOINT_EVERY = 100
+
+    def __init__(self, on_checkpoint=None):
+        self._lock = threading.Lock()
+        self._events = []  # [(kind, payload, ts)] після перших _offset подій
+        self._offset = 0  # скільки перших подій ще не завантажено
+        self._start = 0  # перша позиція, до якої можна перемотати
+        self._load = None
+        self._positions = [0]
+        self._checkpoints = {0: _INITIAL}  # {позиція: _Working.checkpoint()}
+        self._on_checkpoint = on_checkpoint
+        self._live = _Working(self._checkpoints[0])
+
+    @classmethod
+    def resumed(cls, length, session, combat, logs, load, on_checkpoint=None):
+        """
+        Історія сесії, відновленої після length збережених подій у стані session/combat/logs.
+        load() -> (перші length подій [(kind, payload, ts)], {позиція: збережена контрольна точка})
+        викликається лише при першому зверненні до позиції до length.
+        """
+        h = cls(on_checkpoint)
+        h._offset = h._start = h._positions[0] = length
+        h._checkpoints = {length: (session, combat, list(logs), len(logs))}
+        h._live = _Working(h._checkpoints[length])
+        h._load = load
+        return h
+
+    def record(self, kind, payload, ts=None):
+        payload = freeze(payload)
+        with self._lock:
+            self._live.apply(kind, payload)
+            self._events.append((kind, payload, time.time() if ts is None else ts))
+            position = self._offset + len(self._events)
+            if position % self.CHECKPOINT_EVERY == 0: self._add_checkpoint(position, self._live.checkpoint())
+
+    def _add_checkpoint(self, position, checkpoint):
+        self._checkpoints[position] = checkpoint
+        bisect.insort(self._positions, position)
+        if self._on_checkpoint: self._on_checkpoint(position, {"session": checkpoint[0], "combat": checkpoint[1]})
+
+    def _load_prefix(self):
+        """Дочитує події до стану відновлення. Вони вже не змінюються, тож усе важке - поза локом."""
+        load = self._load
+        if load is None: return
+        length, tail = self._offset, self._checkpoints[self._offset]
+        events, saved = load()
+        events = [(kind, freeze(payload), ts) for kind, payload, ts in events]
+        # Історію до відновлення видно, лише якщо вона збереглася від створення сесії (combat_init + session)
+        complete = len(events) == length and any(kind == "session" for kind, _, _ in events[:2])
+        checkpoints = self._replay_prefix(events, saved, tail[2]) if complete else {}
+        with self._lock:
+            if self._load is None: return
+            self._load = None
+            if not complete: return
+            self._events[:0] = events
+            self._offset = self._start = 0
+            for position, checkpoint in checkpoints.items():
+                if position == 0 or position in saved:
+                    self._checkpoints[position] = checkpoint; bisect.insort(self._positions, position)
+                else:
+                    self._add_checkpoint(position, checkpoint)
+
+    def _replay_prefix(self, events, saved, logs):
+        """Контрольні точки до стану відновлення: збережені беруться з диска, бракуючі - перераховуються."""
+        K, length = self.CHECKPOINT_EVERY, len(events)
+        last_session = max(i for i, (kind, _, _) in enumerate(events) if kind == "session")
+        state, checkpoints = _Working(_INITIAL), {0: _INITIAL}
+        for i, (kind, payload, _) in enumerate(events):
+            position = i + 1
+            target = -(-position // K) * K  # контрольна точка, до якої веде подія
+            # Лог (і сесію, що його замінює) відстежуємо завжди; решту - лише якщо точку target доведеться рахувати
+            if kind in ("session", "log") or (target < length and target not in saved): state.apply(kind, payload)
+            # Остання епоха логу - той самий список, що у відновленого стану
+            if i == last_session: state.logs = logs
+            if position % K or position >= length: continue
+            if position in saved:
+                state.session, state.combat = freeze(saved[position]["session"]), freeze(saved[position]["combat"])
+            checkpoints[position] = state.checkpoint()
+        return checkpoints
+
+    def __len__(self):
+        return self._offset + len(self._events)
+
+    @property
+    def start(self):
+        """Перша позиція, до якої можна перемотати (не 0, якщо історія збереглася не від створення сесії)."""
+        self._load_prefix()
+        return self._start
+
+    def _seek(self, index):
+        if index < self._offset: self._load_prefix()
+        with self._lock:
+            index = max(self._start, min(index, len(self)))
+            cp = self._positions[bisect.bisect_right(self._positions, index) - 1]
+            state = _Working(self._checkpoints[cp])
+            events = self._events[cp - self._offset:index - self._offset]
+        for kind, payload, _ in events: state.apply(kind, payload)
+        return state
+
+    def state_at(self, index):
+        """Стан після перших index подій: FrozenDict(session, combat, logs)."""
+        return self._seek(index).freeze()
+
+    def combat_at(self, index):
+        """Лише бій після перших index подій (без збирання логу)."""
+        return self._seek(index).combat
+
+    def timestamp(self, index):
+        """Час події, після якої настав стан state_at(index); None для початкового стану."""
+        if index <= self._offset: self._load_prefix()
+        index -= self._offset
+        return self._events[index - 1][2] if 0 < index <= len(self._events) else None
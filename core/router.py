@@ -0,0 +1,249 @@
+"""
+Хост на кількох процесах: сесії розподілені між воркерами, маршрутизатор пересилає запити.
+
+Один процес Flask упирається в GIL. Для конвентів, де з однієї машини йде 10+ столів,
+супервізор запускає N воркерів (python -m core.server, кожен зі своїм файлом сесій)
+і маршрутизатор на публічному порту. Сесія належить воркеру shard_of(sid, N);
+маршрутизатор бере sid зі шляху (/session/<sid>, /combat/state/<sid>...) або з тіла
+запису (/update/logs, /combat/*...) і пересилає запит як є, не перекодовуючи тіло.
+/batch з операціями різних сесій розбивається між воркерами.
+
+    python -m core.router --workers 4 [--port 5000] [--routers 2] [--backend flask|aiohttp]
+
+Кілька процесів маршрутизатора (--routers) слухають один порт (SO_REUSEPORT), щоб
+пересилання теж не впиралося в одне ядро. Упалий воркер супервізор перезапускає -
+сесії відновлюються з його файлу. Кількість воркерів не можна міняти між запусками
+зі збереженими сесіями: від неї залежить, який воркер володіє сесією.
+
+Потрібен пакет aiohttp.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import zlib
+
+try:
+    from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+except ImportError as e:
+    raise ImportError("Маршрутизатор потребує пакет aiohttp (pip install aiohttp)") from e
+
+from core import discovery, wire
+
+WORKER_BASE_PORT = 5100  # воркер i слухає WORKER_BASE_PORT + i на 127.0.0.1
+EVENTS_MAX_TIMEOUT = 60  # як у core/server.py: найдовший long-poll, який треба дочекатися
+
+# Заголовки, що пересилаються воркеру і назад (тіло не перекодовується)
+REQUEST_HEADERS = ("Content-Type", "Content-Encoding", "Accept", "Accept-Encoding")
+RESPONSE_HEADERS = ("Content-Type", "Content-Encoding", "Vary")
+
+# Шляхи GET виду /<префікс>/<sid>[/...]
+SID_IN_PATH = ("/session/", "/logs/", "/history/", "/events/", "/combat/state/")
+
+
+def shard_of(sid, workers):
+    """Номер воркера, якому належить сесія. crc32, а не hash(): однаковий у всіх процесах і між запусками."""
+    return zlib.crc32(str(sid).encode()) % workers
+
+
+def _body_sid(data):
+    """sid запису з тіла: більшість операцій - "sid", /session/new - "id"."""
+    if not isinstance(data, dict): return None
+    return data.get("sid", data.get("id"))
+
+
+class Router:
+    def __init__(self, worker_urls):
+        self.workers = list(worker_urls)
+        self._http = None
+
+    async def start(self):
+        # Не розпаковувати відповіді: стиснене тіло йде клієнту як є
+        self._http = ClientSession(connector=TCPConnector(limit=0), auto_decompress=False,
+                                   timeout=ClientTimeout(total=None, sock_read=EVENTS_MAX_TIMEOUT + 10))
+
+    async def close(self):
+        await self._http.close()
+
+    def worker_for(self, sid):
+        return self.workers[shard_of(sid, len(self.workers))]
+
+    async def forward(self, request, worker, data=None):
+        headers = {h: request.headers[h] for h in REQUEST_HEADERS if h in request.headers}
+        if data is None: data = await request.read()
+        try:
+            async with self._http.request(request.method, worker + str(request.rel_url), data=data,
+                                          headers=headers) as r:
+                body = await r.read()
+                return web.Response(body=body, status=r.status,
+                                    headers={h: r.headers[h] for h in RESPONSE_HEADERS if h in r.headers})
+        except ClientError:
+            # Воркер перезапускається - клієнт повторить запис (див. DataManager._deliver)
+            return _reply(request, {"error": "Worker unavailable"}, 503)
+
+    async def _post(self, worker, path, body):
+        data, headers = wire.encode_request(body)
+        async with self._http.post(worker + path, data=data, headers=headers) as r:
+            return wire.loads(await r.read(), r.headers.get("Content-Type"))
+
+    async def handle_get(self, request):
+        path = request.path
+        if path == "/status":
+            return _reply(request, {"status": "running", "dm_id": "HOST", "workers": len(self.workers)})
+        if path == "/sessions":
+            found = await asyncio.gather(*(self._get_json(w + "/sessions") for w in self.workers))
+            return _reply(request, {"sessions": [s for r in found for s in r.get("sessions", [])]})
+        prefix = next((p for p in SID_IN_PATH if path.startswith(p)), None)
+        if prefix is None: return _reply(request, {"error": "Not found"}, 404)
+        return await self.forward(request, self.worker_for(path[len(prefix):].split("/")[0]))
+
+    async def handle_post(self, request):
+        raw = await request.read()
+        data = wire.decode_request(raw, request.headers.get("Content-Type"), request.headers.get("Content-Encoding"))
+        if request.path != "/batch":
+            return await self.forward(request, self.worker_for(_body_sid(data)), raw)
+        ops = data.get("ops", []) if isinstance(data, dict) else []
+        shards = {}
+        for i, op in enumerate(ops): shards.setdefault(self.worker_for(_body_sid(op.get("body"))), []).append(i)
+        if len(shards) <= 1:
+            return await self.forward(request, next(iter(shards), self.workers[0]), raw)
+        # Операції різних сесій: кожному воркеру - свою частину, результати - в початковому порядку
+        results = [None] * len(ops)
+        parts = list(shards.items())
+        replies = await asyncio.gather(*(self._post(w, "/batch", {"ops": [ops[i] for i in idx]}) for w, idx in parts))
+        for (_, idx), reply in zip(parts, replies):
+            for i, res in zip(idx, reply["results"]): results[i] = res
+        return _reply(request, {"results": results})
+
+    async def _get_json(self, url):
+        try:
+            async with self._http.get(url) as r:
+                return wire.loads(await r.read(), r.headers.get("Content-Type")) or {}
+        except Exception:
+            return {}
+
+    def make_app(self):
+        app = web.Application(client_max_size=16 * 1024 ** 2)
+        app.router.add_get("/{tail:.*}", self.handle_get)
+        app.router.add_post("/{tail:.*}", self.handle_post)
+        app.on_startup.append(lambda app: self.start())
+        app.on_cleanup.append(lambda app: self.close())
+        return app
+
+
+def _reply(request, body, status=200):
+    data, headers = wire.encode_response(body, request.headers.get("Accept"), request.headers.get("Accept-Encoding"))
+    return web.Response(body=data, status=status, headers=headers)
+
+
+def run_router(worker_urls, host, port, reuse_port=False):
+    """Маршрутизатор у поточному процесі - до його зупинки."""
+    web.run_app(Router(worker_urls).make_app(), host=host, port=port, reuse_port=reuse_port,
+                print=None, handle_signals=True)
+
+
+class Supervisor:
+    """Запускає воркери core.server і перезапускає ті, що впали."""
+    CHECK_EVERY = 1.0  # с
+
+    def __init__(self, workers, base_port=WORKER_BASE_PORT, store_dir=None, backend="flask"):
+        self.ports = [base_port + i for i in range(workers)]
+        self.store_dir, self.backend = store_dir, backend
+        self.procs = [None] * workers
+        self._stopped = threading.Event()
+
+    @property
+    def urls(self):
+        return [f"http://127.0.0.1:{p}" for p in self.ports]
+
+    def _spawn(self, i):
+        cmd = [sys.executable, "-m", "core.server", "--host", "127.0.0.1", "--port", str(self.ports[i]),
+               "--backend", self.backend, "--no-discovery"]
+        cmd += ["--store", os.path.join(self.store_dir, f"sessions-{i}.sqlite3")] if self.store_dir else ["--no-store"]
+        self.procs[i] = subprocess.Popen(cmd, cwd=_ROOT)
+
+    def start(self, timeout=10):
+        for i in range(len(self.ports)): self._spawn(i)
+        deadline = time.monotonic() + timeout
+        for url in self.urls:
+            while _get_json(url + "/status") is None:
+                if time.monotonic() > deadline: raise RuntimeError(f"Worker {url} did not start")
+                time.sleep(0.05)
+        threading.Thread(target=self._watch, name="supervisor", daemon=True).start()
+
+    def _watch(self):
+        while not self._stopped.wait(self.CHECK_EVERY):
+            for i, proc in enumerate(self.procs):
+                if proc.poll() is not None:
+                    print(f"Worker {i} exited with {proc.returncode}, restarting")
+                    self._spawn(i)
+
+    def sessions(self):
+        """Активні сесії всіх воркерів (для оголошення в локальній мережі)."""
+        return [s for url in self.urls for s in (_get_json(url + "/sessions") or {}).get("sessions", [])]
+
+    def stop(self):
+        self._stopped.set()
+        for proc in self.procs:
+            if proc and proc.poll() is None: proc.terminate()
+        for proc in self.procs:
+            if proc: proc.wait(5)
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _get_json(url, timeout=0.5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            return json.loads(r.read())
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Хост D&D Assistant на кількох процесах")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--routers", type=int, default=1, help="процесів маршрутизатора на публічному порту")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--worker-base-port", type=int, default=WORKER_BASE_PORT)
+    parser.add_argument("--backend", choices=("flask", "aiohttp"), default="flask")
+    parser.add_argument("--store-dir", default=_ROOT, help="тека для файлів сесій воркерів")
+    parser.add_argument("--no-store", action="store_true")
+    parser.add_argument("--no-discovery", action="store_true")
+    parser.add_argument("--route-only", action="store_true", help=argparse.SUPPRESS)  # додатковий маршрутизатор
+    args = parser.parse_args(argv)
+
+    urls = [f"http://127.0.0.1:{args.worker_base_port + i}" for i in range(args.workers)]
+    if args.route_only:
+        run_router(urls, args.host, args.port, reuse_port=True)
+        return
+
+    started = time.perf_counter()
+    sup = Supervisor(args.workers, args.worker_base_port, None if args.no_store else args.store_dir, args.backend)
+    sup.start()
+    extra = [subprocess.Popen([sys.executable, "-m", "core.router", "--route-only", "--workers", str(args.workers),
+                               "--worker-base-port", str(args.worker_base_port), "--host", args.host,
+                               "--port", str(args.port)], cwd=_ROOT) for _ in range(args.routers - 1)]
+    if not args.no_discovery:
+        try:
+            discovery.SessionAnnouncer(sup.sessions, http_port=args.port).start()
+        except OSError as e:
+            print(f"LAN discovery disabled: {e}")
+    print(f"Host ready on {args.host}:{args.port}: {args.workers} workers, {args.routers} routers "
+          f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    try:
+        run_router(urls, args.host, args.port, reuse_port=args.routers > 1)
+    finally:
+        for proc in extra: proc.terminate()
+        sup.stop()
+
+
+if __name__ == "__main__":
+    main()
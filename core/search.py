@@ -0,0 +1,115 @@
+"""
+Повнотекстовий пошук (SQLite FTS5) по монстрах, закляттях, спорядженню та рисах у dnd_data.sqlite3.
+
+Індекс srd_search містить назву і текст опису кожного запису; srd_search_docs зіставляє рядок
+індексу з таблицею-джерелом (kind) та index_name. Текст опису будується з JSON рядка виразами
+JSON1 (KINDS), а тригери на таблицях-джерелах оновлюють індекс при кожній зміні - як у core/bestiary.py.
+
+Запит ранжується bm25 з більшою вагою назви; кожне слово запиту - префікс ("fire bo" знайде Fire Bolt).
+"""
+import re
+
+from core import srd_schema
+
+SCHEMA_VERSION = 1  # збільшити, коли змінюється схема або KINDS (див. core/srd_schema.py)
+NAME_WEIGHT = 10.0  # у скільки разів збіг у назві важить більше за збіг в описі
+
+
+def _field(path):
+    return f"COALESCE(json_extract({{data}}, '{path}'), '')"
+
+
+def _join(path, item="value"):
+    """Елементи JSON-масиву через пробіл; item - вираз від value (елемента)."""
+    return f"COALESCE((SELECT group_concat({item}, ' ') FROM json_each({{data}}, '{path}')), '')"
+
+
+_NAMED = "json_extract(value, '$.name') || ': ' || json_extract(value, '$.desc')"
+
+# {таблиця-джерело: частини тексту опису}; {data} - JSON рядка
+KINDS = {
+    "monsters": (_field("$.type"), _join("$.special_abilities", _NAMED), _join("$.actions", _NAMED),
+                 _join("$.legendary_actions", _NAMED)),
+    "spells": (_field("$.school.name"), _join("$.desc"), _join("$.higher_level")),
+    # У базі є записи спорядження і формату SRD 2014 (equipment_category, desc), і 2024 (equipment_categories, description)
+    "equipment": (_field("$.equipment_category.name"), _join("$.equipment_categories", "json_extract(value, '$.name')"),
+                  _field("$.weapon_category"), _field("$.armor_category"), _field("$.gear_category.name"),
+                  _join("$.properties", "json_extract(value, '$.name')"), _join("$.desc"), _field("$.description")),
+    "traits": (_join("$.desc"),),
+}
+
+
+def _body(kind, data):
+    return " || ' ' || ".join(KINDS[kind]).format(data=data)
+
+
+def _schema(kinds):
+    """Скрипт міграції для наявних у базі таблиць-джерел."""
+    sql = ["DROP TABLE IF EXISTS srd_search;", "DROP TABLE IF EXISTS srd_search_docs;"]
+    sql += [f"DROP TRIGGER IF EXISTS srd_search_{kind}_{event};" for kind in KINDS for event in ("insert", "update", "delete")]
+    sql.append("""
+CREATE TABLE srd_search_docs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    index_name TEXT NOT NULL,
+    name TEXT,
+    UNIQUE (kind, index_name)
+);
+CREATE VIRTUAL TABLE srd_search USING fts5(name, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3');
+""")
+    for kind in kinds:
+        drop = ("DELETE FROM srd_search WHERE rowid IN "
+                f"(SELECT id FROM srd_search_docs WHERE kind = '{kind}' AND index_name = {{row}}.index_name);\n"
+                f"    DELETE FROM srd_search_docs WHERE kind = '{kind}' AND index_name = {{row}}.index_name;")
+        # last_insert_rowid() у тригері - id щойно вставленого srd_search_docs
+        add = (f"INSERT INTO srd_search_docs(kind, index_name, name) VALUES ('{kind}', NEW.index_name, NEW.name);\n"
+               f"    INSERT INTO srd_search(rowid, name, body) VALUES (last_insert_rowid(), NEW.name, {_body(kind, 'NEW.data')});")
+        sql.append(f"""
+CREATE TRIGGER srd_search_{kind}_insert AFTER INSERT ON "{kind}" BEGIN
+    {drop.format(row="NEW")}
+    {add}
+END;
+CREATE TRIGGER srd_search_{kind}_update AFTER UPDATE ON "{kind}" BEGIN
+    {drop.format(row="OLD")}
+    {add}
+END;
+CREATE TRIGGER srd_search_{kind}_delete AFTER DELETE ON "{kind}" BEGIN
+    {drop.format(row="OLD")}
+END;
+INSERT INTO srd_search_docs(kind, index_name, name) SELECT '{kind}', index_name, name FROM "{kind}";
+INSERT INTO srd_search(rowid, name, body)
+SELECT d.id, t.name, {_body(kind, 't.data')} FROM "{kind}" t JOIN srd_search_docs d ON d.kind = '{kind}' AND d.index_name = t.index_name;
+""")
+    return "\n".join(sql)
+
+
+def migrate(conn):
+    """Створює (або перестворює застарілий) індекс пошуку. True - міграцію виконано."""
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    kinds = [k for k in KINDS if k in existing]
+    if not kinds: return False
+    return srd_schema.migrate(conn, "search", SCHEMA_VERSION, _schema(kinds))
+
+
+def fts_query(text):
+    """Текст користувача -> запит FTS5: усі слова, кожне як префікс. "" - шукати нічого."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def search(conn, text, kinds=None, limit=20):
+    """
+    Найкращі збіги: [{"kind", "index", "name", "snippet"}], від найрелевантнішого.
+    kinds - таблиці-джерела з KINDS (за замовчуванням усі).
+    """
+    query = fts_query(text)
+    if not query: return []
+    sql = ("SELECT d.kind, d.index_name, d.name, snippet(srd_search, 1, '', '', '…', 12) "
+           "FROM srd_search JOIN srd_search_docs d ON d.id = srd_search.rowid WHERE srd_search MATCH ?")
+    params = [query]
+    if kinds is not None:
+        kinds = [kinds] if isinstance(kinds, str) else list(kinds)
+        sql += f" AND d.kind IN ({', '.join('?' * len(kinds))})"
+        params += kinds
+    sql += f" ORDER BY bm25(srd_search, {NAME_WEIGHT}, 1.0) LIMIT ?"
+    rows = conn.execute(sql, params + [limit])
+    return [{"kind": kind, "index": index, "name": name, "snippet": snippet} for kind, index, name, snippet in rows]
@@ -0,0 +1,803 @@
+"""
+Хост сесій: стан сесій, HTTP API, журнал на диску, оголошення в локальній мережі.
+
+Модуль не залежить від Qt: його використовує вбудований у застосунок ДМ сервер
+(DataManager.start_server) і окремий headless-хост для постійно увімкненого комп'ютера:
+
+    python -m core.server [--port 5000] [--backend flask|aiohttp] [--store sessions.sqlite3]
+
+Qt-клієнт (core/data_manager.py) працює з цим станом через ті самі операції,
+що й HTTP-маршрути: напряму, якщо хост у тому ж процесі, інакше - по мережі.
+"""
+import argparse
+import atexit
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+
+from flask import Flask, request
+from werkzeug.serving import make_server
+
+from core import discovery, wire
+from core.replay import SessionHistory, TOKEN_PATCH_KEYS, patch_combat
+from core.session_store import SessionStore
+from core.snapshot import FrozenDict, freeze
+
+app = Flask(__name__)
+
+log = logging.getLogger('werkzeug')
+log.setLevel(logging.ERROR)
+
+# Стан сесій зберігається як незмінні знімки (FrozenDict/tuple): запис будує нову версію,
+# перевикористовуючи незмінені частини, і атомарно підміняє посилання в db_store.
+# Тому локи серіалізують лише записи, а читачі просто беруть поточне посилання без локу.
+# Виняток - список logs сесії: він тільки дописується, записи в ньому незмінні.
+#
+# Записи різних сесій і різних частин однієї сесії (гравці, лог, бій) не блокують одне одного:
+# у кожної сесії свій набір локів (_SessionLocks). db_lock захищає лише реєстр цих наборів.
+# Порядок захоплення: лок частини -> events; ніколи навпаки.
+db_lock = threading.Lock()
+
+
+class _SessionLocks:
+    """
+    Локи однієї сесії: окремо на гравців, лог і бій + умова для очікування подій.
+    Локи частин повторно-вхідні: перевірку і зміну можна зробити атомарно під одним локом.
+    """
+    __slots__ = ("players", "logs", "combat", "events")
+
+    def __init__(self):
+        self.players = threading.RLock()  # підміна знімка сесії (гравці, статус)
+        self.logs = threading.RLock()  # дописування в лог
+        self.combat = threading.RLock()  # стан бою та його журнал
+        self.events = threading.Condition()  # лічильники подій; нею прокидаються ті, хто чекає /events
+
+
+session_locks = {}  # {sid: _SessionLocks} - лише для наявних сесій (сесії не видаляються)
+
+
+def _locks(sid, create=False):
+    """
+    Набір локів сесії або None, якщо такої сесії немає: довільні sid від клієнтів не роздувають реєстр.
+    create=True - для публікації нової сесії (_put_session, _init_combat_state).
+    """
+    locks = session_locks.get(sid)
+    if locks is None:
+        with db_lock:
+            if not create and sid not in db_store["sessions"]: return None
+            locks = session_locks.setdefault(sid, _SessionLocks())
+    return locks
+
+
+# Скільки останніх змін бою пам'ятає сервер для дельта-синхронізації
+COMBAT_JOURNAL_SIZE = 256
+
+db_store = {
+    "sessions": {},  # {sid: FrozenDict(status, players, logs, dm_id)}
+    "active_session_id": None,
+    "items": {},
+    "combat_state": {},  # {sid: FrozenDict стану бою, включно з "rev" - номером ревізії}
+    "combat_journal": {},  # {sid: tuple[(rev, змінені токени, видалені токени, змінені поля)]}
+    "events": {}  # {sid: {"seq": останній номер події, "log"/"players"/"combat": номер останньої зміни}}
+}
+
+EVENT_KINDS = ("log", "players", "combat")
+
+# Додаткові слухачі подій: listener(sid) викликається з потоку, що зробив запис.
+# Через них асинхронний сервер (core/aio_server.py) будить своїх очікувачів без потоку на клієнта.
+event_listeners = []
+
+
+def _notify(sid, kind):
+    """Реєструє подію (log/players/combat) та будить усіх, хто її чекає."""
+    cond = _locks(sid).events
+    with cond:
+        ev = db_store["events"].setdefault(sid, dict.fromkeys(("seq",) + EVENT_KINDS, 0))
+        ev["seq"] += 1
+        ev[kind] = ev["seq"]
+        cond.notify_all()
+    for listener in event_listeners: listener(sid)
+
+
+def _wake(sid):
+    """Будить тих, хто чекає подій сесії, не реєструючи події (щоб вони перевірили cancelled)."""
+    locks = _locks(sid)
+    if locks is None: return
+    with locks.events: locks.events.notify_all()
+
+
+def _wait_events(sid, cursor, timeout, cancelled=None):
+    """
+    Блокує, доки в сесії не з'явиться подія новіша за cursor (або не мине timeout).
+    Повертає (новий cursor, список типів, що змінилися). cursor=None - віддати все одразу.
+    KeyError - сесії немає.
+    """
+    locks = _locks(sid)
+    if locks is None: raise KeyError(sid)
+    cond = locks.events
+    with cond:
+        if cursor is not None:
+            cond.wait_for(lambda: _pending_events(sid, cursor)[1] or (cancelled is not None and cancelled()), timeout)
+        return _pending_events(sid, cursor)
+
+
+def _pending_events(sid, cursor):
+    """Неблокуючий варіант _wait_events: (cursor, типи подій новіших за cursor; можливо порожній список)."""
+    ev = db_store["events"].get(sid) or dict.fromkeys(("seq",) + EVENT_KINDS, 0)
+    # Невідомий курсор (напр. сервер перезапустився) - вважаємо, що змінилось усе
+    if cursor is None or cursor > ev["seq"]:
+        return ev["seq"], list(EVENT_KINDS)
+    return ev["seq"], [k for k in EVENT_KINDS if ev[k] > cursor]
+
+
+# Кожна зміна стану, зроблена функціями нижче, записується під тим самим локом, що й сама зміна
+# (тож порядок записів збігається з порядком змін): в історію сесії для перемотування (core/replay.py)
+# і, якщо увімкнено enable_session_store, - в журнал на диску.
+session_store = None
+session_history = {}  # {sid: SessionHistory}
+
+
+def _save_checkpoint(sid, position, data):
+    if session_store is not None: session_store.checkpoint(sid, position, data)
+
+
+def _history(sid):
+    h = session_history.get(sid)
+    if h is None:
+        with db_lock:
+            h = session_history.setdefault(sid, SessionHistory(functools.partial(_save_checkpoint, sid)))
+    return h
+
+
+def _record(sid, kind, payload=None):
+    # Зміни різних частин сесії йдуть під різними локами; лок подій тримає однаковий порядок
+    # в історії і в журналі - на позиціях у ньому тримаються збережені контрольні точки
+    with _locks(sid).events:
+        _history(sid).record(kind, payload)
+        if session_store is not None: session_store.append(sid, kind, payload)
+
+
+def _put_session(sid, data):
+    """Публікує (нову) сесію."""
+    session = freeze({k: v for k, v in data.items() if k != "logs"})
+    with _locks(sid, create=True).players:
+        logs = freeze(data.get("logs", []))
+        db_store["sessions"][sid] = FrozenDict(session, logs=list(logs))
+        # У запис іде незмінна копія логу: список у db_store далі дописується
+        _record(sid, "session", FrozenDict(session, logs=logs))
+
+
+def _set_session_fields(sid, **fields):
+    """Публікує нову версію сесії зі зміненими полями верхнього рівня (status, last_save...)."""
+    locks = _locks(sid)
+    if locks is None: return False
+    with locks.players:
+        session = db_store["sessions"].get(sid)
+        if session is None: return False
+        fields = {k: freeze(v) for k, v in fields.items()}
+        db_store["sessions"][sid] = FrozenDict(session, **fields)
+        _record(sid, "session_fields", fields)
+        _notify(sid, "players")
+    return True
+
+
+def _put_player(sid, uid, data, merge=False):
+    """
+    Публікує нову версію сесії з доданим/оновленим гравцем.
+    merge=True - дописати поля до наявного гравця. Повертає False, якщо сесії (гравця) немає.
+    """
+    locks = _locks(sid)
+    if locks is None: return False
+    with locks.players:
+        session = db_store["sessions"].get(sid)
+        if session is None: return False
+        players = session["players"]
+        if merge:
+            if uid not in players: return False
+            data = {**players[uid], **data}
+        data = freeze(data)
+        db_store["sessions"][sid] = FrozenDict(session, players=FrozenDict(players, **{uid: data}))
+        _record(sid, "player", {"uid": uid, "data": data})
+        _notify(sid, "players")
+    return True
+
+
+def _append_log(sid, entry):
+    """Додає запис у лог сесії, присвоюючи йому порядковий номер seq."""
+    locks = _locks(sid)
+    if locks is None: return False
+    with locks.logs:
+        session = db_store["sessions"].get(sid)
+        if session is None: return False
+        # Лог тільки дописується, тому seq == позиція запису + 1
+        session["logs"].append(freeze(dict(entry, seq=len(session["logs"]) + 1)))
+        _record(sid, "log", session["logs"][-1])
+        _notify(sid, "log")
+    return True
+
+
+def _logs_after(sid, after, uid):
+    """
+    Записи логу з seq > after, які може бачити користувач uid
+    (чужі секретні записи відкидаються). Лок не потрібен: записи незмінні.
+    """
+    logs = db_store["sessions"].get(sid, {}).get("logs", [])
+    return [l for l in logs[max(after, 0):] if not l.get("is_secret") or l.get("sender_id") == uid]
+
+
+def _init_combat_state(sid, state=None):
+    """Створює порожній стан бою для сесії (або відновлює збережений state)."""
+    if state is None:
+        state = {"active": False, "round": 0, "turn_order": [], "current_turn_index": 0, "tokens": {}, "rev": 0}
+    with _locks(sid, create=True).combat:
+        db_store["combat_journal"][sid] = ()
+        db_store["combat_state"][sid] = freeze(state)
+        _record(sid, "combat_init", db_store["combat_state"][sid])
+
+
+def _apply_combat_patch(sid, patch):
+    """
+    Будує нову версію стану бою з патчем, збільшує ревізію та записує зміну в журнал.
+    Незмінені токени переходять у нову версію без копіювання.
+    Повертає нову ревізію або None, якщо сесії немає.
+    """
+    patch = freeze({k: v for k, v in patch.items() if k != "rev"})
+    locks = _locks(sid)
+    if locks is None: return None
+    with locks.combat:
+        st = db_store["combat_state"].get(sid)
+        if st is None: return None
+        new = patch_combat(st, patch)
+        rev = new["rev"]
+        changed = tuple(patch.get("tokens", ())) + tuple(patch.get("token_fields", ()))
+        entry = (rev, changed, tuple(patch.get("removed", ())), tuple(k for k in patch if k not in TOKEN_PATCH_KEYS))
+        # Спершу журнал, потім стан: читач, що взяв стан, завжди знайде в журналі всі його зміни
+        db_store["combat_journal"][sid] = db_store["combat_journal"][sid][-(COMBAT_JOURNAL_SIZE - 1):] + (entry,)
+        db_store["combat_state"][sid] = new
+        _record(sid, "combat", patch)
+        _notify(sid, "combat")
+    return rev
+
+
+def _combat_delta(sid, since):
+    """
+    Повертає зміни стану бою після ревізії since.
+    None - змін немає; повний стан - якщо журнал вже не покриває since.
+    """
+    st = db_store["combat_state"][sid]
+    journal = db_store["combat_journal"][sid]
+    rev = st["rev"]
+    if since == rev: return None
+    if since > rev or not journal or journal[0][0] > since + 1:
+        return st
+
+    changed, removed, fields = set(), set(), set()
+    for entry_rev, tok_changed, tok_removed, f_changed in journal:
+        # Записи новіші за взятий знімок підхопимо наступного разу
+        if not since < entry_rev <= rev: continue
+        changed.update(tok_changed)
+        removed.update(tok_removed)
+        fields.update(f_changed)
+    delta = {k: st[k] for k in fields if k in st}
+    delta["tokens"] = {u: st["tokens"][u] for u in changed if u in st["tokens"]}
+    delta["removed"] = [u for u in removed if u not in st["tokens"]]
+    delta["rev"] = rev
+    delta["delta"] = True
+    return delta
+
+
+# Як відтворити кожен тип запису журналу session_store
+_REPLAY = {
+    "session": _put_session,
+    "session_fields": lambda sid, p: _set_session_fields(sid, **p),
+    "player": lambda sid, p: _put_player(sid, p["uid"], p["data"]),
+    "log": _append_log,
+    "combat_init": _init_combat_state,
+    "combat": lambda sid, p: _apply_combat_patch(sid, p),
+}
+
+
+def _snapshot_session(sid):
+    """Атомарно бере стан сесії (усі її частини) і віддає в session_store як стиснений знімок."""
+    locks = _locks(sid)
+    if locks is None: return
+    with locks.players, locks.logs, locks.combat:
+        session, combat = db_store["sessions"].get(sid), db_store["combat_state"].get(sid)
+        if session is None or session_store is None: return
+        session_store.snapshot(sid, {"session": FrozenDict(session, logs=tuple(session["logs"])), "combat": combat})
+
+
+def enable_session_store(path):
+    """
+    Вмикає збереження сесій у SQLite-файл path: відновлює з нього всі збережені сесії
+    (знімок + журнал після нього) і далі журналює кожну зміну. Історія відновленої сесії до
+    перезапуску читається з файлу лише при першому перемотуванні. Повторний виклик нічого не робить.
+    """
+    global session_store
+    if session_store is not None: return session_store
+    store = SessionStore(path)
+    start = time.perf_counter()
+    saved = store.load()
+    for sid, data in saved.items():
+        if data["snapshot"]:
+            _put_session(sid, data["snapshot"]["session"])
+            if data["snapshot"]["combat"] is not None: _init_combat_state(sid, data["snapshot"]["combat"])
+        for kind, payload in data["journal"]:
+            _REPLAY[kind](sid, payload)
+        session = db_store["sessions"][sid]
+        session_history[sid] = SessionHistory.resumed(
+            data["length"], FrozenDict((k, v) for k, v in session.items() if k != "logs"),
+            db_store["combat_state"].get(sid), session["logs"],
+            functools.partial(store.history, sid, data["length"]), functools.partial(_save_checkpoint, sid))
+    if saved: print(f"Restored {len(saved)} sessions in {(time.perf_counter() - start) * 1000:.1f} ms")
+    store.start(_snapshot_session)
+    session_store = store
+    atexit.register(store.close)
+    # Після перезапуску жодна відновлена сесія не проводиться - їх можна знову завантажити
+    for sid in saved:
+        if db_store["sessions"].get(sid, {}).get("status") == "ACTIVE": _set_session_fields(sid, status="INACTIVE")
+    return store
+
+
+def _respond(body, status=200):
+    """Відповідь у форматі, який просить клієнт (JSON за замовчуванням; див. core/wire.py)."""
+    if status == 304: return "", 304
+    data, headers = wire.encode_response(body, request.headers.get("Accept"), request.headers.get("Accept-Encoding"))
+    return app.response_class(data, status=status, headers=headers)
+
+
+def _request_data():
+    return wire.decode_request(request.get_data(), request.content_type, request.headers.get("Content-Encoding"))
+
+
+@app.route('/status', methods=['GET'])
+def get_status(): return _respond({"status": "running", "dm_id": "HOST"})
+
+
+@app.route('/session/<sid>', methods=['GET'])
+def get_session(sid):
+    body, status = _read_session(sid)
+    return _respond(body, status)
+
+
+@app.route('/session/<sid>/players', methods=['GET'])
+def get_session_players(sid):
+    body, status = _read_players(sid)
+    return _respond(body, status)
+
+
+@app.route('/session/new', methods=['POST'])
+def create_session():
+    return _respond(_op_create_session(_request_data())[0])
+
+
+# Операції повертають (тіло відповіді, HTTP статус) і не залежать від веб-фреймворку:
+# їх викликають маршрути Flask, /batch і асинхронний сервер (core/aio_server.py)
+def _read_session(sid):
+    session = db_store["sessions"].get(sid)
+    return (session, 200) if session else ({"error": "Not found"}, 404)
+
+
+def _read_players(sid):
+    """Лише гравці сесії - без логу, який у повній сесії найбільший."""
+    session = db_store["sessions"].get(sid)
+    return ({"players": session.get("players", {})}, 200) if session else ({"error": "Not found"}, 404)
+
+
+def _read_logs(sid, after, uid):
+    if sid not in db_store["sessions"]: return {"error": "Not found"}, 404
+    return {"logs": _logs_after(sid, after, uid)}, 200
+
+
+def _read_combat(sid, since):
+    """Стан бою або дельта після ревізії since; (None, 304) - змін немає."""
+    if sid not in db_store["combat_state"]: return {}, 200
+    state = db_store["combat_state"][sid] if since is None else _combat_delta(sid, since)
+    return (None, 304) if state is None else (state, 200)
+
+
+def _announced_sessions():
+    """Активні сесії для оголошення в локальній мережі (core/discovery.py) і маршрутизатора (core/router.py)."""
+    return [{"id": sid, "players": len(s.get("players", ()))} for sid, s in list(db_store["sessions"].items())
+            if s.get("status") == "ACTIVE"]
+
+
+def _read_history(sid, at=None):
+    """Стан бою після події номер at історії сесії (за замовчуванням - останньої)."""
+    h = session_history.get(sid)
+    if h is None or sid not in db_store["sessions"]: return {"error": "Not found"}, 404
+    length = len(h)
+    at = length if at is None else max(h.start, min(at, length))
+    return {"length": length, "index": at, "ts": h.timestamp(at), "combat": h.combat_at(at)}, 200
+
+
+def _op_create_session(data):
+    sid = data.get("id")
+    _init_combat_state(sid)
+    _put_session(sid, data["data"])
+    db_store["active_session_id"] = sid
+    return {"success": True}, 200
+
+
+# Поля сесії, які ДМ може змінювати через /session/update
+SESSION_FIELDS = ("status", "last_save", "saved_state")
+
+
+def _op_update_session(data):
+    """
+    Зміна полів сесії ДМ-ом: {"sid", "uid", "fields": {...}, "flush": bool}.
+    flush - дочекатися, доки журнал сесій запишеться на диск ("saved" у відповіді).
+    """
+    sid, fields = data.get("sid"), data.get("fields") or {}
+    session = db_store["sessions"].get(sid)
+    if session is None: return {"error": "No session"}, 404
+    if data.get("uid") != session.get("dm_id"): return {"error": "Only DM can change the session"}, 403
+    if any(k not in SESSION_FIELDS for k in fields): return {"error": "Bad fields"}, 400
+    _set_session_fields(sid, **fields)
+    saved = session_store.flush() if data.get("flush") and session_store is not None else False
+    return {"success": True, "saved": saved}, 200
+
+
+def _op_join(data):
+    sid, uid, p_data = data.get("sid"), data.get("uid"), data.get("player_data")
+    # Перевірка до запису: відмова не повинна лишати в сесії гравця без запису JOIN у лозі
+    if not uid or not isinstance(p_data, dict) or not isinstance(p_data.get("name"), str):
+        return {"error": "Bad player data"}, 400
+    if _put_player(sid, uid, p_data):
+        log = {"type": "JOIN", "content": f"{p_data['name']} приєднався!", "timestamp": time.strftime("%H:%M"),
+               "sender_id": "SYS",
+               "is_secret": False}
+        _append_log(sid, log)
+        return {"success": True}, 200
+    return {"error": "No session"}, 404
+
+
+def _op_update_player(data):
+    sid, uid, new_data = data.get("sid"), data.get("uid"), data.get("data")
+    if _put_player(sid, uid, new_data, merge=True):
+        return {"success": True}, 200
+    return {"error": "Err"}, 404
+
+
+def _op_add_log(data):
+    sid, log = data.get("sid"), data.get("log")
+    if _append_log(sid, log):
+        return {"success": True}, 200
+    return {"error": "Err"}, 404
+
+
+class _Rejected(Exception):
+    """Команда бою порушує правила: HTTP статус і причина."""
+
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status, self.error = status, error
+
+
+def _command_token(st, data):
+    tok = st["tokens"].get(data.get("token"))
+    if tok is None: raise _Rejected(404, "No token")
+    return data["token"], tok
+
+
+def _position(data, default=None):
+    x, y = data.get("x", default), data.get("y", default)
+    if not (type(x) is int and type(y) is int and x >= 0 and y >= 0): raise _Rejected(400, "Bad position")
+    return x, y
+
+
+def _cmd_move(st, data, actor, is_dm):
+    """MOVE {token, x, y}: ДМ до бою рухає всіх, у бою - всіх, крім гравців; гравець - лише власний токен."""
+    x, y = _position(data)
+    uid, tok = _command_token(st, data)
+    if is_dm:
+        if st.get("active") and tok.get("type") == "player": raise _Rejected(403, "DM cannot move players during combat")
+    elif uid != actor:
+        raise _Rejected(403, "Not your token")
+    return {"token_fields": {uid: {"x": x, "y": y}}}
+
+
+def _cmd_damage(st, data, actor, is_dm):
+    """DAMAGE {token, amount}: шкода (від'ємна - лікування). Гравець - лише в бою і у свій хід."""
+    amount = data.get("amount")
+    if type(amount) is not int: raise _Rejected(400, "Bad amount")
+    uid, tok = _command_token(st, data)
+    if not is_dm and _current_actor(st) != actor: raise _Rejected(403, "Not your turn")
+    if not isinstance(tok.get("hp"), int): raise _Rejected(409, "Token has no hp")
+    hp = max(0, tok["hp"] - amount)
+    if isinstance(tok.get("max_hp"), int): hp = min(hp, tok["max_hp"])
+    return {"token_fields": {uid: {"hp": hp}}}
+
+
+def _cmd_spawn(st, data, actor, is_dm):
+    """SPAWN {token, data}: новий токен. Гравець може поставити на мапу лише себе (type="player")."""
+    uid, tok = data.get("token"), data.get("data")
+    if not uid or not isinstance(tok, dict): raise _Rejected(400, "Bad token")
+    _position(tok, 0)
+    if not is_dm and (uid != actor or tok.get("type") != "player"): raise _Rejected(403, "Not your token")
+    if uid in st["tokens"]: raise _Rejected(409, "Token exists")
+    return {"tokens": {uid: tok}}
+
+
+def _cmd_remove(st, data, actor, is_dm):
+    """REMOVE {token}: лише ДМ. Токен зникає і з черги ходів, поточний хід лишається за тим самим учасником."""
+    if not is_dm: raise _Rejected(403, "Only DM can remove tokens")
+    uid, _ = _command_token(st, data)
+    patch = {"removed": [uid]}
+    order = st.get("turn_order", ())
+    pos = next((i for i, t in enumerate(order) if t.get("uid") == uid), None)
+    if pos is not None:
+        idx = st.get("current_turn_index", 0)
+        rest = order[:pos] + order[pos + 1:]
+        if pos < idx: idx -= 1
+        patch.update(turn_order=rest, current_turn_index=idx if idx < len(rest) else 0)
+    return patch
+
+
+def _cmd_next_turn(st, data, actor, is_dm):
+    """NEXT_TURN: передати хід наступному (ДМ або той, чий зараз хід). Після останнього - новий раунд."""
+    if not st.get("active") or not st.get("turn_order"): raise _Rejected(409, "Combat is not active")
+    if not is_dm and _current_actor(st) != actor: raise _Rejected(403, "Not your turn")
+    idx = st.get("current_turn_index", 0) + 1
+    if idx < len(st["turn_order"]): return {"current_turn_index": idx}
+    return {"current_turn_index": 0, "round": st.get("round", 0) + 1}
+
+
+def _cmd_roll_initiative(st, data, actor, is_dm):
+    """
+    ROLL_INITIATIVE {rolls: {uid: результат кидка}}: лише ДМ. Черга ходів - за спаданням результатів,
+    імена й типи беруться з токенів. Гравцю сесії без токена хост ставить токен на мапу.
+    """
+    if not is_dm: raise _Rejected(403, "Only DM can roll initiative")
+    rolls = data.get("rolls")
+    if not isinstance(rolls, dict) or not rolls: raise _Rejected(400, "Bad rolls")
+    players = db_store["sessions"][data["sid"]].get("players", {})
+    added, order = {}, []
+    for uid, total in rolls.items():
+        if type(total) is not int: raise _Rejected(400, "Bad roll")
+        tok = st["tokens"].get(uid)
+        if tok is None:
+            if uid not in players: raise _Rejected(404, "No token")
+            tok = added[uid] = {"x": 1, "y": 1, "color": "#388E3C", "name": players[uid].get("name"), "type": "player"}
+        order.append({"uid": uid, "name": tok.get("name"), "total": total, "type": tok.get("type", "unknown")})
+    order.sort(key=lambda e: e["total"], reverse=True)
+    patch = {"turn_order": order, "current_turn_index": 0}
+    if added: patch["tokens"] = added
+    return patch
+
+
+def _cmd_start_combat(st, data, actor, is_dm):
+    """START_COMBAT: лише ДМ і лише після ROLL_INITIATIVE. Перший раунд починає перший у черзі."""
+    if not is_dm: raise _Rejected(403, "Only DM can start combat")
+    if st.get("active"): raise _Rejected(409, "Combat is already active")
+    if not st.get("turn_order"): raise _Rejected(409, "Roll initiative first")
+    return {"active": True, "round": 1, "current_turn_index": 0}
+
+
+def _current_turn(st):
+    """Запис черги ходів того, чий зараз хід (None - бій не йде)."""
+    order, idx = st.get("turn_order", ()), st.get("current_turn_index", 0)
+    return order[idx] if st.get("active") and 0 <= idx < len(order) else None
+
+
+def _current_actor(st):
+    """uid того, чий зараз хід (None - бій не йде)."""
+    turn = _current_turn(st)
+    return turn.get("uid") if turn else None
+
+
+COMBAT_COMMANDS = {
+    "MOVE": _cmd_move,
+    "DAMAGE": _cmd_damage,
+    "SPAWN": _cmd_spawn,
+    "REMOVE": _cmd_remove,
+    "NEXT_TURN": _cmd_next_turn,
+    "ROLL_INITIATIVE": _cmd_roll_initiative,
+    "START_COMBAT": _cmd_start_combat,
+}
+
+
+def _op_combat_command(data):
+    """
+    Команда бою {"sid", "uid" (хто виконує), "cmd", ...аргументи}. Хост перевіряє права (ДМ - dm_id сесії)
+    і фазу бою, після чого застосовує лише змінені поля одним патчем під локом бою.
+    Відповідь: {"success", "rev", "turn" - запис черги ходів того, чий тепер хід, або None};
+    при відмові - {"error", "rev"} зі статусом 4xx.
+    """
+    sid, actor = data.get("sid"), data.get("uid")
+    session = db_store["sessions"].get(sid)
+    if session is None: return {"error": "No session"}, 404
+    command = COMBAT_COMMANDS.get(data.get("cmd"))
+    if command is None: return {"error": f"Unknown command {data.get('cmd')}"}, 400
+    with _locks(sid).combat:
+        st = db_store["combat_state"][sid]
+        try:
+            patch = command(st, data, actor, actor == session.get("dm_id"))
+        except _Rejected as e:
+            return {"error": e.error, "rev": st["rev"]}, e.status
+        rev = _apply_combat_patch(sid, patch)
+        turn = _current_turn(db_store["combat_state"][sid])
+    return {"success": True, "rev": rev, "turn": turn}, 200
+
+
+# Які маршрути можна виконувати всередині /batch
+BATCH_OPS = {
+    "/session/new": _op_create_session,
+    "/join": _op_join,
+    "/player/update": _op_update_player,
+    "/update/logs": _op_add_log,
+    "/combat/command": _op_combat_command,
+    "/session/update": _op_update_session,
+}
+
+
+@app.route('/session/update', methods=['POST'])
+def update_session_route():
+    body, status = _op_update_session(_request_data())
+    return _respond(body, status)
+
+
+@app.route('/join', methods=['POST'])
+def join_player():
+    body, status = _op_join(_request_data())
+    return _respond(body, status)
+
+
+@app.route('/player/update', methods=['POST'])
+def update_player():
+    body, status = _op_update_player(_request_data())
+    return _respond(body, status)
+
+
+@app.route('/update/logs', methods=['POST'])
+def add_log():
+    body, status = _op_add_log(_request_data())
+    return _respond(body, status)
+
+
+@app.route('/batch', methods=['POST'])
+def batch_route():
+    """
+    Кілька операцій запису за один запит: {"ops": [{"path": "/combat/command", "body": {...}}, ...]}.
+    Операції виконуються по черзі; відповідь містить результат кожної.
+    """
+    return _respond(_op_batch(_request_data())[0])
+
+
+def _op_batch(data):
+    results = []
+    for op in data.get("ops", []):
+        handler = BATCH_OPS.get(op.get("path"))
+        if handler is None:
+            results.append({"status": 400, "body": {"error": f"Unknown op {op.get('path')}"}})
+            continue
+        body, status = handler(op.get("body") or {})
+        results.append({"status": status, "body": body})
+    return {"results": results}, 200
+
+
+@app.route('/sessions', methods=['GET'])
+def get_sessions_route():
+    return _respond({"sessions": _announced_sessions()})
+
+
+@app.route('/logs/<sid>', methods=['GET'])
+def get_logs_route(sid):
+    body, status = _read_logs(sid, request.args.get("after", 0, type=int), request.args.get("uid"))
+    return _respond(body, status)
+
+
+@app.route('/history/<sid>', methods=['GET'])
+def get_history_route(sid):
+    body, status = _read_history(sid, request.args.get("at", type=int))
+    return _respond(body, status)
+
+
+@app.route('/combat/state/<sid>', methods=['GET'])
+def get_combat_state_route(sid):
+    body, status = _read_combat(sid, request.args.get("since", type=int))
+    return _respond(body, status)
+
+
+EVENTS_MAX_TIMEOUT = 60  # найдовше очікування одного long-poll запиту, с
+
+
+@app.route('/events/<sid>', methods=['GET'])
+def wait_events_route(sid):
+    """Long-poll: відповідає, щойно в сесії змінилися логи, гравці чи бій."""
+    cursor = request.args.get("cursor", type=int)
+    timeout = min(request.args.get("timeout", 25, type=float), EVENTS_MAX_TIMEOUT)
+    if sid not in db_store["sessions"]: return _respond({"error": "Not found"}, 404)
+    cursor, kinds = _wait_events(sid, cursor, timeout)
+    return _respond({"cursor": cursor, "kinds": kinds})
+
+
+@app.route('/combat/command', methods=['POST'])
+def combat_command_route():
+    body, status = _op_combat_command(_request_data())
+    return _respond(body, status)
+
+
+# --- ЗАПУСК ---
+announcer = None  # discovery.SessionAnnouncer цього процесу
+server_address = None  # (backend, host, port) сервера, запущеного start_in_thread у цьому процесі
+_start_lock = threading.Lock()
+
+
+def start_announcer(http_port=5000):
+    """Оголошення активних сесій у локальній мережі, щоб гравцям не вводити IP. Один раз на процес."""
+    global announcer
+    if announcer is not None: return announcer
+    try:
+        announcer = discovery.SessionAnnouncer(_announced_sessions, http_port=http_port).start()
+    except OSError as e:
+        print(f"LAN discovery disabled: {e}")
+    return announcer
+
+
+def _run_flask(host, port):
+    app.run(host=host, port=port, debug=False, use_reloader=False)
+
+
+def start_in_thread(backend="flask", host='0.0.0.0', port=5000):
+    """
+    Запускає сервер у фоновому потоці. backend: "flask" (потік на запит)
+    або "aiohttp" (один event loop на всі з'єднання, потрібен пакет aiohttp).
+    Один раз на процес: повторний виклик повертає адресу вже запущеного (backend, host, port).
+    Якщо порт зайняти не вдалося - OSError одразу, а не в потоці сервера.
+    """
+    global server_address
+    with _start_lock:
+        if server_address is not None: return server_address
+        if backend == "aiohttp":
+            from core import aio_server
+            aio_server.start_in_thread(host=host, port=port)
+        elif backend == "flask":
+            # Порт займаємо самі: make_server при зайнятому порту завершує процес (sys.exit), а не кидає OSError
+            with socket.create_server((host, port)) as sock:
+                httpd = make_server(host, port, app, threaded=True, fd=sock.fileno())
+            threading.Thread(target=httpd.serve_forever, name="flask-server", daemon=True).start()
+        else:
+            raise ValueError(f"Unknown server backend: {backend}")
+        server_address = (backend, host, port)
+        return server_address
+
+
+def serve(backend="flask", host='0.0.0.0', port=5000):
+    """Як start_in_thread, але в поточному потоці - до зупинки процесу."""
+    if backend == "aiohttp":
+        import asyncio
+        from core import aio_server
+        asyncio.run(aio_server.serve(host, port))
+    elif backend == "flask":
+        _run_flask(host, port)
+    else:
+        raise ValueError(f"Unknown server backend: {backend}")
+
+
+def main(argv=None):
+    started = time.perf_counter()
+    default_store = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions.sqlite3")
+    parser = argparse.ArgumentParser(description="Headless-хост сесій D&D Assistant (без Qt)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--backend", choices=("flask", "aiohttp"), default="flask")
+    parser.add_argument("--store", default=default_store, help="файл збережених сесій")
+    parser.add_argument("--no-store", action="store_true", help="не зберігати сесії на диск")
+    parser.add_argument("--no-discovery", action="store_true", help="не оголошувати сесії в локальній мережі")
+    args = parser.parse_args(argv)
+
+    if not args.no_store: enable_session_store(args.store)
+    if not args.no_discovery: start_announcer(args.port)
+    print(f"Host ready on {args.host}:{args.port} ({args.backend}) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    serve(args.backend, args.host, args.port)
+
+
+if __name__ == "__main__":
+    # python -m core.server виконує файл як __main__; стан має жити в модулі core.server,
+    # який імпортують aio_server та інші
+    from core import server
+    server.main()
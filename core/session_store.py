@@ -0,0 +1,184 @@
+"""
+Збереження сесій хоста на диск (SQLite у режимі WAL).
+
+Кожна зміна стану сесії дописується в журнал (таблиця journal) фоновим потоком,
+пачками - запис у стан не чекає на диск. Періодично для сесії пишеться стиснений
+знімок (таблиця snapshots). Відновлення після падіння = останній знімок + рядки журналу після нього.
+Покриті знімком рядки переносяться з журналу в архів (таблиця history), тож журнал не росте; архів
+і контрольні точки (checkpoints) читаються лише для перемотування історії сесії (core/replay.py).
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sid TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS journal_sid ON journal(sid, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    sid TEXT PRIMARY KEY,
+    journal_id INTEGER NOT NULL,  -- знімок включає всі рядки журналу сесії з id <= journal_id
+    data TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (  -- рядки журналу, вже покриті знімком (id ті самі)
+    id INTEGER PRIMARY KEY,
+    sid TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_sid ON history(sid, id);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    sid TEXT NOT NULL,
+    position INTEGER NOT NULL,  -- стан сесії після стількох подій її історії
+    data TEXT NOT NULL,
+    PRIMARY KEY (sid, position)
+) WITHOUT ROWID;
+"""
+_CHECKPOINT = object()  # позначка контрольної точки історії в черзі запису
+
+
+class SessionStore:
+    COMPACT_EVERY = 500  # рядків журналу сесії між знімками
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # У WAL режимі NORMAL не псує базу при падінні, лише може втратити останні транзакції
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        with self._conn:  # журнали, які писалися без архіву, стискаються одразу
+            for sid, jid in self._conn.execute("SELECT sid, journal_id FROM snapshots").fetchall(): self._archive(sid, jid)
+        self._queue = queue.Queue()
+        self._since_snapshot = {}  # {sid: рядків журналу після останнього знімка}
+        self._snapshot_provider = None
+        self._thread = None
+
+    def load(self):
+        """
+        Збережені сесії: {sid: {"snapshot": dict або None, "journal": [(kind, payload), ...], "length": N}},
+        length - скільки подій в історії сесії (архів + журнал).
+        """
+        sessions = {}
+        for sid, data in self._conn.execute("SELECT sid, data FROM snapshots"):
+            sessions[sid] = {"snapshot": json.loads(data), "journal": []}
+        rows = self._conn.execute(
+            "SELECT j.sid, j.kind, j.payload FROM journal j LEFT JOIN snapshots s ON s.sid = j.sid "
+            "WHERE j.id > COALESCE(s.journal_id, 0) ORDER BY j.id")
+        for sid, kind, payload in rows:
+            saved = sessions.setdefault(sid, {"snapshot": None, "journal": []})
+            saved["journal"].append((kind, json.loads(payload) if payload is not None else None))
+        archived = dict(self._conn.execute("SELECT sid, COUNT(*) FROM history GROUP BY sid"))
+        for sid, saved in sessions.items():
+            self._since_snapshot[sid] = len(saved["journal"])
+            saved["length"] = archived.get(sid, 0) + len(saved["journal"])
+        return sessions
+
+    def history(self, sid, limit=-1):
+        """
+        Перші limit подій історії сесії та збережені контрольні точки до них:
+        ([(kind, payload, ts), ...], {position: {"session", "combat"}}). limit=-1 - усі.
+        """
+        # Окреме з'єднання бачить лише закомічене: фоновий запис може саме переносити рядки в архів
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT kind, payload, ts FROM (SELECT id, kind, payload, ts FROM history WHERE sid = ? "
+                "UNION ALL SELECT id, kind, payload, ts FROM journal WHERE sid = ?) ORDER BY id LIMIT ?", (sid, sid, limit))
+            events = [(kind, json.loads(payload) if payload is not None else None, ts) for kind, payload, ts in rows]
+            checkpoints = {position: json.loads(data) for position, data in conn.execute(
+                "SELECT position, data FROM checkpoints WHERE sid = ? AND position <= ?", (sid, len(events)))}
+        finally:
+            conn.close()
+        return events, checkpoints
+
+    def start(self, snapshot_provider):
+        """
+        Запускає фоновий запис. snapshot_provider(sid) має атомарно взяти поточний стан сесії
+        і передати його в snapshot() - його викликають, коли журнал сесії розрісся.
+        """
+        self._snapshot_provider = snapshot_provider
+        self._thread = threading.Thread(target=self._writer, name="session-store", daemon=True)
+        self._thread.start()
+
+    def append(self, sid, kind, payload=None):
+        """Ставить зміну в чергу на запис. payload має бути незмінним (серіалізується пізніше)."""
+        self._queue.put((sid, kind, payload))
+
+    def snapshot(self, sid, data):
+        """Ставить знімок сесії в чергу; він покриває всі зміни, поставлені до нього."""
+        self._queue.put((sid, None, data))
+
+    def checkpoint(self, sid, position, data):
+        """Ставить у чергу контрольну точку історії сесії: стан data після position подій."""
+        self._queue.put((sid, _CHECKPOINT, (position, data)))
+
+    def flush(self, timeout=5):
+        """Чекає, доки все поставлене в чергу потрапить на диск. False - не встигли за timeout."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread is None: return
+        self._queue.put(None)
+        self._thread.join(5)
+        self._thread = None
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._write(batch)
+            if stop: return
+
+    def _write(self, batch):
+        waiters, stop, compact = [], False, set()
+        with self._conn:
+            for item in batch:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                elif item[1] is None:
+                    sid, _, data = item
+                    jid = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM journal").fetchone()[0]
+                    self._conn.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                                       (sid, jid, json.dumps(data, ensure_ascii=False), time.time()))
+                    self._archive(sid, jid)
+                    self._since_snapshot[sid] = 0
+                    compact.discard(sid)
+                elif item[1] is _CHECKPOINT:
+                    sid, _, (position, data) = item
+                    self._conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                                       (sid, position, json.dumps(data, ensure_ascii=False)))
+                else:
+                    sid, kind, payload = item
+                    payload = None if payload is None else json.dumps(payload, ensure_ascii=False)
+                    self._conn.execute("INSERT INTO journal(sid, kind, payload, ts) VALUES (?, ?, ?, ?)",
+                                       (sid, kind, payload, time.time()))
+                    n = self._since_snapshot[sid] = self._since_snapshot.get(sid, 0) + 1
+                    if n % self.COMPACT_EVERY == 0: compact.add(sid)
+        for done in waiters: done.set()
+        # Знімок просимо вже після коміту: провайдер поставить його в чергу наступною пачкою
+        if not stop:
+            for sid in compact: self._snapshot_provider(sid)
+        return stop
+
+    def _archive(self, sid, jid):
+        """Переносить покриті знімком рядки журналу сесії в архів."""
+        self._conn.execute("INSERT OR IGNORE INTO history SELECT * FROM journal WHERE sid = ? AND id <= ?", (sid, jid))
+        self._conn.execute("DELETE FROM journal WHERE sid = ? AND id <= ?", (sid, jid))
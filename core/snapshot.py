@@ -0,0 +1,48 @@
+class FrozenDict(dict):
+    """
+    Словник тільки для читання.
+    Використовується для знімків стану, які одночасно читають кілька віджетів/потоків:
+    змінити його випадково неможливо, а серіалізується він як звичайний dict.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only, use thaw() to get a mutable copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    update = pop = popitem = setdefault = clear = _readonly
+
+    def __hash__(self):
+        return id(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # deepcopy знімка повертає звичайні змінні структури
+        return thaw(self)
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def copy(self):
+        return dict(self)
+
+
+def freeze(obj):
+    """Рекурсивно перетворює dict/list у FrozenDict/tuple."""
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """Зворотне до freeze(): повна змінна копія з dict/list."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
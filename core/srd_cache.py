@@ -0,0 +1,80 @@
+"""
+Кеш похідних довідників SRD (races, classes, бестіарій, заклинання), щоб не розбирати JSON на кожному старті.
+
+Знімок пишеться у файл через marshal (вбудований, без виконання коду при читанні) разом із ключем:
+версія формату, версія marshal, розмір і mtime файлу бази та хеш вмісту таблиць-джерел.
+Якщо розмір і mtime бази не змінились, знімок береться без читання бази взагалі.
+Інакше рахується хеш вмісту таблиць: збігся (базу лише торкнулись) - знімок валідний і отримує
+новий stat, ні - знімок застарів і довідники будуються заново.
+"""
+import hashlib
+import marshal
+import os
+import sqlite3
+from contextlib import closing
+
+
+def _stat(db_path):
+    st = os.stat(db_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def content_hash(db_path, tables):
+    """Хеш рядків таблиць-джерел (яких немає в базі - пропускаються)."""
+    h = hashlib.blake2b(digest_size=16)
+    with closing(sqlite3.connect(db_path)) as conn:
+        existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table in tables:
+            if table not in existing: continue
+            h.update(table.encode() + b"\0")
+            for index, data in conn.execute(f'SELECT index_name, data FROM "{table}" ORDER BY index_name'):
+                h.update(f"{index}\0{data}\0".encode())
+    return h.hexdigest()
+
+
+class SrdCache:
+    def __init__(self, path, db_path, tables, version):
+        """tables - таблиці бази, з яких будуються довідники; version - міняти, коли змінюється їх побудова."""
+        self.path, self.db_path = path, db_path
+        self.tables, self.version = tuple(tables), version
+        self._hash = None  # хеш бази, порахований у load(), щоб save() не рахував його вдруге
+
+    def _key(self):
+        return [self.version, marshal.version]
+
+    def load(self):
+        """Довідники зі знімка: {назва: значення} або None, якщо знімка немає чи він застарів."""
+        try:
+            # loads(read()) у рази швидше за load(f), який читає файл дрібними шматками
+            with open(self.path, "rb") as f:
+                snap = marshal.loads(f.read())
+            stat = _stat(self.db_path)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(snap, dict) or snap.get("key") != self._key(): return None
+        if snap.get("stat") == stat: return snap["data"]
+        try:
+            self._hash = content_hash(self.db_path, self.tables)
+        except sqlite3.Error:
+            return None
+        if snap.get("hash") != self._hash: return None
+        self._write(snap["data"], stat, self._hash)
+        return snap["data"]
+
+    def save(self, data):
+        """Зберігає довідники, побудовані з поточної бази."""
+        try:
+            stat = _stat(self.db_path)
+            digest = self._hash or content_hash(self.db_path, self.tables)
+        except (OSError, sqlite3.Error):
+            return
+        self._write(data, stat, digest)
+
+    def _write(self, data, stat, digest):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(marshal.dumps({"key": self._key(), "stat": stat, "hash": digest, "data": data}))
+            os.replace(tmp, self.path)
+        except (OSError, ValueError) as e:
+            print(f"Cannot save SRD cache: {e}")
@@ -0,0 +1,26 @@
+"""
+Версії похідних схем у dnd_data.sqlite3 (бестіарій, каталог спорядження, пошук): кожна частина мігрує незалежно від інших.
+Тут же - спільні для їхніх запитів помічники.
+"""
+
+
+def version(conn, name):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    row = conn.execute("SELECT version FROM schema_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def migrate(conn, name, target, script):
+    """Виконує script (перестворює схему name) одною транзакцією, якщо схема старіша за target. True - виконано."""
+    if version(conn, name) >= target: return False
+    conn.commit()
+    conn.executescript(f"BEGIN; {script}\nINSERT OR REPLACE INTO schema_versions VALUES ('{name}', {int(target)}); COMMIT;")
+    return True
+
+
+def where_in(column, value, where, params):
+    """Умова column = value або column IN (...) для списку значень (None - без умови)."""
+    if value is None: return
+    values = [value] if isinstance(value, str) else list(value)
+    where.append(f"{column} IN ({', '.join('?' * len(values))})")
+    params.extend(values)
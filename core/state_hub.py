@@ -0,0 +1,64 @@
+import weakref
+from PySide6.QtCore import QObject, QTimer, QEvent, Signal
+from core.snapshot import freeze
+
+
+class CombatStateHub(QObject):
+    """
+    Спільне джерело стану бою для всіх вкладок і вікон.
+    Стан читається з DataManager один раз на "тік" (пачка подій combat_changed
+    зливається в одне читання) і роздається всім підписникам одним незмінним знімком.
+    Поки жоден підписаний віджет не видно - читання відкладається до його показу.
+    """
+    state_changed = Signal(object)  # FrozenDict зі станом бою
+
+    TICK_MS = 50  # вікно, за яке кілька сповіщень зливаються в одне читання
+
+    def __init__(self, dm, parent=None):
+        super().__init__(parent)
+        self.dm = dm
+        self._snapshot = freeze(dm.get_combat_state())
+        self._subscribers = weakref.WeakSet()
+        self._dirty = False
+
+        self._tick = QTimer(self)
+        self._tick.setSingleShot(True)
+        self._tick.setInterval(self.TICK_MS)
+        self._tick.timeout.connect(self._fetch)
+        dm.combat_changed.connect(self._tick.start)
+
+    def subscribe(self, widget, slot):
+        """
+        Підписує віджет: slot(state) викликається з кожним новим знімком
+        (одразу - з поточним). Підписка зникає разом із віджетом.
+        """
+        self._subscribers.add(widget)
+        widget.installEventFilter(self)
+        self.state_changed.connect(slot)
+        slot(self._snapshot)
+
+    def snapshot(self):
+        """Останній отриманий знімок стану (без звернення до сервера)."""
+        return self._snapshot
+
+    def refresh(self):
+        """Перечитати стан негайно (наприклад, одразу після власної зміни)."""
+        self._tick.stop()
+        self._fetch(force=True)
+
+    def _has_visible_subscriber(self):
+        return any(w.isVisible() for w in self._subscribers)
+
+    def _fetch(self, force=False):
+        if not force and not self._has_visible_subscriber():
+            self._dirty = True
+            return
+        self._dirty = False
+        self._snapshot = freeze(self.dm.get_combat_state())
+        self.state_changed.emit(self._snapshot)
+
+    def eventFilter(self, obj, event):
+        # Віджет показали, а поки він був схований стан змінився - оновлюємо
+        if event.type() == QEvent.Show and self._dirty:
+            self._tick.start()
+        return False
@@ -0,0 +1,121 @@
+"""
+Формат обміну даними між клієнтом і хостом.
+
+JSON лишається форматом за замовчуванням (його зручно дивитися при налагодженні).
+Якщо на обох сторонах встановлено msgpack або cbor2, вони домовляються про компактний
+бінарний формат через заголовки Accept / Content-Type. Великі тіла стискаються:
+відповіді - zstd (якщо є zstandard) або gzip за Accept-Encoding клієнта, запити - gzip.
+Усі бібліотеки, крім стандартних, необов'язкові.
+"""
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+COMPRESS_MIN_BYTES = 1024  # менші тіла стискати немає сенсу
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# {content type: (encode, decode)}
+FORMATS = {JSON: (_json_dumps, json.loads)}
+if msgpack is not None:
+    FORMATS[MSGPACK] = (lambda obj: msgpack.packb(obj, use_bin_type=True), lambda b: msgpack.unpackb(b, raw=False))
+if cbor2 is not None:
+    FORMATS[CBOR] = (cbor2.dumps, cbor2.loads)
+
+# Бінарні формати в порядку переваги
+BINARY_FORMATS = [f for f in (MSGPACK, CBOR) if f in FORMATS]
+
+ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def _media_types(header):
+    return [part.split(";")[0].strip().lower() for part in (header or "").split(",")]
+
+
+def choose_format(accept):
+    """Формат відповіді за заголовком Accept: бінарний, лише якщо клієнт назвав його явно."""
+    types = _media_types(accept)
+    return next((f for f in BINARY_FORMATS if f in types), JSON)
+
+
+def choose_encoding(accept_encoding):
+    """Стиснення відповіді за Accept-Encoding (None - без стиснення)."""
+    codings = _media_types(accept_encoding)
+    return next((e for e in ENCODINGS if e in codings), None)
+
+
+def accept_header():
+    """Accept для клієнта: спершу бінарні формати, JSON - запасний."""
+    return ", ".join(BINARY_FORMATS + [JSON + ";q=0.5"])
+
+
+def dumps(obj, fmt=JSON):
+    return FORMATS[fmt][0](obj)
+
+
+def loads(data, content_type=None):
+    """Декодує тіло за Content-Type (невідомий або порожній тип - JSON)."""
+    if not data: return None
+    fmt = _media_types(content_type)[0]
+    return FORMATS.get(fmt, FORMATS[JSON])[1](data)
+
+
+def compress(data, encoding):
+    if encoding == "zstd": return zstandard.ZstdCompressor(level=3).compress(data)
+    if encoding == "gzip": return gzip.compress(data, compresslevel=5)
+    return data
+
+
+def decompress(data, encoding):
+    encoding = (encoding or "").strip().lower()
+    if encoding == "zstd": return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if encoding == "gzip": return gzip.decompress(data)
+    return data
+
+
+def encode_response(obj, accept, accept_encoding):
+    """Тіло відповіді та заголовки (Content-Type, можливо Content-Encoding) під можливості клієнта."""
+    fmt = choose_format(accept)
+    data = dumps(obj, fmt)
+    headers = {"Content-Type": fmt, "Vary": "Accept, Accept-Encoding"}
+    encoding = choose_encoding(accept_encoding) if len(data) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        data = compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+    return data, headers
+
+
+def encode_request(obj, fmt=JSON):
+    """
+    Тіло запиту та заголовки. Бінарний формат і gzip клієнт використовує лише після того,
+    як хост відповів бінарним форматом (тобто точно їх розуміє).
+    """
+    data = dumps(obj, fmt)
+    headers = {"Content-Type": fmt}
+    if fmt != JSON and len(data) >= COMPRESS_MIN_BYTES:
+        data = compress(data, "gzip")
+        headers["Content-Encoding"] = "gzip"
+    return data, headers
+
+
+def decode_request(data, content_type, content_encoding):
+    return loads(decompress(data, content_encoding), content_type)
@@ -1,7 +1,7 @@
 from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QSplitter, QWidget, QPushButton, QScrollArea, QGroupBox
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QSplitter, QWidget, QPushButton, QScrollArea, QGroupBox, QSlider
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QDateTime
 from ui.widgets.battle_map_widget import BattleMapWidget
 from ui.widgets.turn_tracker_widget import TurnTrackerWidget
 from ui.dialogs.roll_dialog import RollDialog
@@ -67,30 +67,52 @@ class CombatWindow(QDialog):
         self.map_widget.token_clicked.connect(self._on_token_click)
 
         map_l.addWidget(self.map_widget)
+
+        # Шкала історії: перегляд бою на будь-який момент сесії (підсумки, розбір розсинхронів)
+        self._replay_index = None  # None - показуємо бій наживо
+        self._history_seek = QTimer(self)
+        self._history_seek.setSingleShot(True)
+        self._history_seek.setInterval(100)
+        self._history_seek.timeout.connect(self._seek_history)
+
+        scrub_l = QHBoxLayout()
+        self.history_slider = QSlider(Qt.Horizontal)
+        self.history_slider.setRange(0, 0)
+        self.history_slider.sliderPressed.connect(self._update_history_range)
+        self.history_slider.valueChanged.connect(self._history_seek.start)
+        self.lbl_history = QLabel("Наживо")
+        self.btn_live = QPushButton("Наживо")
+        self.btn_live.setEnabled(False)
+        self.btn_live.clicked.connect(self._go_live)
+        scrub_l.addWidget(self.history_slider)
+        scrub_l.addWidget(self.lbl_history)
+        scrub_l.addWidget(self.btn_live)
+        map_l.addLayout(scrub_l)
         splitter.addWidget(map_container)
 
         splitter.setSizes([350, 950])
         layout.addWidget(splitter)
 
-        # Синхронізація
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self._sync)
-        self.timer.start(500)
+        # Синхронізація: спільний знімок стану бою для всіх вікон
+        self.dm.combat_hub.subscribe(self, self._sync)
+        self.dm.move_rejected.connect(self._on_move_rejected)
 
         # Якщо гравець - додати себе, якщо немає
         if not self.is_dm and self.char_uid:
             QTimer.singleShot(500, self._ensure_player)
 
     def _ensure_player(self):
-        state = self.dm.get_combat_state()
+        state = self.dm.combat_hub.snapshot()
         tokens = state.get("tokens", {})
         if self.char_uid not in tokens:
             # Якщо гравця немає на мапі, додаємо його
-            new_token = {self.char_uid: {"name": "Me", "x": 1, "y": 1, "color": "#4CAF50", "type": "player"}}
-            self.dm.update_combat_state({"tokens": new_token})
+            self.dm.spawn_token(self.char_uid, {"name": "Me", "x": 1, "y": 1, "color": "#4CAF50", "type": "player"})
+
+    def _sync(self, state):
+        # Під час перегляду історії живі оновлення не показуємо
+        if self._replay_index is None: self._render(state)
 
-    def _sync(self):
-        state = self.dm.get_combat_state()
+    def _render(self, state):
         self.map_widget.update_state(state.get("tokens", {}))
         self.tracker.update_state(state)
 
@@ -100,18 +122,55 @@ class CombatWindow(QDialog):
             self.lbl_status.setText(f"Зараз ходить: {order[idx]['name']}")
 
     def _handle_move(self, uid, x, y):
+        if self._replay_index is not None:
+            # Історію не змінюємо - повертаємо токен на місце
+            self._seek_history()
+            return
         # Передаємо is_dm в DataManager, щоб він знав чи дозволяти рух монстрів
         self.dm.move_token(uid, x, y, is_dm=self.is_dm)
 
+    # --- ІСТОРІЯ ---
+    def _update_history_range(self):
+        point = self.dm.get_combat_history_point()
+        if not point: return
+        self.history_slider.blockSignals(True)
+        self.history_slider.setMaximum(point["length"])
+        if self._replay_index is None: self.history_slider.setValue(point["length"])
+        self.history_slider.blockSignals(False)
+
+    def _seek_history(self):
+        index = self.history_slider.value()
+        if index >= self.history_slider.maximum():
+            self._go_live()
+            return
+        point = self.dm.get_combat_history_point(index)
+        if not point: return
+        self._replay_index = index
+        self._render(point["combat"] or {})
+        ts = QDateTime.fromSecsSinceEpoch(int(point["ts"])).toString("hh:mm:ss") if point["ts"] else "--:--:--"
+        self.lbl_history.setText(f"Подія {index}/{point['length']} ({ts})")
+        self.btn_live.setEnabled(True)
+
+    def _go_live(self):
+        self._replay_index = None
+        self._update_history_range()
+        self.lbl_history.setText("Наживо")
+        self.btn_live.setEnabled(False)
+        self._render(self.dm.combat_hub.snapshot())
+
+    def _on_move_rejected(self, uid, reason):
+        # Токен уже повернуто (стан без передбаченого ходу прийде через combat_hub)
+        self.lbl_status.setText(f"Хід скасовано: {reason}")
+
     def _show_details(self, uid, name, data):
-        dlg = CombatantDetailsDialog(name, data, self)
+        dlg = CombatantDetailsDialog(name, self.dm.resolve_token(data), self)
         dlg.exec()
 
     def _on_token_click(self, uid):
         # Оновлення панелі дій (залежить від ролі)
         self._clear_actions()
 
-        st = self.dm.get_combat_state()
+        st = self.dm.combat_hub.snapshot()
         # Use .get with empty dict to avoid crash if tokens is missing
         tokens = st.get("tokens", {})
         token = tokens.get(uid)
@@ -129,7 +188,7 @@ class CombatWindow(QDialog):
         # ДМ бачить атаки ворогів
         if self.is_dm and is_enemy:
             self.lbl_status.setText(f"Керування: {token_name}")
-            for act in token.get('actions', []):
+            for act in self.dm.resolve_token(token).get('actions', []):
                 self._add_action_btn(f"⚔️ {act.get('name', 'Attack')}",
                                      lambda a=act, n=token_name: self._dm_attack(n, a))
 
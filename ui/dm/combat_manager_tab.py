@@ -2,7 +2,7 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListWidget,
     QPushButton, QComboBox, QGroupBox, QSplitter, QListWidgetItem, QScrollArea
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt
 from PySide6.QtGui import QColor
 from core.data_manager import DataManager
 from ui.widgets.battle_map_widget import BattleMapWidget
@@ -66,7 +66,7 @@ class CombatManagerTab(QWidget):
         map_cont = QWidget()
         ml = QVBoxLayout(map_cont)
         self.map = BattleMapWidget(is_dm=True)
-        self.map.token_moved.connect(self.dm.move_token)
+        self.map.token_moved.connect(lambda u, x, y: self.dm.move_token(u, x, y, is_dm=True))
         self.map.token_clicked.connect(self._on_select)
         ml.addWidget(self.map)
         splitter.addWidget(map_cont)
@@ -74,27 +74,31 @@ class CombatManagerTab(QWidget):
         splitter.setSizes([300, 800])
         layout.addWidget(splitter)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self._refresh)
-        self.timer.start(1000)
+        self.dm.combat_hub.subscribe(self, self._refresh)
 
     def _spawn(self):
         self.dm.add_creature_to_combat(self.combo.currentText())
-        self._refresh()
+        self.dm.combat_hub.refresh()
 
     def _roll_init(self):
-        self.dm.roll_initiative()
-        self.dm.start_combat()
-        self._refresh()
+        # Повторний кидок посеред бою лише перебудовує чергу - бій уже почато
+        active = self.dm.combat_hub.snapshot().get("active")
+        with self.dm.batch():
+            self.dm.roll_initiative()
+            if not active: self.dm.start_combat()
+        self.dm.combat_hub.refresh()
 
     def _next_turn(self):
-        st = self.dm.get_combat_state()
-        if not st.get("turn_order"): return
-        idx = (st.get("current_turn_index", 0) + 1) % len(st["turn_order"])
-        self.dm.update_combat_state({"current_turn_index": idx})
-        actor = st["turn_order"][idx]
-        self.dm.push_session_update(self.dm.get_current_session(), f"👉 Хід: {actor['name']}", "COMBAT")
-        self._refresh()
+        # Черговість і раунд рахує хост (команда NEXT_TURN). Хід оголошуємо за його відповіддю:
+        # у віддаленого ДМа next_turn() повертає True, щойно команду поставлено в чергу
+        sid = self.dm.get_current_session()
+
+        def announce(status, resp):
+            turn = resp.get("turn") if status == 200 else None
+            if turn: self.dm.push_session_update(sid, f"👉 Хід: {turn['name']}", "COMBAT")
+
+        self.dm.next_turn(announce)
+        self.dm.combat_hub.refresh()
 
     def _on_select(self, uid):
         self.selected_uid = uid
@@ -104,14 +108,14 @@ class CombatManagerTab(QWidget):
         for i in reversed(range(self.act_vbox.count())):
             self.act_vbox.itemAt(i).widget().deleteLater()
 
-        st = self.dm.get_combat_state()
+        st = self.dm.combat_hub.snapshot()
         tok = st.get("tokens", {}).get(self.selected_uid)
         if not tok: return
 
         self.lbl_sel.setText(tok['name'])
 
         if tok.get('type') == 'enemy':
-            actions = tok.get('actions', [])
+            actions = self.dm.resolve_token(tok).get('actions', [])
             for a in actions:
                 btn = QPushButton(f"⚔️ {a['name']}")
                 btn.setToolTip(a['desc'])
@@ -126,8 +130,7 @@ class CombatManagerTab(QWidget):
         self.dm.push_session_update(self.dm.get_current_session(),
                                     f"👹 {name} uses {action['name']}! Result: {dlg.final_total}", "COMBAT")
 
-    def _refresh(self):
-        st = self.dm.get_combat_state()
+    def _refresh(self, st):
         self.map.update_state(st.get("tokens", {}))
 
         self.init_list.clear()
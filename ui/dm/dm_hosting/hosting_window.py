@@ -3,7 +3,7 @@ from PySide6.QtWidgets import (
     QPushButton, QListWidget, QListWidgetItem, QLineEdit, QTextEdit,
     QGridLayout, QMessageBox, QProgressBar, QFrame, QScrollArea  # <--- QScrollArea тепер тут
 )
-from PySide6.QtCore import Qt, Signal, QDateTime, QTimer
+from PySide6.QtCore import Qt, Signal, QDateTime
 import socket
 from core.data_manager import DataManager
 
@@ -200,11 +200,8 @@ class HostingTab(QWidget):
         ll.addWidget(self.log_view)
         main_layout.addWidget(log_group)
 
-        # Timer
-        self.timer = QTimer(self)
-        self.timer.setInterval(2000)
-        self.timer.timeout.connect(self._update_dashboard)
-        self.timer.start()
+        # Оновлення за сигналом сервера про зміну гравців
+        self.dm.players_changed.connect(self._update_dashboard)
 
     def _start_session(self):
         sid = self.dm.start_new_session()
@@ -216,6 +213,7 @@ class HostingTab(QWidget):
             self.stop_btn.setEnabled(True)
             self.session_state_changed.emit(True)
             self._log("Сесію розпочато.")
+            self._update_dashboard()
 
     def _stop_session(self):
         self.is_session_active = False
@@ -1,3 +1,5 @@
+import os
+
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QTabWidget, QLabel, QMessageBox, QPushButton, QHBoxLayout
 )
@@ -27,7 +29,13 @@ class DM_MainWindow(QMainWindow):
         self.combat_window = None  # Зберігаємо посилання на вікно
 
         try:
-            self.server_ip = self.dm.start_server()
+            remote_host = os.environ.get("DND_HOST")  # окремий headless-хост (python -m core.server)
+            if remote_host:
+                self.dm.connect_to_host(remote_host)
+                self.server_ip = remote_host
+            else:
+                self.server_ip = self.dm.start_server()
+                self.dm.enable_persistence()
         except:
             pass
 
@@ -3,7 +3,7 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton,
     QGroupBox, QSplitter, QMessageBox, QRadioButton, QButtonGroup, QApplication, QFrame
 )
-from PySide6.QtCore import Qt, QTimer, QMimeData, QPoint
+from PySide6.QtCore import Qt, QMimeData, QPoint
 from PySide6.QtGui import QDrag, QPixmap, QPainter, QColor, QBrush, QPen
 from core.data_manager import DataManager
 from ui.widgets.battle_map_widget import BattleMapWidget
@@ -126,28 +126,27 @@ class DroppableBattleMapWidget(BattleMapWidget):
         row = max(0, min(row, self.rows - 1))
 
         uid = None
+        # Клітинка йде прямо в SPAWN: окремий хід після нього у віддаленого ДМа відкинувся б -
+        # у кешованому стані бою нового токена ще немає
         if dtype == "monster":
-            # Викликаємо метод додавання істоти з вказанням позиції
-            uid = self.dm.add_creature_to_combat(key)
+            uid = self.dm.add_creature_to_combat(key, x=col, y=row)
         elif dtype == "object":
-            try:
-                uid = self.dm.add_object_to_combat(key)
-            except AttributeError:
-                print("DataManager missing add_object_to_combat")
+            uid = self.dm.add_object_to_combat(key, x=col, y=row)
 
         if uid:
-            # Одразу переміщуємо створений токен на правильну клітинку
-            self.dm.move_token(uid, col, row, is_dm=True)
-
             # Примусово оновлюємо відображення, щоб уникнути затримки
-            st = self.dm.get_combat_state()
-            self.update_state(st.get("tokens", {}))
+            self.dm.combat_hub.refresh()
 
             print(f"Dropped {dtype} '{key}' at {col}, {row}")  # Debug log
 
         event.acceptProposedAction()
 
 
+def _cr_label(cr):
+    """0.125 -> "1/8", 2.0 -> "2"."""
+    return {0.125: "1/8", 0.25: "1/4", 0.5: "1/2"}.get(cr, f"{cr:g}")
+
+
 class EncounterBuilderTab(QWidget):
     """
     Вкладка підготовки до бою (Drag & Drop версія).
@@ -170,17 +169,36 @@ class EncounterBuilderTab(QWidget):
         mon_grp = QGroupBox("Монстри")
         mon_l = QVBoxLayout(mon_grp)
 
+        # Фільтри (запит до нормалізованого бестіарію, див. DataManager.query_bestiary)
+        facets = self.dm.get_bestiary_facets()
+        self.combo_type = QComboBox()
+        self.combo_type.addItem("Усі типи", None)
+        for t in facets["types"]: self.combo_type.addItem(t, t)
+        self.combo_size = QComboBox()
+        self.combo_size.addItem("Усі розміри", None)
+        for sz in facets["sizes"]: self.combo_size.addItem(sz, sz)
+        self.combo_cr_from, self.combo_cr_to = QComboBox(), QComboBox()
+        for combo in (self.combo_cr_from, self.combo_cr_to):
+            for cr in facets["crs"]: combo.addItem(_cr_label(cr), cr)
+        self.combo_cr_to.setCurrentIndex(self.combo_cr_to.count() - 1)
+
+        flt_h = QHBoxLayout()
+        flt_h.addWidget(self.combo_type, 1)
+        flt_h.addWidget(self.combo_size, 1)
+        cr_h = QHBoxLayout()
+        cr_h.addWidget(QLabel("CR від"))
+        cr_h.addWidget(self.combo_cr_from, 1)
+        cr_h.addWidget(QLabel("до"))
+        cr_h.addWidget(self.combo_cr_to, 1)
+        mon_l.addLayout(flt_h)
+        mon_l.addLayout(cr_h)
+        for combo in (self.combo_type, self.combo_size, self.combo_cr_from, self.combo_cr_to):
+            combo.currentIndexChanged.connect(self._filter_monsters)
+
         # Секція вибору
         mon_h = QHBoxLayout()
         self.combo_monsters = QComboBox()
-        # Заповнюємо список монстрів (безпечно)
-        bestiary = self.dm.get_bestiary()
-        if bestiary:
-            self.combo_monsters.addItems(sorted(bestiary.keys()))
-        else:
-            self.combo_monsters.addItem("No Monsters Loaded")
-
-        self.combo_monsters.currentTextChanged.connect(self._update_monster_preview)
+        self.combo_monsters.currentIndexChanged.connect(self._update_monster_preview)
 
         # Токен для перетягування
         self.token_monster = DraggableTokenLabel()
@@ -189,6 +207,9 @@ class EncounterBuilderTab(QWidget):
         mon_h.addWidget(self.token_monster)
 
         mon_l.addLayout(mon_h)
+        # Дії обраного монстра (з таблиці monster_actions)
+        self.lbl_monster_actions = QLabel(wordWrap=True)
+        mon_l.addWidget(self.lbl_monster_actions)
         mon_l.addWidget(QLabel("<small><i>Перетягніть кружечок на мапу -></i></small>", alignment=Qt.AlignRight))
         tools_layout.addWidget(mon_grp)
 
@@ -258,27 +279,42 @@ class EncounterBuilderTab(QWidget):
         splitter.setSizes([300, 900])
         layout.addWidget(splitter)
 
-        # Таймер оновлення
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self._refresh_map)
-        self.timer.start(500)
 
-        # Ініціалізація прев'ю
-        self._update_monster_preview()
+        # Ініціалізація списку монстрів і прев'ю
+        self._filter_monsters()
         self._update_object_preview()
         self._set_drag_mode(False)  # Default state
 
+        # Оновлення мапи зі спільного знімка стану бою
+        self.dm.combat_hub.subscribe(self, self._refresh_map)
+
     # --- МЕТОДИ КЛАСУ ---
 
+    def _filter_monsters(self):
+        cr_range = (self.combo_cr_from.currentData(), self.combo_cr_to.currentData())
+        found = self.dm.query_bestiary(cr_range=cr_range, type=self.combo_type.currentData(),
+                                       size=self.combo_size.currentData())
+        self.combo_monsters.blockSignals(True)
+        self.combo_monsters.clear()
+        for m in found: self.combo_monsters.addItem(f"{m['name']} (CR {_cr_label(m['cr'])})", m['index'])
+        if not found: self.combo_monsters.addItem("Немає монстрів за фільтром", None)
+        self.combo_monsters.blockSignals(False)
+        self._update_monster_preview()
+
     def _update_monster_preview(self):
-        key = self.combo_monsters.currentText()
+        key = self.combo_monsters.currentData() or ""
         bestiary = self.dm.get_bestiary()
         if bestiary:
             data = bestiary.get(key)
             if data:
                 self.token_monster.configure("monster", key, data['name'], "#D32F2F")
+                acts = self.dm.monster_actions(key)
+                self.lbl_monster_actions.setText("<small>⚔️ " + ", ".join(a['name'] for a in acts) + "</small>")
+                self.lbl_monster_actions.setToolTip("\n".join(f"{a['name']}: {a['desc']}" for a in acts))
             else:
                 self.token_monster.configure("monster", key, "?", "#999")
+                self.lbl_monster_actions.clear()
+                self.lbl_monster_actions.setToolTip("")
 
     def _update_object_preview(self):
         key = self.combo_objects.currentText()
@@ -307,12 +343,12 @@ class EncounterBuilderTab(QWidget):
 
     def _clear_map(self):
         if QMessageBox.question(self, "Очистити", "Видалити ВСІ об'єкти з мапи?") == QMessageBox.Yes:
-            self.dm.update_combat_state({"tokens": {}})
-            self._refresh_map()
+            with self.dm.batch():
+                for uid in self.dm.combat_hub.snapshot().get("tokens", {}): self.dm.remove_token(uid)
+            self.dm.combat_hub.refresh()
 
     def _on_token_click(self, uid):
         pass
 
-    def _refresh_map(self):
-        st = self.dm.get_combat_state()
+    def _refresh_map(self, st):
         self.map_widget.update_state(st.get("tokens", {}))
\ No newline at end of file
@@ -1,22 +1,82 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QListWidget, QListWidgetItem, QComboBox, QPushButton,
+    QListView, QComboBox, QPushButton, QDoubleSpinBox,
     QGroupBox, QMessageBox, QSplitter
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QColor, QFont
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QColor
 from core.data_manager import DataManager
 
+# Кольори типів предметів для темної теми
+TYPE_COLORS = {"Weapon": QColor("#FF8A80"), "Armor": QColor("#82B1FF"), "Consumable": QColor("#B9F6CA")}
+DEFAULT_COLOR = QColor("#E0E0E0")
+
+
+class EquipmentCatalogModel(QAbstractListModel):
+    """
+    Каталог спорядження (DataManager.query_equipment) сторінками по PAGE_SIZE: список бере з бази лише
+    видимі рядки, а наступну сторінку - через fetchMore, коли його прокручують до кінця.
+    """
+    PAGE_SIZE = 100
+
+    def __init__(self, dm: DataManager, parent=None):
+        super().__init__(parent)
+        self.dm = dm
+        self._filters = {}
+        self._rows = []
+        self._more = False
+
+    def set_filters(self, **filters):
+        """Фільтри query_equipment (type, category, cost_range, weight_range, text); список починається спочатку."""
+        self.beginResetModel()
+        self._filters = filters
+        self._rows = self.dm.query_equipment(limit=self.PAGE_SIZE, **filters)
+        self._more = len(self._rows) == self.PAGE_SIZE
+        self.endResetModel()
+
+    def row(self, index):
+        """Рядок каталогу для індексу моделі або None."""
+        return self._rows[index.row()] if index.isValid() else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._more
+
+    def fetchMore(self, parent=QModelIndex()):
+        page = self.dm.query_equipment(limit=self.PAGE_SIZE, offset=len(self._rows), **self._filters)
+        self._more = len(page) == self.PAGE_SIZE
+        if not page: return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        self._rows += page
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = self.row(index)
+        if row is None: return None
+        if role == Qt.DisplayRole: return f"{row['name']} [{row['type']}]"
+        if role == Qt.ForegroundRole: return TYPE_COLORS.get(row["type"], DEFAULT_COLOR)
+        if role == Qt.UserRole: return row["index"]
+        return None
+
+
+def _format_cost(cp):
+    """Ціна в мідяках -> найбільша монета, якою вона ділиться націло: 1500 -> "15 gp"."""
+    for unit, value in (("gp", 100), ("sp", 10)):
+        if cp and cp % value == 0: return f"{cp // value} {unit}"
+    return f"{cp} cp"
+
 
 class InventoryManagerTab(QWidget):
     """
     Вкладка для ДМа: Управління предметами та видача їх гравцям.
     """
+    ALL = "Всі"
 
     def __init__(self, dm: DataManager, parent=None):
         super().__init__(parent)
         self.dm = dm
-        self.master_items = self.dm.get_master_item_dataset()
 
         # --- TEMNA TEMA ---
         self.setStyleSheet("""
@@ -45,17 +105,25 @@ class InventoryManagerTab(QWidget):
                 padding: 6px;
             }
 
-            QListWidget {
+            QDoubleSpinBox {
+                background-color: #3C3C3C;
+                color: white;
+                border: 1px solid #555;
+                border-radius: 4px;
+                padding: 6px;
+            }
+
+            QListView {
                 background-color: #252526;
                 color: #E0E0E0;
                 border: 1px solid #3E3E42;
                 border-radius: 4px;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #37373D;
                 color: #FFF;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #2A2D2E;
             }
 
@@ -93,24 +161,43 @@ class InventoryManagerTab(QWidget):
         filter_layout = QHBoxLayout(filter_group)
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("🔍 Назва предмета...")
+        self.search_input.setPlaceholderText("🔍 Назва чи опис предмета...")
         self.search_input.textChanged.connect(self._refresh_item_list)
 
+        facets = self.dm.get_equipment_facets()
         self.type_filter = QComboBox()
-        self.type_filter.addItems(["Всі типи", "Weapon", "Armor", "Consumable", "Gear"])
-        self.type_filter.currentTextChanged.connect(self._refresh_item_list)
+        self.type_filter.addItem("Всі типи", None)
+        for t in facets["types"]: self.type_filter.addItem(t, t)
+        self.type_filter.currentIndexChanged.connect(self._refresh_item_list)
+
+        self.category_filter = QComboBox()
+        self.category_filter.addItem("Всі категорії", None)
+        for c in facets["categories"]: self.category_filter.addItem(c, c)
+        self.category_filter.currentIndexChanged.connect(self._refresh_item_list)
 
-        filter_layout.addWidget(self.search_input)
+        # 0 - без обмеження
+        self.max_cost = self._limit_spin(" gp", 100000)
+        self.max_weight = self._limit_spin(" lb", 1000)
+
+        filter_layout.addWidget(self.search_input, 2)
         filter_layout.addWidget(self.type_filter)
+        filter_layout.addWidget(self.category_filter)
+        filter_layout.addWidget(QLabel("Ціна до:"))
+        filter_layout.addWidget(self.max_cost)
+        filter_layout.addWidget(QLabel("Вага до:"))
+        filter_layout.addWidget(self.max_weight)
         main_layout.addWidget(filter_group)
 
         # Спліттер
         splitter = QSplitter(Qt.Horizontal)
 
-        # Список
-        self.item_list_widget = QListWidget()
-        self.item_list_widget.itemClicked.connect(self._on_item_selected)
-        splitter.addWidget(self.item_list_widget)
+        # Список: модель підвантажує каталог сторінками, віджети рядків не створюються
+        self.catalog_model = EquipmentCatalogModel(self.dm, self)
+        self.item_list_view = QListView()
+        self.item_list_view.setModel(self.catalog_model)
+        self.item_list_view.setUniformItemSizes(True)
+        self.item_list_view.clicked.connect(self._on_item_selected)
+        splitter.addWidget(self.item_list_view)
 
         # Деталі
         details_widget = QWidget()
@@ -142,51 +229,41 @@ class InventoryManagerTab(QWidget):
         splitter.setSizes([400, 300])
         main_layout.addWidget(splitter)
 
-        self.timer = QTimer(self)
-        self.timer.setInterval(3000)
-        self.timer.timeout.connect(self._update_players_combo)
-        self.timer.start()
+        self.dm.players_changed.connect(self._update_players_combo)
 
         self._refresh_item_list()
+        self._update_players_combo()
 
-    def _refresh_item_list(self):
-        self.item_list_widget.clear()
-        search_text = self.search_input.text().lower()
-        filter_type = self.type_filter.currentText()
-
-        for key, data in self.master_items.items():
-            name = data.get("name", "Unknown")
-            itype = data.get("type", "Misc")
+    def _limit_spin(self, suffix, maximum):
+        spin = QDoubleSpinBox()
+        spin.setRange(0, maximum)
+        spin.setSuffix(suffix)
+        spin.setSpecialValueText(self.ALL)
+        spin.valueChanged.connect(self._refresh_item_list)
+        return spin
 
-            if search_text and search_text not in name.lower(): continue
-            if filter_type != "Всі типи" and itype != filter_type: continue
-
-            item = QListWidgetItem(f"{name} [{itype}]")
-            item.setData(Qt.UserRole, key)
-
-            # Кольори для темної теми
-            if itype == "Weapon":
-                item.setForeground(QColor("#FF8A80"))  # Red-ish
-            elif itype == "Armor":
-                item.setForeground(QColor("#82B1FF"))  # Blue-ish
-            elif itype == "Consumable":
-                item.setForeground(QColor("#B9F6CA"))  # Green-ish
-            else:
-                item.setForeground(QColor("#E0E0E0"))
-
-            self.item_list_widget.addItem(item)
+    def _refresh_item_list(self):
+        # Пошук - повнотекстовий (назва та опис, від найрелевантнішого), решта фільтрів - по індексах каталогу
+        self.catalog_model.set_filters(
+            type=self.type_filter.currentData(), category=self.category_filter.currentData(),
+            cost_range=(None, self.max_cost.value() or None), weight_range=(None, self.max_weight.value() or None),
+            text=self.search_input.text().strip())
+        self.item_details_label.setText("<i>Оберіть предмет зі списку</i>")
+        self.grant_btn.setEnabled(False)
 
-    def _on_item_selected(self, item):
-        key = item.data(Qt.UserRole)
-        data = self.master_items.get(key)
+    def _on_item_selected(self, index):
+        data = self.catalog_model.row(index)
+        if data is None: return
 
         # HTML для темної теми
-        info = f"<h3 style='color:#4FC3F7'>{data.get('name')}</h3>"
-        info += f"<b>Type:</b> <span style='color:#B0BEC5'>{data.get('type')}</span><br>"
-        if "damage" in data: info += f"<b>Damage:</b> <span style='color:#FF8A80'>{data.get('damage')}</span><br>"
-        if "ac" in data: info += f"<b>AC:</b> <span style='color:#82B1FF'>{data.get('ac')}</span><br>"
-        if "prop" in data: info += f"<b>Props:</b> {data.get('prop')}<br>"
-        if "effect" in data: info += f"<b>Effect:</b> <span style='color:#B9F6CA'>{data.get('effect')}</span><br>"
+        info = f"<h3 style='color:#4FC3F7'>{data['name']}</h3>"
+        info += f"<b>Type:</b> <span style='color:#B0BEC5'>{data['type']}</span><br>"
+        if data["category"]: info += f"<b>Category:</b> {data['category']}<br>"
+        if data["damage"]: info += f"<b>Damage:</b> <span style='color:#FF8A80'>{data['damage']}</span><br>"
+        if data["ac"] is not None: info += f"<b>AC:</b> <span style='color:#82B1FF'>{data['ac']}</span><br>"
+        if data["properties"]: info += f"<b>Props:</b> {data['properties']}<br>"
+        if data["cost_cp"] is not None: info += f"<b>Cost:</b> {_format_cost(data['cost_cp'])}<br>"
+        if data["weight"] is not None: info += f"<b>Weight:</b> {data['weight']:g} lb<br>"
 
         self.item_details_label.setText(info)
         self.grant_btn.setEnabled(True)
@@ -221,11 +298,9 @@ class InventoryManagerTab(QWidget):
             QMessageBox.warning(self, "Помилка", "Оберіть гравця!")
             return
 
-        selected_list_item = self.item_list_widget.currentItem()
-        if not selected_list_item: return
-
-        item_key = selected_list_item.data(Qt.UserRole)
-        item_data = self.master_items.get(item_key)
+        item_key = self.item_list_view.currentIndex().data(Qt.UserRole)
+        if not item_key: return
+        item_data = self.dm.get_equipment_item(item_key)
 
         if self.dm.grant_item_to_player(target_uid, item_data):
             QMessageBox.information(self, "Успіх", f"Предмет '{item_data['name']}' відправлено!")
@@ -161,6 +161,10 @@ class CharacterCreationCardTab(QWidget):
         layout = QVBoxLayout(self.spells_group)
 
         layout.addWidget(QLabel("Оберіть початкові закляття:"))
+        self.spell_search = QLineEdit()
+        self.spell_search.setPlaceholderText("🔍 Пошук за назвою чи описом...")
+        self.spell_search.textChanged.connect(self._filter_spells)
+        layout.addWidget(self.spell_search)
         self.spells_list_widget = QListWidget()
         layout.addWidget(self.spells_list_widget)
 
@@ -246,6 +250,15 @@ class CharacterCreationCardTab(QWidget):
                 item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
                 item.setCheckState(Qt.Unchecked)
                 self.spells_list_widget.addItem(item)
+            self._filter_spells()
+
+    def _filter_spells(self):
+        """Ховає закляття, що не знайшлися повнотекстовим пошуком; обрані лишаються обраними."""
+        text = self.spell_search.text().strip()
+        found = {h["name"] for h in self.dm.search(text, kinds="spells", limit=1000)} if text else None
+        for i in range(self.spells_list_widget.count()):
+            item = self.spells_list_widget.item(i)
+            item.setHidden(found is not None and item.text() not in found)
 
     def _check_skill_limit(self):
         cnt = sum(1 for cb in self.skill_checkboxes.values() if cb.isChecked())
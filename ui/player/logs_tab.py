@@ -1,5 +1,5 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTextEdit, QGroupBox, QHBoxLayout
-from PySide6.QtCore import Qt, QTimer, QDateTime
+from PySide6.QtCore import Qt, QDateTime
 from PySide6.QtGui import QColor
 from core.data_manager import DataManager
 
@@ -12,7 +12,8 @@ class LogsTab(QWidget):
     def __init__(self, dm: DataManager, parent=None):
         super().__init__(parent)
         self.dm = dm
-        self.seen_log_ids = set()
+        self.last_log_seq = 0  # seq останнього отриманого запису
+        self.log_session_id = None
         self.first_load = True
         self.my_user_id = self.dm.get_user_id()
         self.session_dm_id = None
@@ -43,10 +44,18 @@ class LogsTab(QWidget):
 
         layout.addWidget(log_group)
 
-        self.timer = QTimer(self)
-        self.timer.setInterval(2000)
-        self.timer.timeout.connect(self._fetch_updates)
-        self.timer.start()
+        # Оновлюємось лише коли сервер повідомив про нові логи
+        self.dm.logs_changed.connect(self._fetch_updates)
+        self.dm.connection_changed.connect(self._on_connection_changed)
+        self._fetch_updates()
+
+    def _on_connection_changed(self, online):
+        if online:
+            self.status_label.setText("🟢 Онлайн")
+            self.status_label.setStyleSheet("color: green; font-weight: bold;")
+        else:
+            self.status_label.setText("🔴 Втрачено зв'язок")
+            self.status_label.setStyleSheet("color: red; font-weight: bold;")
 
     def _fetch_updates(self):
         session_id = self.dm.get_current_session()
@@ -57,8 +66,13 @@ class LogsTab(QWidget):
         if not self.session_dm_id:
             self.session_dm_id = self.dm.get_dm_id(session_id)
 
-        # ВИПРАВЛЕНО: Тепер ми отримуємо список, а не передаємо callback
-        logs = self.dm.get_session_updates(session_id)
+        if session_id != self.log_session_id:
+            self.log_session_id = session_id
+            self.last_log_seq = 0
+            self.first_load = True
+
+        # Просимо тільки записи після останнього отриманого
+        logs = self.dm.get_session_updates(session_id, after=self.last_log_seq)
 
         if logs is None:
             self.status_label.setText("🔴 Втрачено зв'язок")
@@ -75,17 +89,12 @@ class LogsTab(QWidget):
                 self.log_display.setText("<i>Журнал поки що порожній.</i>")
 
         for log_data in logs:
+            self.last_log_seq = max(self.last_log_seq, log_data.get('seq', 0))
             self._handle_single_log(log_data)
 
     def _handle_single_log(self, update_data: dict):
         timestamp = update_data.get('timestamp', '')
         content = update_data.get('content', '')
-        log_id = f"{timestamp}_{content}"
-
-        if log_id in self.seen_log_ids:
-            return
-
-        self.seen_log_ids.add(log_id)
 
         if "Журнал поки що порожній" in self.log_display.toPlainText():
             self.log_display.clear()
@@ -143,5 +152,6 @@ class LogsTab(QWidget):
         self.log_display.verticalScrollBar().setValue(self.log_display.verticalScrollBar().maximum())
 
     def closeEvent(self, event):
-        self.timer.stop()
+        self.dm.logs_changed.disconnect(self._fetch_updates)
+        self.dm.connection_changed.disconnect(self._on_connection_changed)
         super().closeEvent(event)
\ No newline at end of file
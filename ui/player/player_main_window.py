@@ -1,8 +1,8 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QStackedWidget, QMessageBox
+    QLabel, QLineEdit, QPushButton, QStackedWidget, QMessageBox, QListWidget, QListWidgetItem
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 # Use absolute imports consistently
 from core.data_manager import DataManager
@@ -38,6 +38,7 @@ class PlayerMainWindow(QMainWindow):
                 font-weight: bold;
             }
             QPushButton:hover { background-color: #00ACC1; }
+            QListWidget { border: 1px solid #90A4AE; border-radius: 5px; font-size: 14px; }
             #WelcomeHeader { color: #00ACC1; font-size: 28px; font-weight: bold; }
         """)
 
@@ -55,6 +56,13 @@ class PlayerMainWindow(QMainWindow):
         self.char_creation_tab = None
         self.player_menu = None
 
+        # Пошук сесій у локальній мережі: список оновлюється, доки відкритий екран підключення
+        self.discovery = self.dm.start_discovery()
+        self.discovery_timer = QTimer(self)
+        self.discovery_timer.timeout.connect(self._refresh_found_sessions)
+        self.discovery_timer.start(250)
+        QTimer.singleShot(100, self._refresh_found_sessions)
+
     def _create_join_widget(self):
         widget = QWidget()
         layout = QVBoxLayout(widget)
@@ -74,17 +82,27 @@ class PlayerMainWindow(QMainWindow):
         id_hbox.setAlignment(Qt.AlignCenter)
 
         lbl = QLabel("Рядок підключення:")
-        lbl.setToolTip("Введіть 'IP/ID' (наприклад 192.168.0.1/SESS_AB12) або просто ID для локальної гри.")
+        lbl.setToolTip("Введіть 'IP/ID' (наприклад 192.168.0.1/SESS_AB12; якщо хост не на стандартному порту - "
+                       "192.168.0.1:5001/SESS_AB12) або просто ID для локальної гри.")
         id_hbox.addWidget(lbl)
 
         self.session_id_input = QLineEdit()
         # Оновлена підказка
         self.session_id_input.setPlaceholderText("Приклад: 192.168.1.5/SESS_X1Y2")
         self.session_id_input.setFixedWidth(350)
+        # Останню сесію підставляємо одразу - повторне підключення без пошуку
+        self.session_id_input.setText(self.dm.last_host() or "")
         id_hbox.addWidget(self.session_id_input)
 
         layout.addLayout(id_hbox)
 
+        layout.addWidget(QLabel("Сесії в локальній мережі:"), alignment=Qt.AlignCenter)
+        self.found_list = QListWidget()
+        self.found_list.setFixedSize(470, 120)
+        self.found_list.itemClicked.connect(lambda item: self.session_id_input.setText(item.data(Qt.UserRole)))
+        self.found_list.itemDoubleClicked.connect(lambda item: self._attempt_join())
+        layout.addWidget(self.found_list, alignment=Qt.AlignCenter)
+
         self.join_button = QPushButton("🔗 ПРИЄДНАТИСЯ")
         self.join_button.setFixedWidth(200)
         self.join_button.clicked.connect(self._attempt_join)
@@ -92,6 +110,24 @@ class PlayerMainWindow(QMainWindow):
 
         return widget
 
+    def _refresh_found_sessions(self):
+        if self.stacked_widget.currentWidget() is not self.join_widget:
+            self.discovery_timer.stop()
+            return
+        # Порт - з оголошення хоста: він може слухати не на стандартному
+        found = []
+        for s in self.discovery.sessions():
+            address = f"{s['ip']}:{s['port']}" if s.get("port") else s["ip"]
+            found.append((f"{address}/{s['id']}", f"{s['id']} — {s['host']} ({address}), гравців: {s['players']}"))
+        current = [(self.found_list.item(i).data(Qt.UserRole), self.found_list.item(i).text())
+                   for i in range(self.found_list.count())]
+        if found == current: return
+        self.found_list.clear()
+        for connect_str, text in found:
+            item = QListWidgetItem(text)
+            item.setData(Qt.UserRole, connect_str)
+            self.found_list.addItem(item)
+
     def _attempt_join(self):
         # Отримуємо "сирий" рядок (не переводимо в upper() одразу, бо IP може мати літери, хоча IPv4 ні)
         raw_input = self.session_id_input.text().strip()
@@ -103,7 +139,7 @@ class PlayerMainWindow(QMainWindow):
             # Якщо є слеш, значить це формат IP/ID
             parts = raw_input.split("/")
             if len(parts) != 2:
-                QMessageBox.warning(self, "Формат", "Невірний формат. Має бути: IP_АДРЕСА/ID_СЕСІЇ")
+                QMessageBox.warning(self, "Формат", "Невірний формат. Має бути: IP_АДРЕСА[:ПОРТ]/ID_СЕСІЇ")
                 return
 
             ip_part = parts[0].strip()
@@ -128,6 +164,8 @@ class PlayerMainWindow(QMainWindow):
 
         # Спроба підключення
         if self.dm.join_session(connect_str):
+            # Мережа гравця не повинна блокувати інтерфейс (мапа, анімації кубиків)
+            self.dm.set_async_mode(True)
             QMessageBox.information(self, "Успіх", f"Підключено до {connect_str}")
             self._switch_to_creation()
         else:
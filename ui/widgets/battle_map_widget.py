@@ -214,6 +214,8 @@ class BattleMapWidget(QWidget):
             col = max(0, min(col, self.cols - 1))
             row = max(0, min(row, self.rows - 1))
 
+            # Токен сам не переставляємо: хід передбачає DataManager.move_token і надсилає стан через combat_changed,
+            # а відкинутий хід лишає токен на місці
             self.token_moved.emit(self.selected_token_uid, col, row)
 
         self.dragging = False